@@ -6,10 +6,15 @@
 #####################################################
 #####################################################
 
-import boto3
 import argparse
 import sys
+import json
+import hashlib
 import logging
+from ebs_alarm_bulk import delete_alarms_in_batches, put_alarms_concurrently
+from ebs_alarm_specs import get_alarm_prefix, get_alarm_template
+from ebs_clients import get_client
+from ebs_inventory import get_volume_details_index
 
 
 class Config:
@@ -18,18 +23,24 @@ class Config:
     SNS_ALARM_ACTION_ARN = (
         SNS_OK_ACTION_ARN  # For simplicity, use same SNS topic for Alarm and OK actions
     )
-    ALARM_PREFIX = (
-        "ImpairedVol_"  # A clean way to identify these automatically created Alarms.
-    )
+    # A clean way to identify these automatically created Alarms. The alarm definition
+    # (threshold, evaluation periods, metric math) is ALARM_SPECS["impairedvol"] in
+    # ebs_alarm_specs.py, shared with the alarm manager and the Lambda functions.
+    ALARM_PREFIX = get_alarm_prefix("impairedvol")
     PAGINATION_COUNT = 100  # EBS Get volume pagination count
-    ALARM_EVALUATION_TIME = 60  # Frequency of Alarm Evaluation.
-    METRIC_PERIOD = ALARM_EVALUATION_TIME  # Has to tbe the same (for now).
-    ALARM_EVALUATION_PERIODS = 2  # How many times does the threshold have to breached before setting off the alarm
-    ALARM_DATAPOINTS_TO_ALARM = (
-        2  # Minimum number of datapoints the alarm needs within the alarm period
-    )
-    ALARM_THRESHOLD_VALUE = 1  # Threshold value for alarm
     DEFAULT_REGION = "us-west-2"
+    # Settings compared by --update. A difference in any of them re-puts the alarm.
+    DRIFT_KEYS = [
+        "AlarmDescription",
+        "AlarmActions",
+        "OKActions",
+        "EvaluationPeriods",
+        "DatapointsToAlarm",
+        "Threshold",
+        "ComparisonOperator",
+        "TreatMissingData",
+        "Metrics",
+    ]
 
 
 def main():
@@ -46,8 +57,16 @@ def main():
     ec2, cloudwatch, sns = initialize_aws_clients(args.region)
     # if --tag is used, it requires two values passed (tag_name, tag_value)
     tag_name, tag_value = args.tag if args.tag else (None, None)
-    volume_ids = get_all_volume_ids(ec2=ec2, tag_name=tag_name, tag_value=tag_value)
-    alarm_names = get_all_alarm_names(cloudwatch=cloudwatch)
+    volume_details = get_all_volume_details(
+        ec2=ec2, tag_name=tag_name, tag_value=tag_value
+    )
+    volume_ids = list(volume_details)
+    if args.volume_id and args.volume_id not in volume_details:
+        volume_details.update(
+            get_volume_details_index(ec2=ec2, volume_ids=[args.volume_id])
+        )
+    existing_alarms = get_existing_alarms(cloudwatch=cloudwatch)
+    alarm_names = set(existing_alarms)
 
     stats = {"created": 0, "updated": 0, "deleted": 0, "volumes_processed": 0}
     volumes_without_alarm = []
@@ -80,12 +99,18 @@ def main():
             target_volumes=volume_ids,
             alarm_names=alarm_names,
             cloudwatch=cloudwatch,
-            ec2=ec2,
+            volume_details=volume_details,
         )
+        # Alarms created above already match, only the ones that existed are checked
         stats["updated"] = update_alarms(
-            volume_ids=volume_ids,
+            volume_ids=[
+                volume_id
+                for volume_id in volume_ids
+                if Config.ALARM_PREFIX + volume_id in alarm_names
+            ],
+            existing_alarms=existing_alarms,
             cloudwatch=cloudwatch,
-            ec2=ec2,
+            volume_details=volume_details,
             volumes_without_alarm=volumes_without_alarm,
         )
     else:
@@ -99,13 +124,14 @@ def main():
                 target_volumes=target_volumes,
                 alarm_names=alarm_names,
                 cloudwatch=cloudwatch,
-                ec2=ec2,
+                volume_details=volume_details,
             )
         if args.update:
             stats["updated"] = update_alarms(
                 volume_ids=volume_ids,
+                existing_alarms=existing_alarms,
                 cloudwatch=cloudwatch,
-                ec2=ec2,
+                volume_details=volume_details,
                 volumes_without_alarm=volumes_without_alarm,
             )
 
@@ -118,8 +144,8 @@ def main():
         )
 
 
-def generate_alarm_description(volume_id, ec2):
-    volume_details = fetch_volume_info(volume_id=volume_id, ec2=ec2)
+def generate_alarm_description(volume_id, volume_details):
+    volume_details = volume_details.get(volume_id) or {"volume_id": volume_id}
 
     volume_id = volume_details.get("volume_id", "N/A")
     availability_zone = volume_details.get("availability_zone", "N/A")
@@ -147,9 +173,9 @@ def generate_alarm_description(volume_id, ec2):
 
 def initialize_aws_clients(region):
     try:
-        ec2 = boto3.client("ec2", region_name=region)
-        cloudwatch = boto3.client("cloudwatch", region_name=region)
-        sns = boto3.client("sns", region_name=region)
+        ec2 = get_client("ec2", region=region, rate_limited=True)
+        cloudwatch = get_client("cloudwatch", region=region, rate_limited=True)
+        sns = get_client("sns", region=region)
         logging.info(f"Initilized AWS Client in region {region}")
     except Exception as e:
         logging.error(f"Failed to initialize AWS clients: {e}")
@@ -158,53 +184,37 @@ def initialize_aws_clients(region):
     return ec2, cloudwatch, sns
 
 
-def get_all_volume_ids(ec2, tag_name=None, tag_value=None):
-    paginator = ec2.get_paginator("describe_volumes")
-    volume_ids = []
-
+def get_all_volume_details(ec2, tag_name=None, tag_value=None):
+    """
+    Returns the volume details used in alarm descriptions, indexed by volume ID, from one
+    describe_volumes pass and batched describe_instances calls.
+    """
     filter_args = []
     if tag_name and tag_value:
         filter_args.append({"Name": f"tag:{tag_name}", "Values": [tag_value]})
 
-    for page in paginator.paginate(
-        Filters=filter_args, MaxResults=Config.PAGINATION_COUNT
-    ):
-        for volume in page["Volumes"]:
-            volume_ids.append(volume["VolumeId"])
-    logging.debug(f"Volume IDs:\n{volume_ids}")
-    return volume_ids
+    volume_details = get_volume_details_index(ec2=ec2, filters=filter_args)
+    logging.debug(f"Volume IDs:\n{list(volume_details)}")
+    return volume_details
 
 
-def get_all_alarm_names(cloudwatch):
+def get_existing_alarms(cloudwatch):
+    """
+    Returns every alarm whose name starts with Config.ALARM_PREFIX, indexed by alarm
+    name, from paginated describe_alarms calls. The full alarm definitions are kept so
+    --update needs no further describe calls.
+    """
     paginator = cloudwatch.get_paginator("describe_alarms")
-    alarm_names = []
-    for page in paginator.paginate(MaxRecords=Config.PAGINATION_COUNT):
+    existing_alarms = {}
+    for page in paginator.paginate(
+        AlarmNamePrefix=Config.ALARM_PREFIX,
+        AlarmTypes=["MetricAlarm"],
+        MaxRecords=Config.PAGINATION_COUNT,
+    ):
         for alarm in page["MetricAlarms"]:
-            alarm_names.append(alarm["AlarmName"])
-    logging.debug(f"Volume IDs:\n{alarm_names}")
-    return alarm_names
-
-
-def handle_single_volume(volume_id, alarm_names, cloudwatch, ec2, sns, args):
-    alarm_name = Config.ALARM_PREFIX + volume_id
-    if alarm_name not in alarm_names:
-        create_alarm(volume_id=volume_id, cloudwatch=cloudwatch, ec2=ec2, sns=sns)
-    else:
-        logging.info(f"Alarm '{alarm_name}' already exists for volume {volume_id}")
-        if args.update:
-            logging.info(f"Updating Alarm '{alarm_name}' volume {volume_id}")
-            update_alarm_description(
-                volume_id=volume_id, cloudwatch=cloudwatch, ec2=ec2
-            )
-
-
-def handle_update(volume_id, cloudwatch, ec2):
-    try:
-        update_alarm_description(volume_id=volume_id, cloudwatch=cloudwatch, ec2=ec2)
-    except Exception as e:
-        logging.error(
-            f"An error occurred while updating alarm for volume {volume_id}: {e}"
-        )
+            existing_alarms[alarm["AlarmName"]] = alarm
+    logging.debug(f"Alarm names:\n{list(existing_alarms)}")
+    return existing_alarms
 
 
 def check_sns_exists(sns, sns_topic_arn):
@@ -236,229 +246,128 @@ def check_sns_exists(sns, sns_topic_arn):
             sys.exit(1)  # Stop the script here
 
 
-def generate_desired_alarm_details(volume_id, ec2):
-    alarm_description = generate_alarm_description(volume_id, ec2)
-
-    desired_alarm_details = {
-        "AlarmDescription": alarm_description,
-        "Threshold": Config.ALARM_THRESHOLD_VALUE,
-        "EvaluationPeriods": Config.ALARM_EVALUATION_PERIODS,
-        "AlarmActions": [Config.SNS_ALARM_ACTION_ARN],
-        "DatapointsToAlarm": Config.ALARM_DATAPOINTS_TO_ALARM,
-        # ... any other alarm attributes
-    }
-    return desired_alarm_details
-
-
-def update_alarms(volume_ids, cloudwatch, ec2, volumes_without_alarm):
-    updated_count = 0
+def alarm_definition_hash(alarm):
+    """
+    Returns a SHA-256 hash of the Config.DRIFT_KEYS settings of an alarm, either the
+    put_metric_alarm arguments from build_alarm_details or an alarm returned by
+    describe_alarms. The settings are serialized with sorted keys and the metric
+    queries sorted by Id, so equal definitions always hash the same.
+    """
+    canonical = {key: alarm.get(key) for key in Config.DRIFT_KEYS}
+    canonical["OKActions"] = canonical["OKActions"] or []
+    canonical["Threshold"] = float(canonical["Threshold"])
+    canonical["Metrics"] = sorted(canonical["Metrics"] or [], key=lambda m: m["Id"])
+    serialized = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def update_alarms(
+    volume_ids, existing_alarms, cloudwatch, volume_details, volumes_without_alarm
+):
+    """
+    Re-puts the alarms whose definition has drifted from the one create_alarm would
+    put. existing_alarms comes from get_existing_alarms, so no API calls are made per
+    volume: only the alarms whose hash differs are put, concurrently.
+    Returns:
+        int: The number of alarms updated.
+    """
+    drifted = []
 
     for volume_id in volume_ids:
-        alarm_name = "ImpairedVol_" + volume_id
-        existing_alarms = cloudwatch.describe_alarms(AlarmNames=[alarm_name])[
-            "MetricAlarms"
-        ]
+        alarm_name = Config.ALARM_PREFIX + volume_id
+        existing_alarm = existing_alarms.get(alarm_name)
 
-        if not existing_alarms:
+        if existing_alarm is None:
             if volumes_without_alarm is not None:
                 volumes_without_alarm.append(volume_id)
             continue
 
-        existing_alarm = existing_alarms[0]
-        desired_alarm_details = generate_desired_alarm_details(volume_id, ec2)
-
-        should_update = False
-
-        # Specify which keys you want to compare
-        keys_to_compare = [
-            "AlarmDescription",
-            "Threshold",
-            "EvaluationPeriods",
-            "AlarmActions",
-            "DatapointsToAlarm",
-        ]
-
-        for key in keys_to_compare:
-            if existing_alarm.get(key) != desired_alarm_details.get(key):
-                should_update = True
-                existing_alarm[key] = desired_alarm_details[key]
-
-        if should_update:
-            # Filter out invalid keys and update the alarm
-            valid_keys = [
-                "AlarmName",
-                "AlarmDescription",
-                "ActionsEnabled",
-                "OKActions",
-                "AlarmActions",
-                "InsufficientDataActions",
-                "MetricName",
-                "Namespace",
-                "Statistic",
-                "ExtendedStatistic",
-                "Period",
-                "Unit",
-                "EvaluationPeriods",
-                "DatapointsToAlarm",
-                "Threshold",
-                "ComparisonOperator",
-                "TreatMissingData",
-                "EvaluateLowSampleCountPercentile",
-                "Metrics",
-                "Tags",
-                "ThresholdMetricId",
-            ]
-            filtered_alarm = {
-                k: existing_alarm[k] for k in valid_keys if k in existing_alarm
-            }
-
-            try:
-                cloudwatch.put_metric_alarm(**filtered_alarm)
-                logging.info(f"Updated alarm {alarm_name}")
-                updated_count += 1
-            except Exception as e:
-                logging.error(f"Failed to update alarm {alarm_name}: {e}")
-
-    return updated_count
+        desired_alarm_details = build_alarm_details(volume_id, volume_details)
+        if alarm_definition_hash(existing_alarm) != alarm_definition_hash(
+            desired_alarm_details
+        ):
+            logging.info(f"Alarm {alarm_name} has drifted, updating it")
+            drifted.append(desired_alarm_details)
+        else:
+            logging.info(f"Alarm {alarm_name} is up to date")
+
+    updated, failures = put_alarms_concurrently(cloudwatch=cloudwatch, alarms=drifted)
+    for alarm_name, error in failures.items():
+        logging.error(f"Failed to update alarm {alarm_name}: {error}")
+
+    return len(updated)
 
 
 def cleanup_alarms(volume_ids, alarm_names, cloudwatch):
-    deleted_count = 0
+    volume_id_set = set(volume_ids)
+    alarms_to_delete = []
 
     for alarm_name in alarm_names:
-        # Only consider alarms that start with 'ImpairedVol_'
-        if alarm_name.startswith("ImpairedVol_"):
+        # Only consider alarms that start with Config.ALARM_PREFIX
+        if alarm_name.startswith(Config.ALARM_PREFIX):
             # Extract volume ID from the alarm name
-            volume_id = alarm_name[len("ImpairedVol_") :]
+            volume_id = alarm_name[len(Config.ALARM_PREFIX) :]
 
-            if volume_id not in volume_ids:
+            if volume_id not in volume_id_set:
                 logging.info(
                     f"Deleting alarm {alarm_name} as volume {volume_id} no longer exists"
                 )
-                try:
-                    cloudwatch.delete_alarms(AlarmNames=[alarm_name])
-                    deleted_count += 1
-                except cloudwatch.exceptions.ClientError as e:
-                    logging.error(f"Failed to delete alarm {alarm_name}: {e}")
-                except Exception as e:
-                    logging.error(f"Unknown error when deleting {alarm_name}: {e}")
-
+                alarms_to_delete.append(alarm_name)
             else:
                 logging.info(
                     f"No change to alarm {alarm_name} as volume {volume_id} still exists"
                 )
 
-    return deleted_count
+    deleted, failures = delete_alarms_in_batches(
+        cloudwatch=cloudwatch, alarm_names=alarms_to_delete
+    )
+    for alarm_name, error in failures.items():
+        logging.error(f"Failed to delete alarm {alarm_name}: {error}")
+
+    return len(deleted)
 
 
-def create_alarms(target_volumes, alarm_names, cloudwatch, ec2):
+def create_alarms(target_volumes, alarm_names, cloudwatch, volume_details):
     created_count = 0
     for volume_id in target_volumes:
-        alarm_name = "ImpairedVol_" + volume_id
+        alarm_name = Config.ALARM_PREFIX + volume_id
         if alarm_name not in alarm_names:
-            create_alarm(volume_id=volume_id, cloudwatch=cloudwatch, ec2=ec2)
+            create_alarm(
+                volume_id=volume_id,
+                cloudwatch=cloudwatch,
+                volume_details=volume_details,
+            )
             created_count += 1
         else:
             logging.info(f"CW Alarm {alarm_name} already exists.")
     return created_count
 
 
-def create_alarm(volume_id, cloudwatch, ec2):
-    alarm_description = generate_alarm_description(volume_id=volume_id, ec2=ec2)
-
-    alarm_name = "ImpairedVol_" + volume_id
-    alarm_details = {
-        "AlarmName": alarm_name,
-        "AlarmActions": [Config.SNS_ALARM_ACTION_ARN],
-        "EvaluationPeriods": Config.ALARM_EVALUATION_PERIODS,
-        "DatapointsToAlarm": Config.ALARM_DATAPOINTS_TO_ALARM,
-        "Threshold": Config.ALARM_THRESHOLD_VALUE,
-        "ComparisonOperator": "GreaterThanOrEqualToThreshold",
-        "TreatMissingData": "missing",
-        "AlarmDescription": alarm_description,
-        "Metrics": [
-            {
-                "Id": "e1",
-                "Expression": "IF(m3>0 AND m1+m2==0, 1, 0)",
-                "Label": "ImpairedVolume",
-                "ReturnData": True,
-                "Period": Config.ALARM_EVALUATION_TIME,
-            },
-            {
-                "Id": "m3",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeQueueLength",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m1",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeReadOps",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m2",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeWriteBytes",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-        ],
-    }
-    if Config.INCLUDE_OK_ACTION:
-        alarm_details.append = {
-            "OKActions": [Config.SNS_OK_ACTION_ARN],
-        }
+def build_alarm_details(volume_id, volume_details):
+    """
+    Returns the put_metric_alarm arguments of the alarm for one volume.
+    """
+    alarm_description = generate_alarm_description(
+        volume_id=volume_id, volume_details=volume_details
+    )
+
+    template = get_alarm_template(
+        "impairedvol",
+        alarm_actions=[Config.SNS_ALARM_ACTION_ARN],
+        ok_actions=[Config.SNS_OK_ACTION_ARN] if Config.INCLUDE_OK_ACTION else [],
+    )
+    return template.render(volume_id, alarm_description)
+
+
+def create_alarm(volume_id, cloudwatch, volume_details):
+    alarm_details = build_alarm_details(volume_id, volume_details)
+    alarm_name = alarm_details["AlarmName"]
 
     logging.info(f"Creating alarm {alarm_name} for volume {volume_id}.")
 
     # Create the new alarm
     try:
-        if Config.INCLUDE_OK_ACTION:
-            cloudwatch.put_metric_alarm(
-                AlarmName=alarm_details["AlarmName"],
-                OKActions=alarm_details["OKActions"],
-                AlarmActions=alarm_details["AlarmActions"],
-                AlarmDescription=alarm_details["AlarmDescription"],
-                EvaluationPeriods=alarm_details["EvaluationPeriods"],
-                DatapointsToAlarm=alarm_details["DatapointsToAlarm"],
-                Threshold=alarm_details["Threshold"],
-                ComparisonOperator=alarm_details["ComparisonOperator"],
-                TreatMissingData=alarm_details["TreatMissingData"],
-                Metrics=alarm_details["Metrics"],
-            )
-        else:
-            cloudwatch.put_metric_alarm(
-                AlarmName=alarm_details["AlarmName"],
-                AlarmActions=alarm_details["AlarmActions"],
-                AlarmDescription=alarm_details["AlarmDescription"],
-                EvaluationPeriods=alarm_details["EvaluationPeriods"],
-                DatapointsToAlarm=alarm_details["DatapointsToAlarm"],
-                Threshold=alarm_details["Threshold"],
-                ComparisonOperator=alarm_details["ComparisonOperator"],
-                TreatMissingData=alarm_details["TreatMissingData"],
-                Metrics=alarm_details["Metrics"],
-            )
+        cloudwatch.put_metric_alarm(**alarm_details)
 
         logging.info(
             f"New alarm '{alarm_details['AlarmName']}' created for volume {volume_id}"
@@ -473,134 +382,6 @@ def create_alarm(volume_id, cloudwatch, ec2):
         )
 
 
-def update_alarm_description(volume_id, cloudwatch, ec2, volumes_without_alarm=None):
-    new_description = generate_alarm_description(volume_id=volume_id, ec2=ec2)
-
-    if new_description is None:
-        return False  # Indicate that the update was not successful
-
-    alarm_name = "ImpairedVol_" + volume_id
-
-    try:
-        existing_alarms = cloudwatch.describe_alarms(AlarmNames=[alarm_name])[
-            "MetricAlarms"
-        ]
-        if len(existing_alarms) == 0:
-            logging.error(f"Alarm {alarm_name} not found.")
-            volumes_without_alarm.append(volume_id)
-            return False
-
-        existing_alarm = existing_alarms[0]
-    except cloudwatch.exceptions.ResourceNotFoundException:
-        logging.error(f"Alarm {alarm_name} not found.")
-        return False
-    except cloudwatch.exceptions.ClientError as e:
-        logging.error(f"Failed to describe alarm {alarm_name}: {str(e)}")
-        return False
-    except Exception as e:
-        logging.error(
-            f"An unknown error occurred while describing alarm {alarm_name}: {str(e)}"
-        )
-        return False
-
-    # Only update if the description has changed
-    if existing_alarm["AlarmDescription"] != new_description:
-        existing_alarm["AlarmDescription"] = new_description
-
-        # Only keep the keys that are actually needed for put_metric_alarm
-        valid_keys = [
-            "AlarmName",
-            "AlarmDescription",
-            "ActionsEnabled",
-            "OKActions",
-            "AlarmActions",
-            "InsufficientDataActions",
-            "MetricName",
-            "Namespace",
-            "Statistic",
-            "ExtendedStatistic",
-            "Period",
-            "Unit",
-            "EvaluationPeriods",
-            "DatapointsToAlarm",
-            "Threshold",
-            "ComparisonOperator",
-            "TreatMissingData",
-            "EvaluateLowSampleCountPercentile",
-            "Metrics",
-            "Tags",
-            "ThresholdMetricId",
-        ]
-        filtered_alarm = {
-            k: existing_alarm[k] for k in valid_keys if k in existing_alarm
-        }
-
-        # Remove Dimensions if Metrics is set
-        if "Metrics" in filtered_alarm:
-            filtered_alarm.pop("Dimensions", None)
-
-        try:
-            cloudwatch.put_metric_alarm(**filtered_alarm)
-            logging.info(f"Updated description for alarm {alarm_name}")
-            return True  # Indicate that the update was successful
-        except cloudwatch.exceptions.ClientError as e:
-            logging.error(
-                f"Failed to update alarm description for {alarm_name}: {str(e)}"
-            )
-        except Exception as e:
-            logging.error(
-                f"An unknown error occurred while updating alarm description for {alarm_name}: {str(e)}"
-            )
-        return False  # Indicate that the update was not successful
-    else:
-        logging.info(f"The Alarm description for {alarm_name} has not changed.")
-        return False  # Indicate that no update was necessary
-
-
-def fetch_volume_info(volume_id, ec2):
-    try:
-        response = ec2.describe_volumes(VolumeIds=[volume_id])
-        volume_info = response["Volumes"][0]
-        tags = volume_info.get("Tags", [])
-        availability_zone = volume_info["AvailabilityZone"]
-
-        tags_dict = {tag["Key"]: tag["Value"] for tag in tags}
-
-        # Fetching attached EC2 instance ID and name
-        attachments = volume_info.get("Attachments", [])
-        instance_id = ""
-        instance_name = ""
-
-        if attachments:
-            instance_id = attachments[0].get("InstanceId", "")
-
-            if instance_id:
-                instance_response = ec2.describe_instances(InstanceIds=[instance_id])
-                instance_info = instance_response["Reservations"][0]["Instances"][0]
-                instance_tags = instance_info.get("Tags", [])
-
-                for tag in instance_tags:
-                    if tag["Key"] == "Name":
-                        instance_name = tag["Value"]
-                        break
-
-        volume_details = {
-            "volume_id": volume_id,
-            "tags_dict": tags_dict,
-            "availability_zone": availability_zone,
-            "attached_instance_id": instance_id,
-            "attached_instance_name": instance_name,
-        }
-
-        logging.debug(f"Fetched information for volume {volume_id}: {volume_details}")
-        return volume_details
-    except Exception as e:
-        logging.error(
-            f"An error occurred while fetching information for volume {volume_id}: {e}"
-        )
-        return None
-
-
 def parse_args():
     parser = argparse.ArgumentParser(
         description="Manage CloudWatch Alarms for EBS Impaired Volumes."
@@ -6,10 +6,11 @@
 #####################################################
 #####################################################
 
-import boto3
 import argparse
 import sys
 import logging
+from ebs_alarm_specs import get_alarm_template, parse_legacy_alarm_name
+from ebs_clients import get_client
 
 
 # Constants
@@ -18,18 +19,9 @@ class Config:
     SNS_ALARM_ACTION_ARN = "arn:aws:sns:us-west-2:338557412966:ebs_alarms"  # Consider this the default if --sns-topic is not passed
     SNS_OK_ACTION_ARN = SNS_ALARM_ACTION_ARN  # For simplicity, use same SNS topic for Alarm and OK actions
     INCLUDE_OK_ACTION = False  # If set to False, this will not send the "OK" state change of the alarm to SNS
-    ALARM_PREFIX = (
-        "ImpairedVol_"  # A clean way to identify these automatically created Alarms.
-    )
-
-    ALARM_THRESHOLD_VALUE = 200  # Latecy threshold
-    ALARM_EVALUATION_PERIODS = 2  # How many times does the threshold have to breached before setting off the alarm
-    ALARM_DATAPOINTS_TO_ALARM = (
-        1  # Minimum number of datapoints the alarm needs within the alarm period
-    )
-
-    ALARM_EVALUATION_TIME = 60  # Frequency of Alarm Evaluation.
-    METRIC_PERIOD = ALARM_EVALUATION_TIME  # Has to tbe the same (for now).
+    # The alarm name, threshold and metric math are ALARM_SPECS["readlatency"] in
+    # ebs_alarm_specs.py, the same alarm ebs-cw-alarm-manager.py creates.
+    ALARM_TYPE = "readlatency"
     DEFAULT_REGION = "us-west-2"
 
 
@@ -89,51 +81,52 @@ def main(tag=None, refresh=False, tagless=False, rename=False):
                 tagname = t["Value"]
                 break
 
-        alarm_name = construct_alarm_name("Read Latency", tagname, volume_id)
+        alarm_name = get_template().alarm_name(volume_id)
+        # Alarms named "Read Latency [tag] <volume ID>" by earlier versions
+        legacy_alarm_names = [
+            name
+            for name in alarm_names
+            if parse_legacy_alarm_name(Config.ALARM_TYPE, name) == volume_id
+        ]
 
-        # Check if an alarm with a similar pattern already exists
-        existing_alarm = any(
-            name.startswith(f"Read Latency {volume_id}") for name in alarm_names
-        )
+        if alarm_name in alarm_names and not refresh:
+            logging.info(
+                f"Alert for volume {volume_id} already exists. Use the --refresh option to update it."
+            )
+            continue
 
-        if existing_alarm and not rename:
+        if legacy_alarm_names and not rename:
             logging.info(
-                f"Alert for volume {volume_id} already exists. Use the --rename option to create a new alarm and remove the existing one."
+                f"Alert for volume {volume_id} already exists as {legacy_alarm_names[0]}. Use the --rename option to create a new alarm and remove the existing one."
             )
             continue
 
-        if rename and existing_alarm:
-            # Remove the existing alarm
-            cloudwatch.delete_alarms(AlarmNames=[alarm_name])
-
-        create_latency_alarm(
-            volume_id,
-            tagname,
-            cloudwatch,
-            metric_names=["VolumeTotalReadTime", "VolumeReadOps"],
-            threshold=Config.ALARM_THRESHOLD_VALUE,
-            evaluation_periods=Config.ALARM_EVALUATION_PERIODS,
-            datapoints_to_alarm=Config.ALARM_DATAPOINTS_TO_ALARM,
-        )
+        create_latency_alarm(volume_id, tagname, cloudwatch)
         updated_alarms.append(volume_id)
 
+        if legacy_alarm_names:
+            # Remove the existing alarm now that the renamed one is in place
+            cloudwatch.delete_alarms(AlarmNames=legacy_alarm_names)
+
     if updated_alarms:
         logging.info(f"Updated alarms for volumes: {', '.join(updated_alarms)}")
 
 
-def construct_alarm_name(base_name, tagname, volume_id):
-    """Constructs the alarm name based on base name, tag, and volume ID."""
-    return (
-        f"{base_name} {tagname} {volume_id}" if tagname else f"{base_name} {volume_id}"
+def get_template():
+    """Returns the shared read latency alarm definition with the SNS actions."""
+    return get_alarm_template(
+        Config.ALARM_TYPE,
+        alarm_actions=[Config.SNS_ALARM_ACTION_ARN],
+        ok_actions=[Config.SNS_OK_ACTION_ARN] if Config.INCLUDE_OK_ACTION else [],
     )
 
 
 def init_aws_clients():
     """Initializes and returns AWS service clients."""
     try:
-        ec2 = boto3.client("ec2")
-        cloudwatch = boto3.client("cloudwatch")
-        sns = boto3.client("sns")
+        ec2 = get_client("ec2", rate_limited=True)
+        cloudwatch = get_client("cloudwatch", rate_limited=True)
+        sns = get_client("sns")
         return ec2, cloudwatch, sns
     except Exception as e:
         logging.error(f"Error initializing AWS clients: {e}")
@@ -150,60 +143,13 @@ def check_sns_exists(sns):
         return False
 
 
-def create_latency_alarm(
-    volume_id,
-    tagname,
-    cloudwatch,
-    metric_names,
-    threshold,
-    evaluation_periods,
-    datapoints_to_alarm,
-):
+def create_latency_alarm(volume_id, tagname, cloudwatch):
     """Creates or updates a CloudWatch Alarm for EBS latency."""
-    alarm_name = construct_alarm_name("Read Latency", tagname, volume_id)
-    alarm_details = {
-        "AlarmName": alarm_name,
-        "AlarmActions": [Config.SNS_ALARM_ACTION_ARN],
-        "EvaluationPeriods": evaluation_periods,
-        "DatapointsToAlarm": datapoints_to_alarm,
-        "Threshold": threshold,
-        "ComparisonOperator": "GreaterThanOrEqualToThreshold",
-        "TreatMissingData": "missing",
-        "Metrics": [
-            {
-                "Id": "e1",
-                "Expression": f"(m1 / m2) * 1000",
-                "Label": "Latency",
-                "ReturnData": True,
-            },
-            {
-                "Id": "m1",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": metric_names[0],
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_EVALUATION_TIME,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m2",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": metric_names[1],
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_EVALUATION_TIME,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-        ],
-    }
+    alarm_description = f"Read latency alarm for EBS volume {volume_id}"
+    if tagname:
+        alarm_description += f" ({tagname})"
+    alarm_details = get_template().render(volume_id, alarm_description)
+    alarm_name = alarm_details["AlarmName"]
     cloudwatch.put_metric_alarm(**alarm_details)
     logging.info(f"New or updated alarm '{alarm_name}' created for volume {volume_id}")
 
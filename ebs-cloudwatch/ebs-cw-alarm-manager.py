@@ -1,9 +1,26 @@
-import boto3
 import argparse
 import sys
 import os
 import json
+import re
 import logging
+from datetime import datetime, timedelta, timezone
+from ebs_alarm_bulk import (
+    Checkpoint,
+    delete_alarms_in_batches,
+    put_alarms_concurrently,
+)
+from ebs_alarm_specs import (
+    ALARM_SPECS,
+    ALARM_TYPES,
+    get_alarm_prefix,
+    get_alarm_template,
+    parse_legacy_alarm_name,
+)
+from ebs_clients import get_client
+from ebs_inventory import get_volume_details_index
+from ebs_inventory_cache import get_cached_volume_details_index, Config as CacheConfig
+from ebs_rate_limiter import log_rate_limiter_stats
 
 # Make changes to how you want the alarm parameters in this class. The use of a Config data class is for simplicity in the script. It is not the best Python practice.
 
@@ -21,43 +38,12 @@ class Config:
     SNS_ALARM_ACTION_ARN = (
         SNS_OK_ACTION_ARN  # For simplicity, use same SNS topic for Alarm and OK actions
     )
-    ## ImpairedVol Settings ##
-    ALARM_IMPAIREDVOL_NAME_PREFIX = "EBS_ImpairedVol_"  # A clean way to identify these automatically created Alarms.
-    ALARM_IMPAIREDVOL_EVALUATION_TIME = 60  # Frequency of Alarm Evaluation. EBS metrics are vended every 60 seconds by default.
-    ALARM_IMPAIREDVOL_METRIC_PERIOD = (
-        ALARM_IMPAIREDVOL_EVALUATION_TIME  # Has to tbe the same (for now).
-    )
-    ALARM_IMPAIREDVOL_EVALUATION_PERIODS = 2  # How many times does the threshold have to breached before setting off the alarm
-    ALARM_IMPAIREDVOL_DATAPOINTS_TO_ALARM = (
-        2  # Minimum number of datapoints the alarm needs within the alarm period
-    )
-    ALARM_IMPAIREDVOL_THRESHOLD_VALUE = (
-        1  # Threshold value for alarm - it is either 0 or 1
-    )
-    ## ReadLatency Settings ##
-    ALARM_READLATENCY_NAME_PREFIX = "EBS_ReadLatency_"  # A clean way to identify these automatically created Alarms.
-    ALARM_READLATENCY_THRESHOLD_VALUE = 50  # Threshold value for alarm in milliseconds
-    ALARM_READLATENCY_EVALUATION_TIME = 60  # Frequency of Alarm Evaluation. EBS metrics are vended every 60 seconds by default.
-    ALARM_READLATENCY_METRIC_PERIOD = (
-        ALARM_READLATENCY_EVALUATION_TIME  # Has to tbe the same (for now).
-    )
-    ALARM_READLATENCY_EVALUATION_PERIODS = 2  # How many times does the threshold have to breached before setting off the alarm
-    ALARM_READLATENCY_DATAPOINTS_TO_ALARM = (
-        2  # Minimum number of datapoints the alarm needs within the alarm period
-    )
-    ## WriteLatency Settings ##
-    ALARM_WRITELATENCY_NAME_PREFIX = "EBS_WriteLatency_"  # A clean way to identify these automatically created Alarms.
-    ALARM_WRITELATENCY_THRESHOLD_VALUE = (
-        200  # Threshold value for alarm in milliseconds
-    )
-    ALARM_WRITELATENCY_EVALUATION_TIME = 60  # Frequency of Alarm Evaluation. EBS metrics are vended every 60 seconds by default.
-    ALARM_WRITELATENCY_METRIC_PERIOD = (
-        ALARM_WRITELATENCY_EVALUATION_TIME  # Has to tbe the same (for now).
-    )
-    ALARM_WRITELATENCY_EVALUATION_PERIODS = 2  # How many times does the threshold have to breached before setting off the alarm
-    ALARM_WRITELATENCY_DATAPOINTS_TO_ALARM = (
-        2  # Minimum number of datapoints the alarm needs within the alarm period
-    )
+    PLAN_FILE = "ebs-alarm-plan.json"  # Where --plan writes the reconciliation plan
+    WORKERS = 4  # Concurrent workers used when applying a plan
+    CHECKPOINT_FILE = "ebs-alarm-checkpoint.jsonl"  # Default file for --checkpoint
+    ## Consolidated (--consolidate-by) Settings ##
+    ALARM_GROUP_NAME_PREFIX = "EBS_Group_"  # Must not start with a per-volume prefix, or cleanup would delete these alarms
+    ALARM_GROUP_MAX_METRICS = 10  # CloudWatch allows up to 10 metrics in the metric math of one alarm
 
 
 def main():
@@ -78,13 +64,6 @@ def main():
         Config.VPC_ENDPOINT_SNS = f"https://sns.{args.region}.amazonaws.com"
 
     ec2, cloudwatch, sns = initialize_aws_clients(args.region)
-    # if --tag is used, it requires two values passed (tag_name, tag_value)
-    tag_name, tag_value = args.tag if args.tag else (None, None)
-    volume_ids = get_volume_ids(ec2=ec2, tag_name=tag_name, tag_value=tag_value)
-    alarm_names = get_all_alarm_names(cloudwatch=cloudwatch)
-
-    stats = {"created": 0, "deleted": 0, "volumes_processed": 0}
-    volumes_without_alarm = []
 
     if args.sns_topic:
         Config.SNS_ALARM_ACTION_ARN = args.sns_topic
@@ -95,8 +74,101 @@ def main():
     else:
         alarm_type = args.alarm_type
 
-    # Check SNS existence here only for --all and --create
-    if args.create:
+    if alarm_type == "all":
+        alarm_types_list = ALARM_TYPES
+    else:
+        alarm_types_list = [alarm_type]
+
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+
+    if checkpoint and checkpoint.header:
+        # Resume: the plan and actions come from the checkpoint, nothing is listed again
+        plan_file = args.checkpoint
+        plan = checkpoint.header["plan"]
+        actions = checkpoint.header["actions"]
+        print(
+            f"Resuming from checkpoint {args.checkpoint}: {len(checkpoint.done)} alarms already done"
+        )
+    elif args.apply_plan:
+        plan_file = args.apply_plan
+        plan = load_plan(args.apply_plan)
+        actions = ["create", "update", "delete"]
+    else:
+        plan = None
+
+    if plan is not None:
+        if plan.get("region") != args.region:
+            logging.error(
+                f"Plan {plan_file} was generated for region {plan.get('region')}, not {args.region}. Exiting."
+            )
+            sys.exit(1)  # Stop the script here
+        # Only the volumes that get a put_metric_alarm need their details for the description
+        volume_details = get_volume_details_index(
+            ec2=ec2,
+            volume_ids=[
+                item["volume_id"]
+                for item in plan["create"] + plan["update"]
+                if not checkpoint or item["alarm_name"] not in checkpoint.done
+            ],
+        )
+    else:
+        if args.show_tripped:
+            show_tripped_volumes(
+                cloudwatch=cloudwatch, alarm_types_list=alarm_types_list
+            )
+            return
+
+        # if --tag is used, it requires two values passed (tag_name, tag_value)
+        tag_name, tag_value = args.tag if args.tag else (None, None)
+        volume_details = get_volume_details(
+            ec2=ec2,
+            tag_name=tag_name,
+            tag_value=tag_value,
+            inventory_cache=get_inventory_cache_mode(args),
+        )
+        if args.consolidate_by:
+            run_consolidated(
+                args=args,
+                cloudwatch=cloudwatch,
+                sns=sns,
+                volume_details=volume_details,
+                alarm_types_list=alarm_types_list,
+            )
+            return
+        volume_ids = list(volume_details)
+        existing_alarms = get_existing_alarms(
+            cloudwatch=cloudwatch, alarm_types_list=alarm_types_list
+        )
+
+        plan = build_reconciliation_plan(
+            volume_ids=volume_ids,
+            existing_alarms=existing_alarms,
+            alarm_types_list=alarm_types_list,
+            region=args.region,
+        )
+
+        actions = []
+        if args.create or args.all:
+            actions.append("create")
+        if args.update or args.all:
+            actions.append("update")
+        if args.cleanup or args.all:
+            actions.append("delete")
+
+        print(
+            f"Volumes Processed: {len(volume_ids)}, Plan: {len(plan['create'])} to create, "
+            f"{len(plan['update'])} to update, {len(plan['delete'])} to delete"
+        )
+
+    if args.plan:
+        write_plan(plan, Config.PLAN_FILE)
+        print(
+            f"Plan written to {Config.PLAN_FILE}. Apply it with --apply-plan {Config.PLAN_FILE}"
+        )
+        return
+
+    # Check SNS existence here only when alarms will be created or updated
+    if "create" in actions or "update" in actions:
         if not check_sns_exists(sns=sns, sns_topic_arn=Config.SNS_ALARM_ACTION_ARN):
             logging.error(
                 f"Invalid SNS ARN provided: {Config.SNS_ALARM_ACTION_ARN}. Exiting."
@@ -111,46 +183,40 @@ def main():
             )
             sys.exit(1)  # Stop the script here
 
-    if alarm_type == "all":
-        alarm_types_list = ["impairedvol", "readlatency", "writelatency"]
-    else:
-        alarm_types_list = [alarm_type]
-
-    if args.create:
-        for alarm_type in alarm_types_list:
-            logging.info(f"Creating {alarm_type} alarms...")
-            print(f"Creating {alarm_type} alarms...")
-            stats["created"] += create_alarms(
-                target_volumes=volume_ids,
-                alarm_names=alarm_names,
-                cloudwatch=cloudwatch,
-                ec2=ec2,
-                alarm_type=alarm_type,
-            )
+    if checkpoint:
+        checkpoint.start({"plan": plan, "actions": actions})
 
-    if args.cleanup:
-        for alarm_type in alarm_types_list:
-            logging.info(f"Cleanup {alarm_type} alarms...")
-            print(f"Cleaning up {alarm_type} alarms...")
-            stats["deleted"] += cleanup_alarms(
-                volume_ids=volume_ids,
-                alarm_names=alarm_names,
-                cloudwatch=cloudwatch,
-                alarm_type=alarm_type,
-            )
+    try:
+        stats = apply_plan(
+            plan=plan,
+            actions=actions,
+            cloudwatch=cloudwatch,
+            volume_details=volume_details,
+            workers=args.workers,
+            checkpoint=checkpoint,
+        )
+    finally:
+        if checkpoint:
+            checkpoint.close()
 
     print(
-        f"Volumes Processed: {len(volume_ids)}, Alarms Created: {stats['created']}, Alarms Deleted: {stats['deleted']}"
+        f"Alarms Created: {stats['created']}, Alarms Updated: {stats['updated']}, "
+        f"Alarms Deleted: {stats['deleted']}, Failed: {stats['failed']}"
     )
-    if volumes_without_alarm:
-        print(
-            f"The following volume(s) do not have an Impaired Volume Alarm: {', '.join(volumes_without_alarm)}"
+    if checkpoint and not stats["failed"]:
+        print(f"All alarms done, {args.checkpoint} can be removed.")
+
+    if args.cleanup_legacy:
+        cleanup_legacy_alarms(
+            cloudwatch=cloudwatch,
+            alarm_types_list=alarm_types_list,
+            workers=args.workers,
         )
 
+    log_rate_limiter_stats()
 
-def generate_alarm_description(volume_id, ec2):
-    volume_details = fetch_volume_info(volume_id=volume_id, ec2=ec2)
 
+def generate_alarm_description(volume_details):
     volume_id = volume_details.get("volume_id", "N/A")
     availability_zone = volume_details.get("availability_zone", "N/A")
     tags_dict = volume_details.get("tags_dict", {})
@@ -175,350 +241,622 @@ def generate_alarm_description(volume_id, ec2):
     return alarm_description
 
 
-def get_volume_ids(ec2, tag_name=None, tag_value=None):
-    paginator = ec2.get_paginator("describe_volumes")
-    volume_ids = []
-
+def get_inventory_cache_mode(args):
+    """
+    Returns the inventory cache mode for this run. Alarms are deleted for volumes
+    missing from the inventory, and a cached snapshot can be minutes old (up to
+    Config.TTL, plus the CloudTrail lag of a delta refresh), so a run that can plan
+    deletes (--cleanup, --all or --plan) always lists the volumes again.
+    """
+    if args.inventory_cache == "off" or not (args.cleanup or args.all or args.plan):
+        return args.inventory_cache
+    if args.inventory_cache != "full":
+        logging.info("Refreshing the inventory cache, as alarms may be deleted")
+    return "full"
+
+
+def get_volume_details(ec2, tag_name=None, tag_value=None, inventory_cache="auto"):
+    """
+    Returns the details (tags, AZ, attached instance ID and name) of every volume,
+    indexed by volume ID. This is the only EC2 pass: alarm descriptions are built from
+    it without any further describe calls per volume. Unless inventory_cache is "off",
+    the volumes come from the on-disk inventory snapshot (see ebs_inventory_cache.py).
+    """
     filter_args = []
     if tag_name and tag_value:
         filter_args.append({"Name": f"tag:{tag_name}", "Values": [tag_value]})
 
-    for page in paginator.paginate(
-        Filters=filter_args, MaxResults=Config.PAGINATION_COUNT
-    ):
-        for volume in page["Volumes"]:
-            volume_ids.append(volume["VolumeId"])
-    logging.debug(f"Volume IDs:\n{volume_ids}")
-    return volume_ids
+    volume_details = get_cached_volume_details_index(
+        ec2=ec2, filters=filter_args, mode=inventory_cache
+    )
+    logging.debug(f"Volume IDs:\n{list(volume_details)}")
+    return volume_details
 
 
-def cleanup_alarms(volume_ids, alarm_names, cloudwatch, alarm_type):
-    deleted_count = 0
+def get_template(alarm_type):
+    # The shared alarm definition (ebs_alarm_specs.py) with this script's SNS actions
+    return get_alarm_template(
+        alarm_type,
+        alarm_actions=[Config.SNS_ALARM_ACTION_ARN],
+        ok_actions=[Config.SNS_OK_ACTION_ARN] if Config.INCLUDE_OK_ACTION else [],
+    )
 
-    if alarm_type == "impairedvol":
-        search_prefix = Config.ALARM_IMPAIREDVOL_NAME_PREFIX
-    if alarm_type == "readlatency":
-        search_prefix = Config.ALARM_READLATENCY_NAME_PREFIX
-    if alarm_type == "writelatency":
-        search_prefix = Config.ALARM_WRITELATENCY_NAME_PREFIX
 
-    for alarm_name in alarm_names:
-        # Only consider alarms that start with the prefix defined in the Config class
-        if alarm_name.startswith(search_prefix):
-            # Extract volume ID from the alarm name
-            volume_id = alarm_name[len(search_prefix) :]
+def get_alarm_params(volume_id, alarm_type):
+    alarm = get_template(alarm_type).render(volume_id)
+    return {
+        key: alarm[key]
+        for key in ["EvaluationPeriods", "DatapointsToAlarm", "Threshold", "Metrics"]
+    }
 
-            if volume_id not in volume_ids:
-                logging.info(
-                    f"Deleting {alarm_type} alarm {alarm_name} as volume {volume_id} no longer exists"
-                )
-                try:
-                    cloudwatch.delete_alarms(AlarmNames=[alarm_name])
-                    deleted_count += 1
-                except cloudwatch.exceptions.ClientError as e:
-                    logging.error(
-                        f"Failed to delete {alarm_type} alarm {alarm_name}: {e}"
-                    )
-                except Exception as e:
-                    logging.error(f"Unknown error when deleting {alarm_name}: {e}")
 
+def build_reconciliation_plan(volume_ids, existing_alarms, alarm_types_list, region):
+    """
+    Compares the alarms that should exist (one per volume and alarm type) with the alarms
+    that do exist and returns the create/update/delete actions needed to reconcile them.
+    Both sides are indexed in dicts/sets so the diff is linear in volumes + alarms.
+    """
+    volume_id_set = set(volume_ids)
+    plan = {
+        "region": region,
+        "generated": datetime.now(timezone.utc).isoformat(),
+        "create": [],
+        "update": [],
+        "delete": [],
+    }
+
+    for alarm_type in alarm_types_list:
+        prefix = get_alarm_prefix(alarm_type)
+        actual_alarms = existing_alarms.get(alarm_type, {})
+
+        for volume_id in volume_ids:
+            alarm_name = prefix + volume_id
+            action = {
+                "alarm_name": alarm_name,
+                "volume_id": volume_id,
+                "alarm_type": alarm_type,
+            }
+            existing_alarm = actual_alarms.get(alarm_name)
+            if existing_alarm is None:
+                plan["create"].append(action)
+            elif alarm_needs_update(existing_alarm, volume_id, alarm_type):
+                plan["update"].append(action)
             else:
+                logging.info(f"CW Alarm {alarm_name} already exists.")
+
+        for alarm_name in actual_alarms:
+            volume_id = alarm_name[len(prefix) :]
+            if volume_id not in volume_id_set:
                 logging.info(
-                    f"No change to {alarm_type} alarm {alarm_name} as volume {volume_id} still exists"
+                    f"Planning to delete {alarm_type} alarm {alarm_name} as volume {volume_id} no longer exists"
+                )
+                plan["delete"].append(
+                    {
+                        "alarm_name": alarm_name,
+                        "volume_id": volume_id,
+                        "alarm_type": alarm_type,
+                    }
                 )
 
-    return deleted_count
+    return plan
+
+
+def alarm_needs_update(existing_alarm, volume_id, alarm_type):
+    """
+    Checks the settings the script controls (thresholds, periods, actions and metric
+    math) against the existing alarm. The description is not compared, so tag changes
+    alone do not trigger an update.
+    """
+    desired = get_template(alarm_type).render(volume_id)
+    desired.setdefault("OKActions", [])
+
+    for key in [
+        "EvaluationPeriods",
+        "DatapointsToAlarm",
+        "Threshold",
+        "ComparisonOperator",
+        "TreatMissingData",
+        "AlarmActions",
+        "OKActions",
+    ]:
+        if existing_alarm.get(key) != desired[key]:
+            logging.info(
+                f"CW Alarm {existing_alarm['AlarmName']} differs on {key}: {existing_alarm.get(key)} != {desired[key]}"
+            )
+            return True
 
+    # The metric queries, in Id order so an alarm put with another order still matches
+    if sorted(existing_alarm.get("Metrics") or [], key=lambda q: q["Id"]) != sorted(
+        desired["Metrics"], key=lambda q: q["Id"]
+    ):
+        logging.info(f"CW Alarm {existing_alarm['AlarmName']} differs on Metrics")
+        return True
+    return False
+
+
+def apply_plan(plan, actions, cloudwatch, volume_details, workers, checkpoint=None):
+    """
+    Applies the selected actions of a reconciliation plan. Creates and updates are both
+    put_metric_alarm calls, streamed through put_alarms_concurrently with a bounded
+    number in flight. Alarm descriptions come from volume_details, the index built by
+    get_volume_details. Alarms already recorded in the checkpoint are skipped, and
+    every alarm finished in this run is recorded in it.
+    """
+    stats = {"created": 0, "updated": 0, "deleted": 0, "failed": 0}
+    done = checkpoint.done if checkpoint else set()
+
+    stat_keys = {}  # alarm name -> "created" or "updated"
+    puts = []
+    if "create" in actions:
+        puts.extend(("created", item) for item in plan["create"])
+    if "update" in actions:
+        puts.extend(("updated", item) for item in plan["update"])
+    puts = [put for put in puts if put[1]["alarm_name"] not in done]
+
+    if puts:
+        logging.info(f"Putting {len(puts)} alarms with {workers} workers...")
+        print(f"Putting {len(puts)} alarms...")
+
+        def iter_alarm_details():
+            for stat_key, item in puts:
+                stat_keys[item["alarm_name"]] = stat_key
+                yield build_alarm_details(
+                    volume_id=item["volume_id"],
+                    volume_details=volume_details.get(item["volume_id"]),
+                    alarm_name=item["alarm_name"],
+                    alarm_type=item["alarm_type"],
+                )
 
-def generate_alarm_name(volume_id, alarm_type):
-    if alarm_type == "impairedvol":
-        return Config.ALARM_IMPAIREDVOL_NAME_PREFIX + volume_id
-    if alarm_type == "readlatency":
-        return Config.ALARM_READLATENCY_NAME_PREFIX + volume_id
-    if alarm_type == "writelatency":
-        return Config.ALARM_WRITELATENCY_NAME_PREFIX + volume_id
+        put, failures = put_alarms_concurrently(
+            cloudwatch=cloudwatch,
+            alarms=iter_alarm_details(),
+            workers=workers,
+            checkpoint=checkpoint,
+        )
+        for alarm_name in put:
+            stats[stat_keys[alarm_name]] += 1
+        stats["failed"] += len(failures)
+
+    deletes = [item for item in plan["delete"] if item["alarm_name"] not in done]
+    if "delete" in actions and deletes:
+        print(f"Deleting {len(deletes)} alarms...")
+        for item in deletes:
+            logging.info(
+                f"Deleting {item['alarm_type']} alarm {item['alarm_name']} as volume {item['volume_id']} no longer exists"
+            )
+        deleted, failures = delete_alarms_in_batches(
+            cloudwatch=cloudwatch,
+            alarm_names=[item["alarm_name"] for item in deletes],
+            workers=workers,
+            checkpoint=checkpoint,
+        )
+        stats["deleted"] += len(deleted)
+        stats["failed"] += len(failures)
+        for alarm_name, error in failures.items():
+            logging.error(f"Failed to delete alarm {alarm_name}: {error}")
 
+    return stats
 
-def create_alarms(target_volumes, alarm_names, cloudwatch, ec2, alarm_type):
-    created_count = 0
-    for volume_id in target_volumes:
-        alarm_name = generate_alarm_name(volume_id=volume_id, alarm_type=alarm_type)
-        if alarm_name not in alarm_names:
-            create_alarm(
-                volume_id=volume_id,
-                cloudwatch=cloudwatch,
-                ec2=ec2,
-                alarm_name=alarm_name,
-                alarm_type=alarm_type,
-            )
-            created_count += 1
-        else:
-            logging.info(f"CW Alarm {alarm_name} already exists.")
 
-    return created_count
+def write_plan(plan, plan_file):
+    with open(plan_file, "w") as f:
+        json.dump(plan, f, indent=2)
+    logging.info(
+        f"Wrote plan with {len(plan['create'])} creates, {len(plan['update'])} updates "
+        f"and {len(plan['delete'])} deletes to {plan_file}"
+    )
 
 
-def create_alarm(volume_id, cloudwatch, ec2, alarm_name, alarm_type):
-    alarm_description = generate_alarm_description(volume_id=volume_id, ec2=ec2)
+def load_plan(plan_file):
+    try:
+        with open(plan_file) as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to read plan file {plan_file}: {e}")
+        sys.exit(1)  # Stop the script here
 
-    alarm_details = {
-        "AlarmName": alarm_name,
-        "AlarmActions": [Config.SNS_ALARM_ACTION_ARN],
-        "ComparisonOperator": "GreaterThanOrEqualToThreshold",
-        "TreatMissingData": "missing",
-        "AlarmDescription": alarm_description,
-    }
+    logging.info(
+        f"Loaded plan generated {plan.get('generated')} for region {plan.get('region')}"
+    )
+    return plan
 
-    if alarm_type == "impairedvol":
-        alarm_details.update(get_impairedvol_alarm_params(volume_id))
-    if alarm_type == "readlatency":
-        alarm_details.update(get_readlatency_alarm_params(volume_id))
-    if alarm_type == "writelatency":
-        alarm_details.update(get_writelatency_alarm_params(volume_id))
-
-    if Config.INCLUDE_OK_ACTION:
-        alarm_details.update(
-            {
-                "OKActions": [Config.SNS_OK_ACTION_ARN],
-            }
+
+def build_alarm_details(volume_id, volume_details, alarm_name, alarm_type):
+    """
+    Returns the put_metric_alarm keyword arguments of one alarm.
+    """
+    if volume_details is None:
+        logging.warning(
+            f"No inventory details for volume {volume_id}, the alarm description will be minimal"
         )
+        volume_details = {"volume_id": volume_id}
+    alarm_description = generate_alarm_description(volume_details=volume_details)
+    alarm_details = get_template(alarm_type).render(volume_id, alarm_description)
 
     logging.debug(f"CloudWatch JSON:\n{alarm_details}\n")
     logging.info(f"Creating {alarm_type} alarm {alarm_name} for volume {volume_id}.")
-
-    # Create the new alarm
-    try:
-        if Config.INCLUDE_OK_ACTION:
-            cloudwatch.put_metric_alarm(
-                AlarmName=alarm_details["AlarmName"],
-                OKActions=alarm_details["OKActions"],
-                AlarmActions=alarm_details["AlarmActions"],
-                AlarmDescription=alarm_details["AlarmDescription"],
-                EvaluationPeriods=alarm_details["EvaluationPeriods"],
-                DatapointsToAlarm=alarm_details["DatapointsToAlarm"],
-                Threshold=alarm_details["Threshold"],
-                ComparisonOperator=alarm_details["ComparisonOperator"],
-                TreatMissingData=alarm_details["TreatMissingData"],
-                Metrics=alarm_details["Metrics"],
-            )
+    return alarm_details
+
+
+def get_group_alarm_prefix(alarm_type, tag_name):
+    # Tag names cannot contain "#", so the prefix of tag App never matches the alarms
+    # of tag App_Tier (which an "_" after the tag name would)
+    return f"{Config.ALARM_GROUP_NAME_PREFIX}{alarm_type}_{tag_name}#"
+
+
+def get_group_alarm_params(volume_ids, alarm_type):
+    """
+    Combines the per-volume alarm of alarm_type for several volumes into one metric math
+    alarm. Each volume's metrics and expression get an _<n> suffix on their Ids, the
+    expression is labelled with the volume ID, and the alarm evaluates the MAX of the
+    volume expressions, so it fires when any of the volumes would have.
+    """
+    params = None
+    metrics = []
+    for n, volume_id in enumerate(volume_ids):
+        params = get_alarm_params(volume_id, alarm_type)
+        for query in params["Metrics"]:
+            query = dict(query, Id=f"{query['Id']}_{n}")
+            if "Expression" in query:
+                query["Expression"] = re.sub(
+                    r"\b(m\d+)\b", rf"\1_{n}", query["Expression"]
+                )
+                query["Label"] = volume_id
+                query["ReturnData"] = False
+            metrics.append(query)
+
+    metrics.insert(
+        0,
+        {
+            "Id": "group",
+            "Expression": "MAX(["
+            + ", ".join(f"e1_{n}" for n in range(len(volume_ids)))
+            + "])",
+            "Label": f"Max{alarm_type}",
+            "ReturnData": True,
+        },
+    )
+    params["Metrics"] = metrics
+    return params
+
+
+def get_metrics_per_volume(alarm_type):
+    # MetricStat queries in one volume's alarm (the expressions are not metrics)
+    metrics = get_alarm_params("", alarm_type)["Metrics"]
+    return sum("MetricStat" in query for query in metrics)
+
+
+def get_group_alarm_volumes(alarm):
+    # The volume IDs of a consolidated alarm, from the labels of its volume expressions
+    return [
+        query["Label"]
+        for query in alarm["Metrics"]
+        if "Expression" in query and query["Id"] != "group"
+    ]
+
+
+def assign_group_volumes(volume_ids, current, volumes_per_alarm):
+    """
+    Splits a group's volumes over its alarms, keeping each volume in the alarm it is
+    already in so that adding or removing a volume only changes one alarm. Volumes
+    that are gone are dropped from their alarm, and new volumes fill the free slots
+    before new alarms are added.
+    Parameters:
+        volume_ids (list): The volumes of the group, sorted.
+        current (dict): Alarm number -> volume IDs of the existing alarms of the group.
+        volumes_per_alarm (int): Volumes that fit in one alarm.
+    Returns:
+        dict: alarm number -> volume IDs, without empty alarms.
+    """
+    remaining = set(volume_ids)
+    assigned = {}
+    for number, alarm_volume_ids in sorted(current.items()):
+        kept = [v for v in alarm_volume_ids if v in remaining][:volumes_per_alarm]
+        remaining.difference_update(kept)
+        assigned[number] = kept
+
+    new_volume_ids = [v for v in volume_ids if v in remaining]
+    for number in sorted(assigned):
+        free = volumes_per_alarm - len(assigned[number])
+        assigned[number].extend(new_volume_ids[:free])
+        new_volume_ids = new_volume_ids[free:]
+
+    number = max(assigned, default=0)
+    for i in range(0, len(new_volume_ids), volumes_per_alarm):
+        number += 1
+        assigned[number] = new_volume_ids[i : i + volumes_per_alarm]
+
+    return {number: chunk for number, chunk in assigned.items() if chunk}
+
+
+def build_group_alarms(volume_details, tag_name, alarm_types_list, existing_alarms):
+    """
+    Groups the volumes by the value of their tag_name tag and builds the consolidated
+    alarms of each group: one alarm per alarm type for every
+    Config.ALARM_GROUP_MAX_METRICS // metrics-per-volume volumes of the group. The
+    volumes stay in the alarms listed in existing_alarms (see assign_group_volumes).
+    Returns:
+        tuple: (dict of alarm name -> put_metric_alarm arguments, list of volume IDs
+        without the tag)
+    """
+    groups = {}
+    untagged = []
+    for volume_id in sorted(volume_details):
+        tag_value = volume_details[volume_id]["tags_dict"].get(tag_name)
+        if tag_value:
+            groups.setdefault(tag_value, []).append(volume_id)
         else:
-            cloudwatch.put_metric_alarm(
-                AlarmName=alarm_details["AlarmName"],
-                AlarmActions=alarm_details["AlarmActions"],
-                AlarmDescription=alarm_details["AlarmDescription"],
-                EvaluationPeriods=alarm_details["EvaluationPeriods"],
-                DatapointsToAlarm=alarm_details["DatapointsToAlarm"],
-                Threshold=alarm_details["Threshold"],
-                ComparisonOperator=alarm_details["ComparisonOperator"],
-                TreatMissingData=alarm_details["TreatMissingData"],
-                Metrics=alarm_details["Metrics"],
-            )
+            untagged.append(volume_id)
 
-        logging.info(
-            f"New {alarm_type} alarm '{alarm_details['AlarmName']}' created for volume {volume_id}"
-        )
-    except cloudwatch.exceptions.ClientError as error:
-        logging.error(
-            f"Error creating alarm {alarm_name} for volume {volume_id}: {error}"
-        )
-    except Exception as e:
-        logging.error(
-            f"Unexpected error creating alarm {alarm_name} for volume {volume_id}: {e}"
+    alarms = {}
+    for alarm_type in alarm_types_list:
+        prefix = get_group_alarm_prefix(alarm_type, tag_name)
+        volumes_per_alarm = Config.ALARM_GROUP_MAX_METRICS // get_metrics_per_volume(
+            alarm_type
         )
 
+        # Alarm names end with _<tag value>_<number>
+        current = {}
+        for alarm_name, alarm in existing_alarms.items():
+            if alarm_name.startswith(prefix):
+                tag_value, _, number = alarm_name[len(prefix) :].rpartition("_")
+                if number.isdigit():
+                    current.setdefault(tag_value, {})[int(number)] = (
+                        get_group_alarm_volumes(alarm)
+                    )
 
-def get_readlatency_alarm_params(volume_id):
-    return {
-        "EvaluationPeriods": Config.ALARM_READLATENCY_EVALUATION_PERIODS,
-        "DatapointsToAlarm": Config.ALARM_READLATENCY_DATAPOINTS_TO_ALARM,
-        "Threshold": Config.ALARM_READLATENCY_THRESHOLD_VALUE,
-        "Metrics": [
-            {
-                "Id": "e1",
-                "Expression": "(m1 / m2) * 1000",
-                "Label": "Latency",
-                "ReturnData": True,
-            },
-            {
-                "Id": "m1",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeTotalReadTime",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_READLATENCY_METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m2",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeReadOps",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_READLATENCY_EVALUATION_TIME,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-        ],
-    }
-
+        for tag_value, volume_ids in groups.items():
+            assigned = assign_group_volumes(
+                volume_ids, current.get(tag_value, {}), volumes_per_alarm
+            )
+            for number, chunk in assigned.items():
+                alarm_name = f"{prefix}{tag_value}_{number:04d}"
+                alarm_details = get_template(alarm_type).render(
+                    chunk[0],
+                    f"Consolidated {alarm_type} alarm for EBS volumes with {tag_name}={tag_value}."
+                    f"\nVolumes: {', '.join(chunk)}",
+                )
+                alarm_details["AlarmName"] = alarm_name
+                alarm_details.update(get_group_alarm_params(chunk, alarm_type))
+                alarms[alarm_name] = alarm_details
+
+    return alarms, untagged
+
+
+def group_alarm_needs_update(existing_alarm, alarm_details):
+    for key in [
+        "AlarmDescription",
+        "EvaluationPeriods",
+        "DatapointsToAlarm",
+        "Threshold",
+        "ComparisonOperator",
+        "TreatMissingData",
+        "AlarmActions",
+        "Metrics",
+    ]:
+        if existing_alarm.get(key) != alarm_details[key]:
+            logging.info(f"CW Alarm {existing_alarm['AlarmName']} differs on {key}")
+            return True
+    return existing_alarm.get("OKActions", []) != alarm_details.get("OKActions", [])
+
+
+def get_existing_group_alarms(cloudwatch, tag_name, alarm_types_list):
+    """
+    Returns the consolidated alarms of tag_name for the alarm types, indexed by name.
+    """
+    existing_alarms = {}
+    paginator = cloudwatch.get_paginator("describe_alarms")
+    for alarm_type in alarm_types_list:
+        for page in paginator.paginate(
+            AlarmNamePrefix=get_group_alarm_prefix(alarm_type, tag_name),
+            AlarmTypes=["MetricAlarm"],
+            MaxRecords=Config.PAGINATION_COUNT,
+        ):
+            for alarm in page["MetricAlarms"]:
+                existing_alarms[alarm["AlarmName"]] = alarm
+    return existing_alarms
+
+
+def run_consolidated(args, cloudwatch, sns, volume_details, alarm_types_list):
+    """
+    --consolidate-by: reconciles the consolidated alarms of every tag group instead of
+    the per-volume alarms. Missing alarms are created, alarms whose volumes or settings
+    changed are updated, and alarms left without volumes are deleted.
+    """
+    tag_name = args.consolidate_by
+    existing = get_existing_group_alarms(cloudwatch, tag_name, alarm_types_list)
+    desired, untagged = build_group_alarms(
+        volume_details, tag_name, alarm_types_list, existing
+    )
 
-def get_writelatency_alarm_params(volume_id):
-    return {
-        "EvaluationPeriods": Config.ALARM_WRITELATENCY_EVALUATION_PERIODS,
-        "DatapointsToAlarm": Config.ALARM_WRITELATENCY_DATAPOINTS_TO_ALARM,
-        "Threshold": Config.ALARM_WRITELATENCY_THRESHOLD_VALUE,
-        "Metrics": [
-            {
-                "Id": "e1",
-                "Expression": "(m1 / m2) * 1000",
-                "Label": "Latency",
-                "ReturnData": True,
-            },
-            {
-                "Id": "m1",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeTotalWriteTime",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_WRITELATENCY_METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m2",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeWriteOps",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_WRITELATENCY_EVALUATION_TIME,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-        ],
-    }
+    creates = [name for name in desired if name not in existing]
+    updates = [
+        name
+        for name in desired
+        if name in existing and group_alarm_needs_update(existing[name], desired[name])
+    ]
+    deletes = [name for name in existing if name not in desired]
 
+    print(
+        f"Volumes Processed: {len(volume_details)}, Consolidated alarms: {len(desired)}, Plan: {len(creates)} to create, "
+        f"{len(updates)} to update, {len(deletes)} to delete"
+    )
+    if untagged:
+        print(
+            f"{len(untagged)} volume(s) without a {tag_name} tag are not covered by a consolidated alarm"
+        )
+        logging.info(f"Volumes without a {tag_name} tag: {', '.join(untagged)}")
 
-def get_impairedvol_alarm_params(volume_id):
-    return {
-        "EvaluationPeriods": Config.ALARM_IMPAIREDVOL_EVALUATION_PERIODS,
-        "DatapointsToAlarm": Config.ALARM_IMPAIREDVOL_DATAPOINTS_TO_ALARM,
-        "Threshold": Config.ALARM_IMPAIREDVOL_THRESHOLD_VALUE,
-        "Metrics": [
-            {
-                "Id": "e1",
-                "Expression": "IF(m3>0 AND m1+m2==0, 1, 0)",
-                "Label": "ImpairedVolume",
-                "ReturnData": True,
-                "Period": Config.ALARM_IMPAIREDVOL_EVALUATION_TIME,
-            },
-            {
-                "Id": "m3",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeQueueLength",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_IMPAIREDVOL_METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m1",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeReadOps",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_IMPAIREDVOL_METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-            {
-                "Id": "m2",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": "VolumeWriteBytes",
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": Config.ALARM_IMPAIREDVOL_METRIC_PERIOD,
-                    "Stat": "Average",
-                },
-                "ReturnData": False,
-            },
-        ],
-    }
+    stats = {"created": 0, "updated": 0, "deleted": 0, "failed": 0}
+    puts = []
+    if args.create or args.all:
+        puts.extend(creates)
+    if args.update or args.all:
+        puts.extend(updates)
 
+    if puts:
+        sns_topic_arns = [Config.SNS_ALARM_ACTION_ARN]
+        if Config.INCLUDE_OK_ACTION:
+            sns_topic_arns.append(Config.SNS_OK_ACTION_ARN)
+        for sns_topic_arn in sns_topic_arns:
+            if not check_sns_exists(sns=sns, sns_topic_arn=sns_topic_arn):
+                logging.error(f"Invalid SNS ARN provided: {sns_topic_arn}. Exiting.")
+                sys.exit(1)  # Stop the script here
+        print(f"Putting {len(puts)} alarms...")
+        put, failures = put_alarms_concurrently(
+            cloudwatch=cloudwatch,
+            alarms=(desired[name] for name in puts),
+            workers=args.workers,
+        )
+        for alarm_name in put:
+            stats["updated" if alarm_name in existing else "created"] += 1
+        stats["failed"] += len(failures)
+
+    if (args.cleanup or args.all) and deletes:
+        print(f"Deleting {len(deletes)} alarms...")
+        deleted, failures = delete_alarms_in_batches(
+            cloudwatch=cloudwatch, alarm_names=deletes, workers=args.workers
+        )
+        stats["deleted"] += len(deleted)
+        stats["failed"] += len(failures)
+        for alarm_name, error in failures.items():
+            logging.error(f"Failed to delete alarm {alarm_name}: {error}")
 
-def fetch_volume_info(volume_id, ec2):
-    try:
-        response = ec2.describe_volumes(VolumeIds=[volume_id])
-        volume_info = response["Volumes"][0]
-        tags = volume_info.get("Tags", [])
-        availability_zone = volume_info["AvailabilityZone"]
-
-        tags_dict = {tag["Key"]: tag["Value"] for tag in tags}
-
-        # Fetching attached EC2 instance ID and name
-        attachments = volume_info.get("Attachments", [])
-        instance_id = ""
-        instance_name = ""
-
-        if attachments:
-            instance_id = attachments[0].get("InstanceId", "")
-
-            if instance_id:
-                instance_response = ec2.describe_instances(InstanceIds=[instance_id])
-                instance_info = instance_response["Reservations"][0]["Instances"][0]
-                instance_tags = instance_info.get("Tags", [])
-
-                for tag in instance_tags:
-                    if tag["Key"] == "Name":
-                        instance_name = tag["Value"]
-                        break
-
-        volume_details = {
-            "volume_id": volume_id,
-            "tags_dict": tags_dict,
-            "availability_zone": availability_zone,
-            "attached_instance_id": instance_id,
-            "attached_instance_name": instance_name,
+    print(
+        f"Alarms Created: {stats['created']}, Alarms Updated: {stats['updated']}, "
+        f"Alarms Deleted: {stats['deleted']}, Failed: {stats['failed']}"
+    )
+    log_rate_limiter_stats()
+
+
+def get_tripped_volumes(cloudwatch, alarm):
+    """
+    Re-evaluates the per-volume expressions of a consolidated alarm over its last
+    evaluation window with GetMetricData.
+    Returns:
+        list: (volume ID, latest value) of the volumes at or over the alarm threshold.
+    """
+    queries = []
+    for query in alarm["Metrics"]:
+        if query["Id"] == "group":
+            continue
+        query = {
+            key: query[key]
+            for key in ["Id", "MetricStat", "Expression", "Label", "Period"]
+            if key in query
         }
+        query["ReturnData"] = "Expression" in query
+        queries.append(query)
 
-        logging.debug(f"Fetched information for volume {volume_id}: {volume_details}")
-        return volume_details
-    except Exception as e:
-        logging.error(
-            f"An error occurred while fetching information for volume {volume_id}: {e}"
-        )
-        return None
+    period = max(
+        query["MetricStat"]["Period"] for query in queries if "MetricStat" in query
+    )
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(
+        seconds=period * (alarm["EvaluationPeriods"] + 1)
+    )
+    response = cloudwatch.get_metric_data(
+        MetricDataQueries=queries,
+        StartTime=start_time,
+        EndTime=end_time,
+        ScanBy="TimestampDescending",
+    )
 
+    tripped = []
+    for result in response["MetricDataResults"]:
+        if result["Values"] and result["Values"][0] >= alarm["Threshold"]:
+            tripped.append((result["Label"], result["Values"][0]))
+    return tripped
 
-def get_all_alarm_names(cloudwatch):
+
+def show_tripped_volumes(cloudwatch, alarm_types_list):
+    """
+    --show-tripped: lists the consolidated alarms in ALARM state and the volumes in
+    each of them that are over the threshold.
+    """
+    paginator = cloudwatch.get_paginator("describe_alarms")
+    alarms = []
+    for alarm_type in alarm_types_list:
+        for page in paginator.paginate(
+            AlarmNamePrefix=f"{Config.ALARM_GROUP_NAME_PREFIX}{alarm_type}_",
+            AlarmTypes=["MetricAlarm"],
+            StateValue="ALARM",
+            MaxRecords=Config.PAGINATION_COUNT,
+        ):
+            alarms.extend(page["MetricAlarms"])
+
+    if not alarms:
+        print("No consolidated alarms are in ALARM state.")
+    for alarm in alarms:
+        tripped = get_tripped_volumes(cloudwatch, alarm)
+        print(f"{alarm['AlarmName']} ({alarm['StateUpdatedTimestamp']}):")
+        if not tripped:
+            print("  no volume is over the threshold anymore")
+        for volume_id, value in tripped:
+            print(f"  {volume_id}: {value:.2f} (threshold {alarm['Threshold']})")
+
+
+def get_existing_alarms(cloudwatch, alarm_types_list):
+    """
+    Returns the existing alarms for each alarm type, indexed by alarm name. Only alarms
+    with this script's name prefixes are paged through.
+    """
+    existing_alarms = {}
+    paginator = cloudwatch.get_paginator("describe_alarms")
+    for alarm_type in alarm_types_list:
+        alarms = {}
+        for page in paginator.paginate(
+            AlarmNamePrefix=get_alarm_prefix(alarm_type),
+            AlarmTypes=["MetricAlarm"],
+            MaxRecords=Config.PAGINATION_COUNT,
+        ):
+            for alarm in page["MetricAlarms"]:
+                alarms[alarm["AlarmName"]] = alarm
+        logging.debug(f"Existing {alarm_type} alarms:\n{list(alarms)}")
+        existing_alarms[alarm_type] = alarms
+    return existing_alarms
+
+
+def cleanup_legacy_alarms(cloudwatch, alarm_types_list, workers):
+    """
+    Deletes the alarms still named with a legacy prefix of the alarm types (see
+    ebs_alarm_specs.ALARM_SPECS) when the volume has an alarm with the current name,
+    so no volume is left without an alarm. The alarms are listed by prefix, so this
+    takes a few describe_alarms pages per prefix.
+    """
+    existing_alarms = get_existing_alarms(
+        cloudwatch=cloudwatch, alarm_types_list=alarm_types_list
+    )
     paginator = cloudwatch.get_paginator("describe_alarms")
-    alarm_names = []
-    for page in paginator.paginate(MaxRecords=Config.PAGINATION_COUNT):
-        for alarm in page["MetricAlarms"]:
-            alarm_names.append(alarm["AlarmName"])
-    logging.debug(f"Volume IDs:\n{alarm_names}")
-    return alarm_names
+    legacy_alarm_names = []
+    kept = 0
+    for alarm_type in alarm_types_list:
+        prefixes = ALARM_SPECS[alarm_type]["legacy_name_prefixes"]
+        for prefix in prefixes:
+            for page in paginator.paginate(
+                AlarmNamePrefix=prefix,
+                AlarmTypes=["MetricAlarm"],
+                MaxRecords=Config.PAGINATION_COUNT,
+            ):
+                for alarm in page["MetricAlarms"]:
+                    volume_id = parse_legacy_alarm_name(alarm_type, alarm["AlarmName"])
+                    alarm_name = get_alarm_prefix(alarm_type) + str(volume_id)
+                    if alarm_name in existing_alarms[alarm_type]:
+                        legacy_alarm_names.append(alarm["AlarmName"])
+                    else:
+                        logging.info(
+                            f"Keeping legacy alarm {alarm['AlarmName']} until {alarm_name} exists"
+                        )
+                        kept += 1
+
+    deleted, failures = delete_alarms_in_batches(
+        cloudwatch=cloudwatch, alarm_names=legacy_alarm_names, workers=workers
+    )
+    for alarm_name, error in failures.items():
+        logging.error(f"Failed to delete legacy alarm {alarm_name}: {error}")
+    print(
+        f"Legacy Alarms Deleted: {len(deleted)}, Kept (no current alarm): {kept}, Failed: {len(failures)}"
+    )
 
 
 def check_sns_exists(sns, sns_topic_arn):
@@ -552,15 +890,19 @@ def check_sns_exists(sns, sns_topic_arn):
 
 def initialize_aws_clients(region):
     try:
-        ec2 = boto3.client(
-            "ec2", region_name=region, endpoint_url=Config.VPC_ENDPOINT_EC2
-        )
-        cloudwatch = boto3.client(
-            "cloudwatch", region_name=region, endpoint_url=Config.VPC_ENDPOINT_CW
+        ec2 = get_client(
+            "ec2",
+            region=region,
+            endpoint_url=Config.VPC_ENDPOINT_EC2,
+            rate_limited=True,
         )
-        sns = boto3.client(
-            "sns", region_name=region, endpoint_url=Config.VPC_ENDPOINT_SNS
+        cloudwatch = get_client(
+            "cloudwatch",
+            region=region,
+            endpoint_url=Config.VPC_ENDPOINT_CW,
+            rate_limited=True,
         )
+        sns = get_client("sns", region=region, endpoint_url=Config.VPC_ENDPOINT_SNS)
         logging.info(f"Initilized AWS Client in region {region}")
     except Exception as e:
         logging.error(f"Failed to initialize AWS clients: {e}")
@@ -581,7 +923,7 @@ def parse_args():
     parser.add_argument(
         "--alarm-type",
         type=lambda x: x.lower(),
-        choices=["all", "impairedvol", "readlatency", "writelatency"],
+        choices=["all"] + ALARM_TYPES,
         help=f"Which alarm type to process. Options are All, ImpairedVol, ReadLatency, and WriteLatency. Default is All.",
     )
     parser.add_argument(
@@ -596,6 +938,55 @@ def parse_args():
     parser.add_argument(
         "--cleanup", action="store_true", help="Cleanup CloudWatch Alarms."
     )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update CloudWatch Alarms whose thresholds, periods, or actions have drifted.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help=f"Compute the create/update/delete plan and write it to {Config.PLAN_FILE} without changing any alarms.",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        metavar="PLAN_FILE",
+        help="Apply a plan previously written with --plan.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.WORKERS,
+        help=f"Number of concurrent workers used to put alarms. Default is {Config.WORKERS}.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const=Config.CHECKPOINT_FILE,
+        metavar="CHECKPOINT_FILE",
+        help=f"Record each finished alarm in a checkpoint file (default {Config.CHECKPOINT_FILE}). If the file already exists, the run resumes from it: its plan is applied again without listing volumes or alarms, skipping the alarms already done.",
+    )
+    parser.add_argument(
+        "--cleanup-legacy",
+        action="store_true",
+        help="Delete the alarms named by earlier versions of the EBS alarm tools (for example ImpairedVol_<volume id>) once the volume has its current alarm.",
+    )
+    parser.add_argument(
+        "--consolidate-by",
+        metavar="TagName",
+        help=f"Instead of one alarm per volume and alarm type, create consolidated metric math alarms ({Config.ALARM_GROUP_NAME_PREFIX}...) for the volumes grouped by the value of this tag. Works with --create, --update, --cleanup and --all.",
+    )
+    parser.add_argument(
+        "--show-tripped",
+        action="store_true",
+        help="List the consolidated alarms in ALARM state and the volumes that tripped them.",
+    )
+    parser.add_argument(
+        "--inventory-cache",
+        choices=CacheConfig.MODES,
+        default="auto",
+        help=f"How to use the volume inventory cache in {CacheConfig.CACHE_FILE}: auto (reuse for {CacheConfig.TTL}s, then refresh what changed), delta, full, or off. Default is auto.",
+    )
     parser.add_argument(
         "--region",
         default=Config.DEFAULT_REGION,
@@ -608,7 +999,14 @@ def parse_args():
     )
     parser.add_argument("--verbose", action="store_true", help="Verbose logging.")
     parser.add_argument("--debug", action="store_true", help="Debug logging.")
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.consolidate_by and (
+        args.tag or args.plan or args.apply_plan or args.checkpoint
+    ):
+        parser.error(
+            "--consolidate-by cannot be combined with --tag, --plan, --apply-plan or --checkpoint"
+        )
+    return args
 
 
 if __name__ == "__main__":
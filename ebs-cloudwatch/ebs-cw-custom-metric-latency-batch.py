@@ -1,8 +1,28 @@
-import boto3
 import time
 import logging
-from datetime import datetime
+import queue
+import threading
+import signal
+import bisect
+from datetime import datetime, timedelta, timezone
 import argparse
+from ebs_clients import get_client
+from ebs_inventory_cache import (
+    get_cached_volumes,
+    iter_cached_volumes,
+    Config as CacheConfig,
+)
+from ebs_latency import (
+    build_latency_metric_data,
+    count_gaps,
+    count_volumes,
+    decode_latency_batch,
+    decode_latency_window,
+    format_latency_summary,
+    latency_summary,
+    missing_volume_ids,
+)
+from ebs_rate_limiter import log_rate_limiter_stats
 
 
 class Config:
@@ -11,6 +31,13 @@ class Config:
     GET_BATCH_SIZE = 500
     PUT_BATCH_SIZE = 1000
     CW_CUSTOM_NAMESPACE = "Custom_EBS"
+    WORKERS = 1  # Number of concurrent GetMetricData/PutMetricData workers. 1 keeps the original serial behavior.
+    PIPELINE_QUEUE_DEPTH = 2  # Batches buffered per worker between pipeline stages before the producer blocks (backpressure).
+    WINDOW_PERIODS = 1  # 60s periods fetched per GetMetricData call. 1 keeps the original latest-value sampling.
+    WINDOW_DELAY = 120  # Seconds a window ends before now, so late EBS datapoints are included.
+    DAEMON_START_OFFSET = 5  # Seconds after the minute boundary a daemon cycle starts
+    DAEMON_STATS_EVERY = 60  # Daemon cycles between timing histogram log lines
+    HISTOGRAM_BUCKETS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600]  # Upper bounds in seconds
 
 
 def main():
@@ -21,6 +48,10 @@ def main():
         --repeat: Number of times to repeat the process. Default is 1.
         --sleep: Number of seconds to sleep between repeats. Default is 5.
         --validate: Validate that custom metrics are published to CloudWatch.
+        --workers: Number of concurrent workers. Default is 1 (serial).
+        --inventory-cache: How to use the on-disk volume inventory cache. Default is auto.
+        --window: Number of 60s periods to fetch and publish per run. Default is 1.
+        --daemon: Run until stopped, one cycle every --window minutes on the minute.
         --verbose: Enable verbose logging for debugging.
     """
     args = parse_args()
@@ -29,6 +60,13 @@ def main():
     repeat_count = args.repeat
     sleep_time = args.sleep
     validate = args.validate
+    workers = args.workers
+    inventory_cache = args.inventory_cache
+    window_periods = args.window
+
+    if args.daemon:
+        run_daemon(validate, workers, inventory_cache, window_periods)
+        return
 
     overall_success = True
 
@@ -50,7 +88,13 @@ def main():
                 volumes_without_metrics,
                 validate_success_count,
                 validate_failure_count,
-            ) = run_custom_metrics_batch(validate)
+            ) = (
+                run_custom_metrics_pipeline(
+                    validate, workers, inventory_cache, window_periods
+                )
+                if workers > 1
+                else run_custom_metrics_batch(validate, inventory_cache, window_periods)
+            )
             overall_validate_success_count += validate_success_count
             overall_validate_failure_count += validate_failure_count
         except Exception as e:
@@ -80,6 +124,8 @@ def main():
                 time.sleep(1)
             print("\rContinuing...                    ")
 
+    log_rate_limiter_stats()
+
     if overall_success:
         print("Script executed successfully.")
     else:
@@ -91,11 +137,173 @@ def main():
         )
 
 
-def run_custom_metrics_batch(validate):
+class CycleHistogram:
+    """
+    Fixed-bucket histogram of cycle timings in seconds (Config.HISTOGRAM_BUCKETS upper
+    bounds plus an overflow bucket), kept for the life of the daemon.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(Config.HISTOGRAM_BUCKETS) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(Config.HISTOGRAM_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def count(self):
+        return sum(self.counts)
+
+    def format(self):
+        if not self.count():
+            return f"{self.name}: no samples"
+        labels = [f"<={bound}s" for bound in Config.HISTOGRAM_BUCKETS]
+        labels.append(f">{Config.HISTOGRAM_BUCKETS[-1]}s")
+        buckets = " ".join(
+            f"{label}:{count}"
+            for label, count in zip(labels, self.counts)
+            if count
+        )
+        return (
+            f"{self.name}: n={self.count()} avg={self.total / self.count():.2f}s "
+            f"max={self.maximum:.2f}s [{buckets}]"
+        )
+
+
+def run_daemon(validate, workers, inventory_cache, window_periods):
+    """
+    Runs the publisher until SIGINT/SIGTERM. Cycles are scheduled on a fixed grid of
+    minute boundaries (plus Config.DAEMON_START_OFFSET), one every window_periods
+    minutes, so the schedule does not drift with cycle duration. Clients stay cached by
+    get_client and the volume inventory is kept in memory between cycles, refreshed
+    from ebs_inventory_cache every CacheConfig.TTL seconds.
+    A cycle that overruns the next slot is never run concurrently with the next one:
+    the missed slots are skipped and counted, and the next cycle starts on the grid.
+    Parameters:
+        validate (bool): Whether to validate that metrics are successfully published.
+        workers (int): Number of concurrent workers, see run_custom_metrics_pipeline.
+        inventory_cache (str): Volume inventory cache mode, see ebs_inventory_cache.py.
+        window_periods (int): Number of 60s periods to fetch and publish per cycle.
+    """
+    interval = Config.TIME_INTERVAL * max(window_periods, 1)
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info(f"Received signal {signum}, stopping after the current cycle.")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    histograms = {
+        "start delay": CycleHistogram("start delay"),
+        "cycle duration": CycleHistogram("cycle duration"),
+        "publish lag": CycleHistogram("publish lag"),
+    }
+    cycles = 0
+    failed_cycles = 0
+    skipped_slots = 0
+
+    volumes = None
+    inventory_refreshed = 0.0
+
+    # First slot on the next minute boundary, then every interval seconds
+    first_slot = (time.time() // 60 + 1) * 60 + Config.DAEMON_START_OFFSET
+    next_slot = first_slot
+    logging.info(
+        f"Daemon mode: one cycle every {interval}s, first at "
+        f"{datetime.fromtimestamp(first_slot).strftime('%H:%M:%S')}"
+    )
+
+    while not stop_event.wait(max(0.0, next_slot - time.time())):
+        slot = next_slot
+        cycle_start = time.time()
+        histograms["start delay"].add(cycle_start - slot)
+
+        try:
+            if volumes is None or cycle_start - inventory_refreshed >= CacheConfig.TTL:
+                _, ec2 = initialize_aws_services()
+                volumes = get_cached_volumes(ec2, mode=inventory_cache)
+                inventory_refreshed = cycle_start
+
+            (
+                volumes_processed,
+                volumes_with_metrics,
+                volumes_without_metrics,
+                _,
+                _,
+            ) = (
+                run_custom_metrics_pipeline(
+                    validate, workers, inventory_cache, window_periods, volumes
+                )
+                if workers > 1
+                else run_custom_metrics_batch(
+                    validate, inventory_cache, window_periods, volumes
+                )
+            )
+        except Exception as e:
+            logging.error(f"Error occurred during daemon cycle {cycles + 1}: {e}")
+            failed_cycles += 1
+            volumes = None  # Reload the inventory on the next cycle
+        else:
+            cycle_end = time.time()
+            histograms["cycle duration"].add(cycle_end - cycle_start)
+            # Age of the newest period published, when the cycle finished
+            histograms["publish lag"].add(
+                cycle_end - get_data_end_time(window_periods, cycle_start)
+            )
+            logging.info(
+                f"Cycle {cycles + 1}: processed {volumes_processed} volumes in "
+                f"{cycle_end - cycle_start:.2f} seconds. {volumes_with_metrics} "
+                f"volumes have CW metrics. {volumes_without_metrics} did not."
+            )
+
+        cycles += 1
+        if cycles % Config.DAEMON_STATS_EVERY == 0:
+            log_daemon_stats(histograms, cycles, failed_cycles, skipped_slots)
+
+        # Next slot on the grid after now. Slots passed while the cycle ran are skipped.
+        next_slot = slot + interval
+        if time.time() >= next_slot:
+            missed = int((time.time() - next_slot) // interval) + 1
+            skipped_slots += missed
+            next_slot += missed * interval
+            logging.warning(
+                f"Cycle overran its {interval}s slot, skipped {missed} slots."
+            )
+
+    log_daemon_stats(histograms, cycles, failed_cycles, skipped_slots)
+    log_rate_limiter_stats()
+
+
+def get_data_end_time(window_periods, now):
+    # End of the newest period a cycle started at now publishes
+    window = get_metric_window(window_periods, now)
+    return window[1].timestamp() if window else now
+
+
+def log_daemon_stats(histograms, cycles, failed_cycles, skipped_slots):
+    logging.info(
+        f"Daemon stats after {cycles} cycles: {failed_cycles} failed, "
+        f"{skipped_slots} slots skipped"
+    )
+    for histogram in histograms.values():
+        logging.info(histogram.format())
+
+
+def run_custom_metrics_batch(
+    validate, inventory_cache="auto", window_periods=1, volumes=None
+):
     """
     Calculates and publishes custom EBS metrics in batch mode.
     Parameters:
         validate (bool): Whether to validate that metrics are successfully published.
+        inventory_cache (str): Volume inventory cache mode, see ebs_inventory_cache.py.
+        window_periods (int): Number of 60s periods to fetch and publish, see get_metric_window.
+        volumes (dict): Volume inventory to use instead of loading it (daemon mode).
     Returns:
         tuple: A tuple containing various metrics and validation counts.
     """
@@ -104,10 +312,10 @@ def run_custom_metrics_batch(validate):
 
     cloudwatch, ec2 = initialize_aws_services()
 
-    paginator = ec2.get_paginator("describe_volumes")
-    page_iterator = paginator.paginate(
-        PaginationConfig={"PageSize": Config.PAGINATION_COUNT}
-    )
+    if volumes is None:
+        volumes = get_cached_volumes(ec2, mode=inventory_cache)
+    window = get_metric_window(window_periods)
+    log_metric_window(window, window_periods)
 
     metric_queries = []
     custom_metrics = []
@@ -118,90 +326,26 @@ def run_custom_metrics_batch(validate):
     validate_success_count = 0
     validate_failure_count = 0
 
-    for page in page_iterator:
-        for volume in page["Volumes"]:
-            volumes_processed += 1
-            volume_id = volume["VolumeId"]
-            safe_volume_id = volume_id.replace("-", "_")
-
-            # Add the metric queries for this volume
-            metric_queries.extend(
-                [
-                    # Read metrics
-                    {
-                        "Id": f"read_time_{safe_volume_id}",
-                        "MetricStat": {
-                            "Metric": {
-                                "Namespace": "AWS/EBS",
-                                "MetricName": "VolumeTotalReadTime",
-                                "Dimensions": [
-                                    {"Name": "VolumeId", "Value": volume_id}
-                                ],
-                            },
-                            "Period": 60,
-                            "Stat": "Sum",
-                        },
-                    },
-                    {
-                        "Id": f"read_ops_{safe_volume_id}",
-                        "MetricStat": {
-                            "Metric": {
-                                "Namespace": "AWS/EBS",
-                                "MetricName": "VolumeReadOps",
-                                "Dimensions": [
-                                    {"Name": "VolumeId", "Value": volume_id}
-                                ],
-                            },
-                            "Period": 60,
-                            "Stat": "Sum",
-                        },
-                    },
-                    # Write metrics
-                    {
-                        "Id": f"write_time_{safe_volume_id}",
-                        "MetricStat": {
-                            "Metric": {
-                                "Namespace": "AWS/EBS",
-                                "MetricName": "VolumeTotalWriteTime",
-                                "Dimensions": [
-                                    {"Name": "VolumeId", "Value": volume_id}
-                                ],
-                            },
-                            "Period": 60,
-                            "Stat": "Sum",
-                        },
-                    },
-                    {
-                        "Id": f"write_ops_{safe_volume_id}",
-                        "MetricStat": {
-                            "Metric": {
-                                "Namespace": "AWS/EBS",
-                                "MetricName": "VolumeWriteOps",
-                                "Dimensions": [
-                                    {"Name": "VolumeId", "Value": volume_id}
-                                ],
-                            },
-                            "Period": 60,
-                            "Stat": "Sum",
-                        },
-                    },
-                ]
-            )
+    for volume_id in volumes:
+        volumes_processed += 1
 
-            # Process in batches
-            if len(metric_queries) == Config.GET_BATCH_SIZE:
-                new_volumes_with_metrics, new_volumes_without_metrics = process_metrics(
-                    cloudwatch, metric_queries, custom_metrics
-                )
+        # Add the metric queries for this volume
+        metric_queries.extend(build_metric_queries(volume_id))
 
-                volumes_with_metrics += new_volumes_with_metrics
-                volumes_without_metrics += new_volumes_without_metrics
-                metric_queries = []
+        # Process in batches
+        if len(metric_queries) == Config.GET_BATCH_SIZE:
+            new_volumes_with_metrics, new_volumes_without_metrics = process_metrics(
+                cloudwatch, metric_queries, custom_metrics, window
+            )
+
+            volumes_with_metrics += new_volumes_with_metrics
+            volumes_without_metrics += new_volumes_without_metrics
+            metric_queries = []
 
     # Process remaining metrics
     if metric_queries:
         new_volumes_with_metrics, new_volumes_without_metrics = process_metrics(
-            cloudwatch, metric_queries, custom_metrics
+            cloudwatch, metric_queries, custom_metrics, window
         )
         volumes_with_metrics += new_volumes_with_metrics
         volumes_without_metrics += new_volumes_without_metrics
@@ -230,95 +374,356 @@ def run_custom_metrics_batch(validate):
     )
 
 
-def process_metrics(cloudwatch, metric_queries, custom_metrics):
+def build_metric_queries(volume_id):
+    """
+    Builds the four GetMetricData queries needed to calculate latency for one volume.
+    Parameters:
+        volume_id (str): The EBS volume ID.
+    Returns:
+        list: Metric queries for VolumeTotalReadTime, VolumeReadOps, VolumeTotalWriteTime and VolumeWriteOps.
+    """
+    safe_volume_id = volume_id.replace("-", "_")
+    queries = []
+    for id_prefix, metric_name in [
+        ("read_time", "VolumeTotalReadTime"),
+        ("read_ops", "VolumeReadOps"),
+        ("write_time", "VolumeTotalWriteTime"),
+        ("write_ops", "VolumeWriteOps"),
+    ]:
+        queries.append(
+            {
+                "Id": f"{id_prefix}_{safe_volume_id}",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": "AWS/EBS",
+                        "MetricName": metric_name,
+                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
+                    },
+                    "Period": 60,
+                    "Stat": "Sum",
+                },
+            }
+        )
+    return queries
+
+
+def run_custom_metrics_pipeline(
+    validate, workers, inventory_cache="auto", window_periods=1, volumes=None
+):
+    """
+    Calculates and publishes custom EBS metrics using a bounded producer/consumer pipeline.
+    Volume listing, GetMetricData batches and PutMetricData batches run in separate
+    stages connected by bounded queues, so a slow stage blocks the stage feeding it
+    instead of buffering the whole fleet in memory. The volume IDs are streamed with
+    iter_cached_volumes: page by page from describe_volumes with inventory_cache "off",
+    otherwise from the snapshot cursor once the snapshot is refreshed, so the first
+    GetMetricData batch is queued as soon as its volumes are read.
+    Parameters:
+        validate (bool): Whether to validate that metrics are successfully published.
+        workers (int): Number of concurrent GetMetricData and PutMetricData workers.
+        inventory_cache (str): Volume inventory cache mode, see ebs_inventory_cache.py.
+        window_periods (int): Number of 60s periods to fetch and publish, see get_metric_window.
+        volumes (dict): Volume inventory to use instead of loading it (daemon mode).
+    Returns:
+        tuple: A tuple containing various metrics and validation counts.
+    """
+
+    logging.info(
+        f"Starting custom EBS metrics calculation in pipeline mode with {workers} workers."
+    )
+
+    # Each worker needs its own HTTP connection or the pool becomes the bottleneck.
+    cloudwatch, ec2 = initialize_aws_services(max_pool_connections=workers * 2 + 2)
+
+    get_queue = queue.Queue(maxsize=workers * Config.PIPELINE_QUEUE_DEPTH)
+    put_queue = queue.Queue(maxsize=workers * Config.PIPELINE_QUEUE_DEPTH)
+    stop_sentinel = None
+
+    stats = {
+        "volumes_processed": 0,
+        "volumes_with_metrics": 0,
+        "volumes_without_metrics": 0,
+        "validate_success_count": 0,
+        "validate_failure_count": 0,
+        "get_calls": 0,
+        "put_calls": 0,
+    }
+    stats_lock = threading.Lock()
+    errors = []
+    window = get_metric_window(window_periods)  # Same window for every batch
+    log_metric_window(window, window_periods)
+
+    def add_stats(**counts):
+        with stats_lock:
+            for key, value in counts.items():
+                stats[key] += value
+
+    def produce_volume_batches():
+        metric_queries = []
+        try:
+            volume_ids = (
+                iter(volumes)
+                if volumes is not None
+                else (
+                    volume["VolumeId"]
+                    for volume in iter_cached_volumes(
+                        ec2, mode=inventory_cache, fields=["VolumeId"]
+                    )
+                )
+            )
+            for volume_id in volume_ids:
+                add_stats(volumes_processed=1)
+                metric_queries.extend(build_metric_queries(volume_id))
+
+                if len(metric_queries) == Config.GET_BATCH_SIZE:
+                    get_queue.put(metric_queries)  # Blocks when workers fall behind
+                    metric_queries = []
+
+                    if errors:
+                        logging.error(
+                            "Stopping volume batching after a pipeline error."
+                        )
+                        return
+
+            if metric_queries:
+                get_queue.put(metric_queries)
+        except Exception as e:
+            logging.error(f"Error listing volumes: {e}")
+            errors.append(e)
+        finally:
+            for _ in range(workers):
+                get_queue.put(stop_sentinel)
+
+    def get_metrics_worker():
+        while True:
+            metric_queries = get_queue.get()
+            if metric_queries is stop_sentinel:
+                break
+            if errors:
+                continue  # Keep draining so the producer never blocks forever
+
+            custom_metrics = []
+            try:
+                new_volumes_with_metrics, new_volumes_without_metrics = process_metrics(
+                    cloudwatch, metric_queries, custom_metrics, window
+                )
+            except Exception as e:
+                errors.append(e)
+                continue
+
+            add_stats(
+                volumes_with_metrics=new_volumes_with_metrics,
+                volumes_without_metrics=new_volumes_without_metrics,
+                get_calls=1,
+            )
+            if custom_metrics:
+                put_queue.put(custom_metrics)
+
+    def put_metrics_worker():
+        pending_metrics = []
+
+        def flush(batch):
+            cloudwatch.put_metric_data(
+                Namespace=Config.CW_CUSTOM_NAMESPACE, MetricData=batch
+            )
+            add_stats(put_calls=1)
+
+            if validate:
+                if validate_custom_metrics(cloudwatch, batch):
+                    add_stats(validate_success_count=len(batch))
+                else:
+                    add_stats(validate_failure_count=len(batch))
+
+        while True:
+            custom_metrics = put_queue.get()
+            if custom_metrics is stop_sentinel:
+                break
+            if errors:
+                continue
+
+            pending_metrics.extend(custom_metrics)
+            try:
+                while len(pending_metrics) >= Config.PUT_BATCH_SIZE:
+                    flush(pending_metrics[: Config.PUT_BATCH_SIZE])
+                    pending_metrics = pending_metrics[Config.PUT_BATCH_SIZE :]
+            except Exception as e:
+                logging.error(f"Error putting metric data: {e}")
+                errors.append(e)
+
+        if pending_metrics and not errors:
+            try:
+                for i in range(0, len(pending_metrics), Config.PUT_BATCH_SIZE):
+                    flush(pending_metrics[i : i + Config.PUT_BATCH_SIZE])
+            except Exception as e:
+                logging.error(f"Error putting metric data: {e}")
+                errors.append(e)
+
+    producer = threading.Thread(target=produce_volume_batches, name="ebs-producer")
+    get_workers = [
+        threading.Thread(target=get_metrics_worker, name=f"ebs-get-{i}")
+        for i in range(workers)
+    ]
+    put_workers = [
+        threading.Thread(target=put_metrics_worker, name=f"ebs-put-{i}")
+        for i in range(workers)
+    ]
+
+    for thread in [producer] + get_workers + put_workers:
+        thread.start()
+
+    producer.join()
+    for thread in get_workers:
+        thread.join()
+
+    # All GetMetricData work is done, tell the publishers to flush and exit.
+    for _ in put_workers:
+        put_queue.put(stop_sentinel)
+    for thread in put_workers:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    logging.info(
+        f"Custom metrics updated for all volumes in pipeline mode "
+        f"({stats['get_calls']} GetMetricData calls, {stats['put_calls']} PutMetricData calls)."
+    )
+
+    return (
+        stats["volumes_processed"],
+        stats["volumes_with_metrics"],
+        stats["volumes_without_metrics"],
+        stats["validate_success_count"],
+        stats["validate_failure_count"],
+    )
+
+
+def get_metric_window(window_periods, now=None):
+    """
+    Returns the (StartTime, EndTime) of a window of window_periods complete 60s periods,
+    aligned to the minute and ending Config.WINDOW_DELAY seconds before now (a Unix
+    timestamp, default the current time). Returns None
+    for a single period, which keeps the original sliding "last TIME_INTERVAL seconds"
+    query and publishes the latest value without a timestamp.
+    Run every window_periods minutes, consecutive windows meet without gaps or overlap.
+    """
+    if window_periods <= 1:
+        return None
+
+    if now is None:
+        now = time.time()
+    end_time = datetime.fromtimestamp(now, timezone.utc) - timedelta(
+        seconds=Config.WINDOW_DELAY
+    )
+    end_time = end_time.replace(second=0, microsecond=0)
+    start_time = end_time - timedelta(seconds=Config.TIME_INTERVAL * window_periods)
+    return start_time, end_time
+
+
+def log_metric_window(window, window_periods):
+    if window is not None:
+        start_time, end_time = window
+        logging.info(
+            f"Fetching {window_periods} periods from {start_time:%H:%M} to {end_time:%H:%M} UTC"
+        )
+
+
+def get_metric_data_results(cloudwatch, metric_queries, window):
+    """
+    Runs one GetMetricData batch and returns its MetricDataResults. A window of several
+    periods can return more datapoints than fit in one response, so the NextToken pages
+    are followed and returned together.
+    """
+    if window is None:
+        start_time = time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - Config.TIME_INTERVAL)
+        )
+        end_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    else:
+        start_time, end_time = window
+
+    results = []
+    next_token = None
+    while True:
+        kwargs = {
+            "MetricDataQueries": metric_queries,
+            "StartTime": start_time,
+            "EndTime": end_time,
+        }
+        if next_token:
+            kwargs["NextToken"] = next_token
+        response = cloudwatch.get_metric_data(**kwargs)
+
+        if not response or "MetricDataResults" not in response:
+            logging.error("No metric data returned from CloudWatch")
+            raise ValueError(
+                "Invalide API response or no metric data returned from CloudWatch"
+            )
+
+        logging.debug("Response for get_metric_data is %s", response)
+        results.extend(response["MetricDataResults"])
+
+        next_token = response.get("NextToken")
+        if not next_token:
+            return results
+
+
+def process_metrics(cloudwatch, metric_queries, custom_metrics, window=None):
     """
     Processes the metrics queries to calculate custom metrics.
     Parameters:
         cloudwatch (boto3.client): CloudWatch client.
         metric_queries (list): List of metric queries.
         custom_metrics (list): List to store calculated custom metrics.
+        window (tuple): (StartTime, EndTime) from get_metric_window, or None for the
+            latest value only. With a window, one entry per period is published, with
+            the period's Timestamp, and periods without complete data are skipped.
     Returns:
         tuple: A tuple containing counts of volumes with and without metrics.
     """
-    volumes_with_metrics = 0
-    volumes_without_metrics = 0
-
     try:
-        response = cloudwatch.get_metric_data(
-            MetricDataQueries=metric_queries,
-            StartTime=time.strftime(
-                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - Config.TIME_INTERVAL)
-            ),
-            EndTime=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        )
+        results = get_metric_data_results(cloudwatch, metric_queries, window)
     except Exception as e:
         logging.error(f"Error getting metric data: {e}")
         raise
 
-    if not response or "MetricDataResults" not in response:
-        logging.error("No metric data returned from CloudWatch")
-        raise ValueError(
-            "Invalide API response or no metric data returned from CloudWatch"
-        )
+    # Decode the whole batch into latency columns (vectorized when NumPy is installed)
+    if window is None:
+        batch = decode_latency_batch(metric_queries, results)
+    else:
+        batch = decode_latency_window(metric_queries, results)
+    volumes_with_metrics, volumes_without_metrics = count_volumes(batch)
 
-    logging.debug("Response for get_metric_data is %s", response)
+    for volume_id in missing_volume_ids(batch):
+        logging.warning(f"Metrics data missing for volume {volume_id}")
 
-    # Process the response and update custom_metrics
-    for i in range(0, len(response["MetricDataResults"]), 4):
-        # Check if the Values list has data for each metric
-        if all(response["MetricDataResults"][j]["Values"] for j in range(i, i + 4)):
-            total_read_time = response["MetricDataResults"][i]["Values"][-1]
-            read_ops = response["MetricDataResults"][i + 1]["Values"][-1]
-            total_write_time = response["MetricDataResults"][i + 2]["Values"][-1]
-            write_ops = response["MetricDataResults"][i + 3]["Values"][-1]
-            volumes_with_metrics += 1
+    if window is not None:
+        gaps = count_gaps(batch)
+        if gaps:
+            logging.info(f"Skipped {gaps} periods without complete data")
 
-        else:
-            logging.warning(
-                f"Metrics data missing for volume with ID derived from {metric_queries[i]['Id']}"
-            )
-            volumes_without_metrics += 1
-            continue
+    custom_metrics.extend(build_latency_metric_data(batch))
 
-        # Perform the calculations
-        read_latency = (total_read_time / read_ops) * 1000 if read_ops != 0 else 0
-        write_latency = (total_write_time / write_ops) * 1000 if write_ops != 0 else 0
-        total_latency = read_latency + write_latency
-
-        # Extract volume_id from the query
-        # volume_id = metric_queries[i]["MetricStat"]["Metric"]["Dimensions"][0]["Value"]
-        # volume_id = metric_queries[i]["Id"].split("_")[-1]
-        safe_volume_id = metric_queries[i]["Id"].split("_", 2)[-1]
-        volume_id = safe_volume_id.replace("_", "-")
-
-        # Add to custom_metrics
-        custom_metrics.extend(
-            [
-                {
-                    "MetricName": "VolumeReadLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": read_latency,
-                },
-                {
-                    "MetricName": "VolumeWriteLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": write_latency,
-                },
-                {
-                    "MetricName": "VolumeTotalLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": total_latency,
-                },
-            ]
-        )
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for index, volume_id in enumerate(batch["volume_ids"]):
+            if not batch["has_data"][index]:
+                continue
+            period = (
+                f" at {batch['timestamps'][index]:%H:%M}" if "timestamps" in batch else ""
+            )
+            logging.debug(
+                f"Latency metrics updated for volume {volume_id}{period}: "
+                f"Read L = {batch['read_latency'][index]:.2f} ms "
+                f"(Rt {batch['read_time'][index]:.2f} / Rops {batch['read_ops'][index]:.2f}), "
+                f"Write L = {batch['write_latency'][index]:.2f} ms "
+                f"(Wt {batch['write_time'][index]:.2f} / Wops {batch['write_ops'][index]:.2f}), "
+                f"Total L = {batch['total_latency'][index]:.2f} ms"
+            )
 
+    summary = latency_summary(batch)
+    if summary:
         logging.info(
-            f"Latency metrics updated for volume {volume_id}: "
-            f"Read L = {read_latency:.2f} ms "
-            f"(Rt {total_read_time:.2f} / Rops {read_ops:.2f}), "
-            f"Write L = {write_latency:.2f} ms "
-            f"(Wt {total_write_time:.2f} / Wops {read_ops:.2f}), "
-            f"Total L = {total_latency:.2f} ms {read_latency:.2f}+{write_latency:.2f}"
+            f"Latency for {volumes_with_metrics} volumes: {format_latency_summary(summary)}"
         )
 
     return volumes_with_metrics, volumes_without_metrics
@@ -353,10 +758,14 @@ def validate_custom_metrics(cloudwatch, custom_metrics_batch, verbose=False):
     return False
 
 
-def initialize_aws_services():
+def initialize_aws_services(max_pool_connections=None):
     try:
-        cloudwatch = boto3.client("cloudwatch")
-        ec2 = boto3.client("ec2")
+        cloudwatch = get_client(
+            "cloudwatch", max_pool_connections=max_pool_connections, rate_limited=True
+        )
+        ec2 = get_client(
+            "ec2", max_pool_connections=max_pool_connections, rate_limited=True
+        )
         return cloudwatch, ec2
     except Exception as e:
         logging.error(f"Failed to initialize AWS services: {e}")
@@ -399,6 +808,29 @@ def parse_args():
         action="store_true",
         help="Validate that the custom metrics are published to CloudWatch.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.WORKERS,
+        help=f"Number of concurrent GetMetricData/PutMetricData workers. Default is {Config.WORKERS} (serial).",
+    )
+    parser.add_argument(
+        "--inventory-cache",
+        choices=CacheConfig.MODES,
+        default="auto",
+        help=f"How to use the volume inventory cache in {CacheConfig.CACHE_FILE}: auto (reuse for {CacheConfig.TTL}s, then refresh what changed), delta, full, or off. Default is auto.",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=Config.WINDOW_PERIODS,
+        help=f"Number of 60s periods to fetch per GetMetricData call and publish with their timestamps. Run the script every N minutes with --window N. Default is {Config.WINDOW_PERIODS} (latest value only).",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run until stopped (Ctrl-C or SIGTERM), starting a cycle every --window minutes on the minute boundary, and log cycle timing histograms. --repeat and --sleep are ignored.",
+    )
     parser.add_argument(
         "--verbose", action="store_true", help="Enable verbose logging for debugging."
     )
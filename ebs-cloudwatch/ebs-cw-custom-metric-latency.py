@@ -1,8 +1,16 @@
-import boto3
 import time
 import logging
 from datetime import datetime
 import argparse
+from ebs_clients import get_client
+from ebs_latency import (
+    build_latency_metric_data,
+    count_volumes,
+    decode_latency_batch,
+    format_latency_summary,
+    latency_summary,
+    missing_volume_ids,
+)
 
 
 class Config:
@@ -78,8 +86,8 @@ def run_custom_metrics():
         f"Starting custom EBS metrics calculation. Config.PAGINATION_COUNT: {Config.PAGINATION_COUNT}"
     )
 
-    cloudwatch = boto3.client("cloudwatch")
-    ec2 = boto3.client("ec2")
+    cloudwatch = get_client("cloudwatch")
+    ec2 = get_client("ec2")
 
     paginator = ec2.get_paginator("describe_volumes")
     page_iterator = paginator.paginate(
@@ -216,8 +224,8 @@ def run_custom_metrics():
 def run_custom_metrics_batch():
     logging.info("Starting custom EBS metrics calculation in batch mode.")
 
-    cloudwatch = boto3.client("cloudwatch")
-    ec2 = boto3.client("ec2")
+    cloudwatch = get_client("cloudwatch")
+    ec2 = get_client("ec2")
 
     paginator = ec2.get_paginator("describe_volumes")
     page_iterator = paginator.paginate(
@@ -324,60 +332,32 @@ def process_metrics(cloudwatch, metric_queries, custom_metrics):
 
     logging.debug("Response for get_metric_data is %s", response)
 
-    # Process the response and update custom_metrics
-    for i in range(0, len(response["MetricDataResults"]), 4):
-        # Check if the Values list has data for each metric
-        if all(response["MetricDataResults"][j]["Values"] for j in range(i, i + 4)):
-            total_read_time = response["MetricDataResults"][i]["Values"][-1]
-            read_ops = response["MetricDataResults"][i + 1]["Values"][-1]
-            total_write_time = response["MetricDataResults"][i + 2]["Values"][-1]
-            write_ops = response["MetricDataResults"][i + 3]["Values"][-1]
-
-        else:
-            logging.warning(
-                f"Metrics data missing for volume with ID derived from {metric_queries[i]['Id']}"
+    # Decode the whole batch into latency columns (vectorized when NumPy is installed)
+    batch = decode_latency_batch(metric_queries, response["MetricDataResults"])
+
+    for volume_id in missing_volume_ids(batch):
+        logging.warning(f"Metrics data missing for volume {volume_id}")
+
+    custom_metrics.extend(build_latency_metric_data(batch))
+
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        for index, volume_id in enumerate(batch["volume_ids"]):
+            if not batch["has_data"][index]:
+                continue
+            logging.debug(
+                f"Latency metrics updated for volume {volume_id}: "
+                f"Read L = {batch['read_latency'][index]:.2f} ms "
+                f"(Rt {batch['read_time'][index]:.2f} / Rops {batch['read_ops'][index]:.2f}), "
+                f"Write L = {batch['write_latency'][index]:.2f} ms "
+                f"(Wt {batch['write_time'][index]:.2f} / Wops {batch['write_ops'][index]:.2f}), "
+                f"Total L = {batch['total_latency'][index]:.2f} ms"
             )
-            continue
-
-        # Perform the calculations
-        read_latency = (total_read_time / read_ops) * 1000 if read_ops != 0 else 0
-        write_latency = (total_write_time / write_ops) * 1000 if write_ops != 0 else 0
-        total_latency = read_latency + write_latency
-
-        # Extract volume_id from the query
-        # volume_id = metric_queries[i]["MetricStat"]["Metric"]["Dimensions"][0]["Value"]
-        # volume_id = metric_queries[i]["Id"].split("_")[-1]
-        safe_volume_id = metric_queries[i]["Id"].split("_", 2)[-1]
-        volume_id = safe_volume_id.replace("_", "-")
-
-        # Add to custom_metrics
-        custom_metrics.extend(
-            [
-                {
-                    "MetricName": "VolumeReadLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": read_latency,
-                },
-                {
-                    "MetricName": "VolumeWriteLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": write_latency,
-                },
-                {
-                    "MetricName": "VolumeTotalLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": total_latency,
-                },
-            ]
-        )
 
+    summary = latency_summary(batch)
+    if summary:
+        volumes_with_metrics, _ = count_volumes(batch)
         logging.info(
-            f"Latency metrics updated for volume {volume_id}: "
-            f"Read L = {read_latency:.2f} ms "
-            f"(Rt {total_read_time:.2f} / Rops {read_ops:.2f}), "
-            f"Write L = {write_latency:.2f} ms "
-            f"(Wt {total_write_time:.2f} / Wops {read_ops:.2f}), "
-            f"Total L = {total_latency:.2f} ms {read_latency:.2f}+{write_latency:.2f}"
+            f"Latency for {volumes_with_metrics} volumes: {format_latency_summary(summary)}"
         )
 
 
@@ -1,9 +1,12 @@
-import boto3
 import time
+import bisect
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import argparse
 from tabulate import tabulate
+from ebs_clients import get_client
 
 
 class Config:
@@ -12,6 +15,10 @@ class Config:
     GET_BATCH_SIZE = 500
     PUT_BATCH_SIZE = 1000
     CW_CUSTOM_NAMESPACE = "Custom_EBS"
+    REGION_WORKERS = 16  # Regions counted concurrently
+    REGION_TIMEOUT = 60  # Seconds a region may take before it is skipped for this cycle
+    SIZE_BUCKETS = [8, 100, 500, 1024, 4096, 16384]  # GiB upper bounds of the size breakdown
+    VOLUME_STATES = ["creating", "available", "in-use", "deleting", "deleted", "error"]
 
 
 def main():
@@ -24,6 +31,10 @@ def main():
         --validate: Validate that custom metrics are published to CloudWatch.
         --verbose: Enable verbose logging for debugging.
         --print: Print out a table of the EBS volume metrics.
+        --region-workers: Number of regions counted concurrently. Default is 16.
+        --region-timeout: Seconds before a slow region is skipped. Default is 60.
+        --status: Only count volumes in these states (filtered by EC2). Default is all.
+        --breakdown: Also publish volume counts by type, AZ and size bucket.
     """
     args = parse_args()
     setup_logging(args.verbose)
@@ -52,7 +63,14 @@ def main():
                 validate_success_count,
                 validate_failure_count,
                 metrics_table,
-            ) = run_custom_metrics_batch(validate)
+                breakdown_table,
+            ) = run_custom_metrics_batch(
+                validate,
+                args.region_workers,
+                args.region_timeout,
+                args.status,
+                args.breakdown,
+            )
             overall_validate_success_count += validate_success_count
             overall_validate_failure_count += validate_failure_count
         except Exception as e:
@@ -74,6 +92,9 @@ def main():
         if print_table:
             print("\nEBS Volume Metrics by Region:")
             print(tabulate(metrics_table, headers="keys", tablefmt="grid"))
+            if args.breakdown:
+                print("\nEBS Volume Breakdown by Region:")
+                print(tabulate(breakdown_table, headers="keys", tablefmt="grid"))
 
         # Sleep and show the countdown if this is not the last iteration
         if i < repeat_count - 1:
@@ -97,11 +118,24 @@ def main():
         )
 
 
-def run_custom_metrics_batch(validate):
+def run_custom_metrics_batch(
+    validate,
+    region_workers=Config.REGION_WORKERS,
+    region_timeout=Config.REGION_TIMEOUT,
+    states=None,
+    breakdown=False,
+):
     """
     Calculates and publishes custom EBS volume metrics in batch mode.
+    Regions are counted concurrently, so a sweep takes about as long as the slowest
+    region. A region that fails or takes longer than region_timeout is logged and left
+    out of this cycle instead of holding up the metrics of the other regions.
     Parameters:
         validate (bool): Whether to validate that metrics are successfully published.
+        region_workers (int): Number of regions counted concurrently.
+        region_timeout (int): Seconds a region may take before it is skipped.
+        states (list): Only count volumes in these states, filtered by EC2. None counts all.
+        breakdown (bool): Also publish counts by volume type, AZ and size bucket.
     Returns:
         tuple: A tuple containing various metrics and validation counts.
     """
@@ -112,48 +146,41 @@ def run_custom_metrics_batch(validate):
     regions = [region["RegionName"] for region in ec2.describe_regions()["Regions"]]
     metric_data = []
     metrics_table = []
+    breakdown_table = []
 
     volumes_processed = 0
     validate_success_count = 0
     validate_failure_count = 0
 
-    for region in regions:
-        ec2_region = boto3.client("ec2", region_name=region)
-        paginator = ec2_region.get_paginator("describe_volumes")
-        page_iterator = paginator.paginate(
-            PaginationConfig={"PageSize": Config.PAGINATION_COUNT}
-        )
-
-        total_volumes = 0
-        attached_volumes = 0
-        unattached_volumes = 0
+    region_counts = count_all_regions(regions, region_workers, region_timeout, states)
 
-        for page in page_iterator:
-            for volume in page["Volumes"]:
-                volumes_processed += 1
-                total_volumes += 1
-                if volume["Attachments"]:
-                    attached_volumes += 1
-                else:
-                    unattached_volumes += 1
+    for region in regions:
+        if region not in region_counts:
+            continue
+        counts = region_counts[region]
+        dimensions = get_metric_dimensions(region, states)
+        total_volumes = counts["total"]
+        attached_volumes = counts["attached"]
+        unattached_volumes = counts["unattached"]
+        volumes_processed += total_volumes
 
         metric_data.extend(
             [
                 {
                     "MetricName": "TotalVolumes",
-                    "Dimensions": [{"Name": "Region", "Value": region}],
+                    "Dimensions": dimensions,
                     "Value": total_volumes,
                     "Unit": "Count",
                 },
                 {
                     "MetricName": "AttachedVolumes",
-                    "Dimensions": [{"Name": "Region", "Value": region}],
+                    "Dimensions": dimensions,
                     "Value": attached_volumes,
                     "Unit": "Count",
                 },
                 {
                     "MetricName": "UnattachedVolumes",
-                    "Dimensions": [{"Name": "Region", "Value": region}],
+                    "Dimensions": dimensions,
                     "Value": unattached_volumes,
                     "Unit": "Count",
                 },
@@ -169,6 +196,17 @@ def run_custom_metrics_batch(validate):
             }
         )
 
+        if breakdown:
+            metric_data.extend(build_breakdown_metric_data(dimensions, counts))
+            breakdown_table.append(
+                {
+                    "Region": region,
+                    "By Type": format_counter(counts["by_type"]),
+                    "By AZ": format_counter(counts["by_az"]),
+                    "By Size": format_counter(counts["by_size"]),
+                }
+            )
+
     # Publish custom metrics in batches
     for i in range(0, len(metric_data), Config.PUT_BATCH_SIZE):
         batch = metric_data[i : i + Config.PUT_BATCH_SIZE]
@@ -182,16 +220,173 @@ def run_custom_metrics_batch(validate):
             else:
                 validate_failure_count += len(batch)
 
-    logging.info("Custom volume metrics updated for all regions in batch mode.")
+    logging.info(
+        f"Custom volume metrics updated for {len(region_counts)} of {len(regions)} regions in batch mode."
+    )
 
     return (
         volumes_processed,
         validate_success_count,
         validate_failure_count,
         metrics_table,
+        breakdown_table,
     )
 
 
+def get_metric_dimensions(region, states=None):
+    """
+    Returns the dimensions of a region's metrics. Counts filtered with --status get an
+    extra Status dimension (the sorted states, comma separated), so they never mix with
+    the unfiltered counts published under the Region dimension alone.
+    """
+    dimensions = [{"Name": "Region", "Value": region}]
+    if states:
+        dimensions.append({"Name": "Status", "Value": ",".join(sorted(set(states)))})
+    return dimensions
+
+
+def build_breakdown_metric_data(dimensions, counts):
+    """
+    Returns one VolumesByType, VolumesByAvailabilityZone and VolumesBySize entry per
+    distinct value counted in the region, with the region's dimensions plus the
+    breakdown dimension.
+    """
+    metric_data = []
+    for metric_name, dimension_name, counter in [
+        ("VolumesByType", "VolumeType", counts["by_type"]),
+        ("VolumesByAvailabilityZone", "AvailabilityZone", counts["by_az"]),
+        ("VolumesBySize", "SizeBucket", counts["by_size"]),
+    ]:
+        for value, count in sorted(counter.items()):
+            metric_data.append(
+                {
+                    "MetricName": metric_name,
+                    "Dimensions": [
+                        *dimensions,
+                        {"Name": dimension_name, "Value": value},
+                    ],
+                    "Value": count,
+                    "Unit": "Count",
+                }
+            )
+    return metric_data
+
+
+def format_counter(counter):
+    return ", ".join(f"{value}: {count}" for value, count in sorted(counter.items()))
+
+
+def get_size_bucket(size):
+    """
+    Returns the Config.SIZE_BUCKETS label of a volume size in GiB, e.g. "<=100GiB".
+    """
+    index = bisect.bisect_left(Config.SIZE_BUCKETS, size)
+    if index == len(Config.SIZE_BUCKETS):
+        return f">{Config.SIZE_BUCKETS[-1]}GiB"
+    return f"<={Config.SIZE_BUCKETS[index]}GiB"
+
+
+def count_all_regions(regions, region_workers, region_timeout, states=None):
+    """
+    Counts the volumes of every region concurrently.
+    Each region's timeout starts when a worker picks it up, so regions waiting for a free
+    worker are not penalized. A timed out region is not waited for: its worker stops at
+    the next page (see count_region_volumes) while the other regions are published. The
+    region clients use region_timeout as their connect and read timeout, so a worker
+    stuck on an unresponsive endpoint also gives up instead of lingering after the sweep.
+    Returns:
+        dict: region -> counts (see count_region_volumes), for the regions that completed.
+    """
+    started = {}
+    region_counts = {}
+
+    def count_region(region):
+        started[region] = time.time()
+        return count_region_volumes(
+            region, started[region] + region_timeout, states, region_timeout
+        )
+
+    sweep_start = time.time()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(region_workers, len(regions))))
+    futures = {executor.submit(count_region, region): region for region in regions}
+    pending = set(futures)
+
+    while pending:
+        done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+        for future in done:
+            region = futures[future]
+            try:
+                region_counts[region] = future.result()
+                logging.debug(
+                    f"Counted {region_counts[region]['total']} volumes in {region} in "
+                    f"{time.time() - started[region]:.2f} seconds"
+                )
+            except Exception as e:
+                logging.error(f"Error counting volumes in {region}: {e}")
+
+        now = time.time()
+        for future in list(pending):
+            region = futures[future]
+            if region in started and now - started[region] > region_timeout:
+                logging.warning(
+                    f"Skipping {region}: no result after {region_timeout} seconds"
+                )
+                pending.discard(future)
+
+    executor.shutdown(wait=False)
+    logging.info(
+        f"Counted volumes in {len(region_counts)} of {len(regions)} regions in "
+        f"{time.time() - sweep_start:.2f} seconds"
+    )
+    return region_counts
+
+
+def count_region_volumes(region, deadline, states=None, timeout=None):
+    """
+    Counts the volumes of one region in a single streaming pass. Each page is reduced
+    to counters and dropped, so memory stays constant however many volumes the region
+    has. The states filter is applied by EC2, so volumes in other states are never sent.
+    Parameters:
+        region (str): AWS region.
+        deadline (float): time.time() after which the count is abandoned.
+        states (list): Only count volumes in these states. None counts all.
+        timeout (int): Connect and read timeout of the region client, in seconds.
+    Returns:
+        dict: total, attached and unattached counts, and by_type, by_az and by_size
+        Counters.
+    """
+    ec2_region = get_client("ec2", region=region, timeout=timeout)
+    paginator = ec2_region.get_paginator("describe_volumes")
+    filters = [{"Name": "status", "Values": list(states)}] if states else []
+    page_iterator = paginator.paginate(
+        Filters=filters, PaginationConfig={"PageSize": Config.PAGINATION_COUNT}
+    )
+
+    counts = {
+        "total": 0,
+        "attached": 0,
+        "unattached": 0,
+        "by_type": Counter(),
+        "by_az": Counter(),
+        "by_size": Counter(),
+    }
+
+    for page in page_iterator:
+        if time.time() > deadline:
+            raise TimeoutError(f"Region {region} did not finish before its timeout")
+        for volume in page["Volumes"]:
+            counts["total"] += 1
+            if volume["Attachments"]:
+                counts["attached"] += 1
+            else:
+                counts["unattached"] += 1
+            counts["by_type"][volume["VolumeType"]] += 1
+            counts["by_az"][volume["AvailabilityZone"]] += 1
+            counts["by_size"][get_size_bucket(volume["Size"])] += 1
+
+    return counts
+
+
 def validate_custom_metrics(cloudwatch, custom_metrics_batch, verbose=False):
     retry_count = 10
     delay = 1
@@ -223,8 +418,8 @@ def validate_custom_metrics(cloudwatch, custom_metrics_batch, verbose=False):
 
 def initialize_aws_services():
     try:
-        cloudwatch = boto3.client("cloudwatch")
-        ec2 = boto3.client("ec2")
+        cloudwatch = get_client("cloudwatch")
+        ec2 = get_client("ec2")
         return cloudwatch, ec2
     except Exception as e:
         logging.error(f"Failed to initialize AWS services: {e}")
@@ -275,6 +470,29 @@ def parse_args():
         action="store_true",
         help="Print out a table of the EBS volume metrics.",
     )
+    parser.add_argument(
+        "--region-workers",
+        type=int,
+        default=Config.REGION_WORKERS,
+        help=f"Number of regions counted concurrently. Default is {Config.REGION_WORKERS}.",
+    )
+    parser.add_argument(
+        "--region-timeout",
+        type=int,
+        default=Config.REGION_TIMEOUT,
+        help=f"Seconds a region may take before it is skipped for the cycle. Default is {Config.REGION_TIMEOUT}.",
+    )
+    parser.add_argument(
+        "--status",
+        nargs="+",
+        choices=Config.VOLUME_STATES,
+        help="Only count volumes in these states. The filter is applied by EC2, so other volumes are not downloaded. Default is all volumes.",
+    )
+    parser.add_argument(
+        "--breakdown",
+        action="store_true",
+        help="Also publish volume counts by volume type, availability zone and size bucket.",
+    )
     return parser.parse_args()
 
 
@@ -1,14 +1,17 @@
-import boto3
 import argparse
 import json
 import logging
 import sys
 import collections
+from ebs_clients import get_client
+from ebs_inventory import iter_volumes
+from ebs_inventory_cache import iter_cached_volumes, Config as CacheConfig
 
 
 class Config:
     PAGINATION_COUNT = 300  # Set the number of items per page
     DASHBOARD_METRICS_LIMIT = 2500  # Set the number of metrics per dashboard.
+    VOLUME_FIELDS = ["VolumeId", "VolumeType", "Tags"]  # Fields kept per volume
 
 
 def main():
@@ -18,14 +21,16 @@ def main():
 
     ec2_client, cloudwatch = initialize_aws_clients(region=args.region)
 
-    ebs_volume_information = get_ebs_volume_information(ec2_client=ec2_client)
+    # Streamed once: only the volume IDs and types of the tagged volumes are kept
+    ebs_volume_information = get_ebs_volume_information(
+        ec2_client=ec2_client, inventory_cache=args.inventory_cache
+    )
 
     if args.list_tags or args.tag_name is None:
         if args.list_tags:
-            if args.verbose:
-                print("EBS Volumes:")
-                print(ebs_volume_information)
-            list_unique_tag_names(ebs_volumes=ebs_volume_information)
+            list_unique_tag_names(
+                ebs_volumes=ebs_volume_information, verbose=args.verbose
+            )
             sys.exit(0)
 
         if args.tag_name is None:
@@ -33,7 +38,9 @@ def main():
             list_unique_tag_names(ebs_volumes=ebs_volume_information)
             sys.exit(0)
 
-    volumes_by_tag = filter_volumes_by_tag(ebs_volume_information, args.tag_name)
+    volumes_by_tag, volume_types = filter_volumes_by_tag(
+        ebs_volume_information, args.tag_name
+    )
 
     current_dashboards = list_existing_dashboards(cloudwatch, args.tag_name)
 
@@ -44,7 +51,7 @@ def main():
         verbose=args.verbose,
         dry_run=args.dry_run,
         volumes_by_tag=volumes_by_tag,
-        ebs_volume_information=ebs_volume_information,
+        volume_types=volume_types,
     )
 
     if not args.no_cleanup:
@@ -68,8 +75,8 @@ def construct_dashboard(
     tag_name=None,
     verbose=False,
     dry_run=False,
-    volumes_by_tag=[],
-    ebs_volume_information=[],
+    volumes_by_tag={},
+    volume_types={},
 ):
     new_dashboards = []
     dashboard_name = ""
@@ -80,14 +87,7 @@ def construct_dashboard(
         widgets = []
 
         for i, volume in enumerate(volumes):
-            volume_type = next(
-                (
-                    vol["VolumeType"]
-                    for vol in ebs_volume_information
-                    if vol["VolumeId"] == volume
-                ),
-                None,
-            )
+            volume_type = volume_types.get(volume)
             if verbose:
                 print(f"Volume type: {volume_type} for volume {volume}")
 
@@ -361,56 +361,40 @@ def get_volume_tags(volume, tag_name):
 
 
 def filter_volumes_by_tag(ebs_volume_information, tag_name):
+    """
+    Groups the volume IDs by the value of tag_name in one pass over the (possibly
+    streamed) volumes, and returns (volumes_by_tag, volume_types) where volume_types
+    maps each grouped volume ID to its volume type.
+    """
     volumes_by_tag = {}
+    volume_types = {}
     for volume in ebs_volume_information:
         tag_value = get_volume_tags(volume, tag_name)
         if tag_value:
             volumes_by_tag.setdefault(tag_value, []).append(volume["VolumeId"])
-    return volumes_by_tag
+            volume_types[volume["VolumeId"]] = volume.get("VolumeType")
+    return volumes_by_tag, volume_types
 
 
 def get_all_volumes(ec2_client):
-    paginator = ec2_client.get_paginator("describe_volumes")
-    all_volumes = []
-
-    for page in paginator.paginate(MaxResults=Config.PAGINATION_COUNT):
-        if page.get("Volumes") is not None:  # Add this check
-            all_volumes.extend(page["Volumes"])
-
-    return all_volumes
+    # Generator of slim records, one describe_volumes page at a time. It can only be
+    # iterated once.
+    return iter_volumes(ec2_client, fields=Config.VOLUME_FIELDS)
 
 
-def get_ebs_volumes(ec2_client, tag_name=None, verbose=False):
-    all_volumes = get_all_volumes(ec2_client)
-
-    if verbose:
-        print("All Volumes:", all_volumes)  # Debug print
-
-    if tag_name:
-        volumes_by_tag = filter_volumes_by_tag(all_volumes, tag_name)
-        if verbose:
-            print(f"Found {len(volumes_by_tag)} tagged volumes")
-        return volumes_by_tag
-    else:
-        return {None: [volume["VolumeId"] for volume in all_volumes]}
-
-
-def get_ebs_volume_information(ec2_client):
-    paginator = ec2_client.get_paginator("describe_volumes")
-    all_volume_info = []
-
-    for page in paginator.paginate(MaxResults=Config.PAGINATION_COUNT):
-        for volume in page["Volumes"]:
-            all_volume_info.append(volume)
-
-    return all_volume_info
+def get_ebs_volume_information(ec2_client, inventory_cache="auto"):
+    # Streams slim records from the on-disk inventory snapshot (or describe_volumes
+    # when inventory_cache is "off"). The result can only be iterated once.
+    return iter_cached_volumes(
+        ec2_client, mode=inventory_cache, fields=Config.VOLUME_FIELDS
+    )
 
 
 def get_ebs_volumes(ec2_client, tag_name=None, verbose=False):
     all_volumes = get_all_volumes(ec2_client)
 
     if tag_name:
-        volumes_by_tag = filter_volumes_by_tag(all_volumes, tag_name)
+        volumes_by_tag, _ = filter_volumes_by_tag(all_volumes, tag_name)
         if verbose:
             print(f"Found {len(volumes_by_tag)} tagged volumes")
         return volumes_by_tag
@@ -422,12 +406,16 @@ def initialize_logging(loglevel):
     logging.basicConfig(level=getattr(logging, loglevel.upper()))
 
 
-def list_unique_tag_names(ebs_volumes):
+def list_unique_tag_names(ebs_volumes, verbose=False):
     unique_tag_names = set()
 
+    if verbose:
+        print("EBS Volumes:")
     for volume in ebs_volumes:
         if volume is None:
             continue
+        if verbose:
+            print(volume)
         tags = volume.get("Tags", [])
         for tag in tags:
             unique_tag_names.add(tag["Key"])
@@ -439,9 +427,8 @@ def list_unique_tag_names(ebs_volumes):
 
 def initialize_aws_clients(region):
     try:
-        ec2_client = boto3.client("ec2", region_name=region)
-        ec2_resource = boto3.resource("ec2", region_name=region)
-        cloudwatch = boto3.client("cloudwatch", region_name=region)
+        ec2_client = get_client("ec2", region=region)
+        cloudwatch = get_client("cloudwatch", region=region)
         logging.info("Initilized AWS Client")
     except Exception as e:
         logging.error(f"Failed to initialize AWS clients: {e}")
@@ -481,6 +468,12 @@ def parse_args():
         action="store_true",
         help="List all EBS volue tag names and a list of unique values",
     )
+    parser.add_argument(
+        "--inventory-cache",
+        choices=CacheConfig.MODES,
+        default="auto",
+        help=f"How to use the volume inventory cache in {CacheConfig.CACHE_FILE}: auto (reuse for {CacheConfig.TTL}s, then refresh what changed), delta, full, or off. Default is auto.",
+    )
     parser.add_argument(
         "--loglevel",
         default="info",
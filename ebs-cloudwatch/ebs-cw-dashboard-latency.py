@@ -1,6 +1,6 @@
-import boto3
 import argparse
 import json
+from ebs_clients import get_client
 
 
 class Config:
@@ -36,7 +36,7 @@ def main():
 
 
 def get_ebs_volumes():
-    ec2 = boto3.client("ec2")
+    ec2 = get_client("ec2")
     paginator = ec2.get_paginator("describe_volumes")  # Create a paginator
     volumes = []
 
@@ -49,7 +49,7 @@ def get_ebs_volumes():
 
 
 def create_dashboard(verbose=False, dry_run=False):
-    cloudwatch = boto3.client("cloudwatch")
+    cloudwatch = get_client("cloudwatch")
     volumes = get_ebs_volumes()
 
     widgets = []
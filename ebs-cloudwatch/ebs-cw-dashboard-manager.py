@@ -1,8 +1,9 @@
-import boto3
 import json
 import argparse
 import logging
 import sys
+from ebs_alarm_specs import get_alarm_prefix
+from ebs_clients import get_client
 
 
 def main():
@@ -30,9 +31,9 @@ def initilize_logging(args):
 
 def get_alarms(cloudwatch):
     # Describe alarms
-    alarms = cloudwatch.describe_alarms(AlarmNamePrefix="ImpairedVol_")
+    alarms = cloudwatch.describe_alarms(AlarmNamePrefix=get_alarm_prefix("impairedvol"))
 
-    # Collect the ARNs of the alarms that start with "ImpairedVol_"
+    # Collect the ARNs of the impaired volume alarms
     return [alarm["AlarmArn"] for alarm in alarms["MetricAlarms"]]
 
 
@@ -57,7 +58,7 @@ def update_dashboard(cloudwatch, verbose):
         for alarm in new_alarms:
             print(alarm)
 
-    # Collect the ARNs of the alarms that start with "ImpairedVol_"
+    # Collect the ARNs of the impaired volume alarms
     alarm_arns = current_alarms
 
     # Define the dashboard body
@@ -111,7 +112,7 @@ def read_dashboard(cloudwatch):
 
 def initialize_aws_clients(region):
     try:
-        cloudwatch = boto3.client("cloudwatch", region_name=region)
+        cloudwatch = get_client("cloudwatch", region=region)
         logging.info(f"Initilized AWS Client in region {region}")
     except Exception as e:
         logging.error(f"Failed to initialize AWS clients: {e}")
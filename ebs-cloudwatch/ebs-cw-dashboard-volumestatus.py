@@ -1,5 +1,3 @@
-import boto3
-
 """
 Creates CloudWatch dashboards for EBS volumes, filtered optionally by tag.
 
@@ -14,6 +12,8 @@ dashboards are cleaned up based on the set dashboard name prefix.
 
 import argparse
 import json
+from ebs_clients import get_client
+from ebs_rate_limiter import log_rate_limiter_stats
 
 
 class Config:
@@ -76,9 +76,11 @@ def main():
         print(f"Cleaning up {len(stale_dashboards)} dashboards...")
         delete_dashboards(Config.DASHBOARD_REGION, list(stale_dashboards))
 
+    log_rate_limiter_stats()
+
 
 def get_ebs_volumes(ebs_region, tag_name=None, tag_value=None):
-    ec2 = boto3.client("ec2", region_name=ebs_region)
+    ec2 = get_client("ec2", region=ebs_region, rate_limited=True)
 
     filters = []
 
@@ -115,7 +117,7 @@ def create_dashboard_shards(volumes, max_metrics_per_volume):
 
 
 def create_dashboard(cw_region, ebs_region, volumes, verbose=False, dry_run=False):
-    cloudwatch = boto3.client("cloudwatch", region_name=cw_region)
+    cloudwatch = get_client("cloudwatch", region=cw_region, rate_limited=True)
 
     # Get metrics for the first volume to determine metrics per volume
     _, max_metrics_per_volume = get_metrics_for_volume(0, volumes[0], ebs_region)
@@ -283,7 +285,7 @@ def get_metrics_for_volume(i, volume_id, ebs_region):
 
 
 def list_existing_dashboards(cw_region, dashboard_name_prefix):
-    cloudwatch = boto3.client("cloudwatch", region_name=cw_region)
+    cloudwatch = get_client("cloudwatch", region=cw_region, rate_limited=True)
     dashboards = cloudwatch.list_dashboards(DashboardNamePrefix=dashboard_name_prefix)[
         "DashboardEntries"
     ]
@@ -291,7 +293,7 @@ def list_existing_dashboards(cw_region, dashboard_name_prefix):
 
 
 def delete_dashboards(cw_region, dashboard_names):
-    cloudwatch = boto3.client("cloudwatch", region_name=cw_region)
+    cloudwatch = get_client("cloudwatch", region=cw_region, rate_limited=True)
     for name in dashboard_names:
         cloudwatch.delete_dashboards(DashboardNames=[name])
         print(f"Deleted dashboard: {name}")
@@ -1,54 +1,137 @@
 import argparse
-import boto3
-from datetime import datetime, timedelta
+import curses
+import time
+from datetime import datetime, timedelta, timezone
 from tabulate import tabulate
+from ebs_clients import get_client
+from ebs_inventory import VolumeRecord, get_instance_names
+from ebs_inventory_cache import iter_cached_volumes, Config as CacheConfig
 
 # from prettytable import PrettyTable
 
 
 class Config:
     PAGINATION_COUNT = 300  # Set the desired value here
+    VOLUME_FIELDS = ["VolumeId", "State", "Attachments"]  # Fields read per volume
+    GET_BATCH_SIZE = 500  # GetMetricData queries per call (the API maximum)
+    METRIC_WINDOW = 300  # Seconds of 60s datapoints fetched per volume
+    # Metrics compared per volume, in is_impaired argument order
+    METRICS = [
+        ("read_ops", "VolumeReadOps"),
+        ("write_ops", "VolumeWriteOps"),
+        ("queue", "VolumeQueueLength"),
+    ]
+    LIVE_INTERVAL = 60  # Seconds between metric fetches in --live mode
+    LIVE_KEY_TIMEOUT = 250  # Milliseconds to wait for a key press in --live mode
+    LIVE_HEADER_LINES = 3  # Status, column header and blank lines above the rows
 
 
 def print_table(headers, data, style):
     print(tabulate(data, headers=headers, tablefmt=style))
 
 
-def get_volumes(client):
-    all_volumes = []
-    paginator = client.get_paginator("describe_volumes")
-    for page in paginator.paginate(MaxResults=Config.PAGINATION_COUNT):
-        volumes_in_use = [v for v in page["Volumes"] if v["State"] != "available"]
-        all_volumes.extend(volumes_in_use)
-    return all_volumes
-
-
-def get_instance_name(client, instance_id):
-    if not instance_id:
-        return None
-    instances = client.describe_instances(InstanceIds=[instance_id])
-    instance = instances["Reservations"][0]["Instances"][0]
-    for tag in instance["Tags"]:
-        if tag["Key"] == "Name":
-            return tag["Value"]
-    return None
-
-
-def get_metrics(client, volume_id, metric_name):
-    metrics = client.get_metric_statistics(
-        Namespace="AWS/EBS",
-        MetricName=metric_name,
-        Dimensions=[
-            {"Name": "VolumeId", "Value": volume_id},
-        ],
-        StartTime=datetime.utcnow() - timedelta(minutes=5),
-        EndTime=datetime.utcnow(),
-        Period=60,
-        Statistics=[
-            "Average",
-        ],
+def get_volumes(client, inventory_cache="auto"):
+    # Streams VolumeRecords from the on-disk inventory snapshot (or describe_volumes
+    # when inventory_cache is "off") instead of building a list of every volume
+    for volume in iter_cached_volumes(
+        client, mode=inventory_cache, fields=Config.VOLUME_FIELDS
+    ):
+        if volume["State"] != "available":
+            yield VolumeRecord.from_volume(volume)
+
+
+def get_instance_name_index(client, volumes):
+    """
+    Returns the Name tag of every attached instance, indexed by instance ID, from a few
+    batched describe_instances calls.
+    """
+    return get_instance_names(
+        client, {volume.instance_id for volume in volumes if volume.instance_id}
     )
-    return metrics["Datapoints"][0]["Average"] if metrics["Datapoints"] else 0
+
+
+def build_metric_queries(volume_id):
+    safe_volume_id = volume_id.replace("-", "_")
+    return [
+        {
+            "Id": f"{id_prefix}_{safe_volume_id}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": "AWS/EBS",
+                    "MetricName": metric_name,
+                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
+                },
+                "Period": 60,
+                "Stat": "Average",
+            },
+        }
+        for id_prefix, metric_name in Config.METRICS
+    ]
+
+
+def get_metrics_batch(client, volume_ids):
+    """
+    Fetches the last Config.METRIC_WINDOW seconds of read ops, write ops and queue
+    length for every volume, with GetMetricData calls of up to Config.GET_BATCH_SIZE
+    queries.
+    Returns:
+        dict: volume ID -> (read_ops, write_ops, queue_length) from the latest minute
+        the three metrics have in common, or Nones (see latest_common_values).
+    """
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(seconds=Config.METRIC_WINDOW)
+    volumes_per_call = Config.GET_BATCH_SIZE // len(Config.METRICS)
+    volume_ids = list(volume_ids)
+
+    series = {}  # query Id -> {timestamp: value}
+    for i in range(0, len(volume_ids), volumes_per_call):
+        metric_queries = [
+            query
+            for volume_id in volume_ids[i : i + volumes_per_call]
+            for query in build_metric_queries(volume_id)
+        ]
+        next_token = None
+        while True:
+            kwargs = {
+                "MetricDataQueries": metric_queries,
+                "StartTime": start_time,
+                "EndTime": end_time,
+            }
+            if next_token:
+                kwargs["NextToken"] = next_token
+            response = client.get_metric_data(**kwargs)
+            for result in response["MetricDataResults"]:
+                series.setdefault(result["Id"], {}).update(
+                    zip(result["Timestamps"], result["Values"])
+                )
+            next_token = response.get("NextToken")
+            if not next_token:
+                break
+
+    metrics = {}
+    for volume_id in volume_ids:
+        safe_volume_id = volume_id.replace("-", "_")
+        metrics[volume_id] = latest_common_values(
+            *(
+                series.get(f"{id_prefix}_{safe_volume_id}", {})
+                for id_prefix, _ in Config.METRICS
+            )
+        )
+    return metrics
+
+
+def latest_common_values(*series):
+    """
+    Returns the values of the most recent period that every series has a datapoint for,
+    so the metrics compared come from the same minute. Datapoints are not returned in
+    time order, and a period missing from any series is a gap that is skipped.
+    Returns a tuple of None when the series have no period in common.
+    """
+    common_timestamps = set.intersection(*(set(values) for values in series))
+    if not common_timestamps:
+        return tuple(None for _ in series)
+    latest = max(common_timestamps)
+    return tuple(values[latest] for values in series)
 
 
 def is_impaired(read_ops, write_ops, queue_length):
@@ -57,6 +140,7 @@ def is_impaired(read_ops, write_ops, queue_length):
         if (
             read_ops is not None
             and write_ops is not None
+            and queue_length is not None
             and read_ops + write_ops == 0
             and queue_length > 0
         )
@@ -67,46 +151,43 @@ def is_impaired(read_ops, write_ops, queue_length):
 
 
 def list_volumes(args):
-    client = boto3.client("ec2")
-    volumes = get_volumes(client)
+    client = get_client("ec2")
+    volumes = list(get_volumes(client, args.inventory_cache))
+    instance_names = get_instance_name_index(client, volumes)
     for volume in volumes:
-        instance_id = (
-            volume["Attachments"][0]["InstanceId"] if volume["Attachments"] else None
-        )
         print(
-            f"Volume ID: {volume['VolumeId']}, Status: {volume['State']}, Instance: {get_instance_name(client, instance_id)}"
+            f"Volume ID: {volume.volume_id}, Status: {volume.state}, Instance: {instance_names.get(volume.instance_id) or None}"
         )
 
 
 def list_volumes_only(args):
-    client = boto3.client("ec2")
-    volumes = get_volumes(client)
+    client = get_client("ec2")
+    volumes = get_volumes(client, args.inventory_cache)
     for volume in volumes:
-        print(f"Volume ID: {volume['VolumeId']}, Status: {volume['State']}")
+        print(f"Volume ID: {volume.volume_id}, Status: {volume.state}")
 
 
 def show_dashboard(args):
-    client_ec2 = boto3.client("ec2")
-    client_cloudwatch = boto3.client("cloudwatch")
+    client_ec2 = get_client("ec2")
+    client_cloudwatch = get_client("cloudwatch")
     if args.verbose:
         print(f"Getting volumes.")
-    volumes = get_volumes(client_ec2)
+    volumes = list(get_volumes(client_ec2, args.inventory_cache))
+    if args.verbose:
+        print(f"Getting metrics and instance names for {len(volumes)} volumes.")
+    instance_names = get_instance_name_index(client_ec2, volumes)
+    metrics = get_metrics_batch(
+        client_cloudwatch, [volume.volume_id for volume in volumes]
+    )
     data = []
     for volume in volumes:
-        if args.verbose:
-            print(f"Getting information for {volume['VolumeId']}.")
-        instance_id = (
-            volume["Attachments"][0]["InstanceId"] if volume["Attachments"] else None
-        )
-        m1 = get_metrics(client_cloudwatch, volume["VolumeId"], "VolumeReadOps")
-        m2 = get_metrics(client_cloudwatch, volume["VolumeId"], "VolumeWriteOps")
-        m3 = get_metrics(client_cloudwatch, volume["VolumeId"], "VolumeQueueLength")
+        m1, m2, m3 = metrics[volume.volume_id]
         impaired = is_impaired(m1, m2, m3)
         data.append(
             [
-                volume["VolumeId"],
-                volume["State"],
-                get_instance_name(client_ec2, instance_id),
+                volume.volume_id,
+                volume.state,
+                instance_names.get(volume.instance_id) or None,
                 "{:8.2f}".format(m1) if m1 is not None else "---",
                 "{:8.2f}".format(m2) if m2 is not None else "---",
                 "{:.4f}".format(m3) if m3 is not None else "---",
@@ -128,6 +209,161 @@ def show_dashboard(args):
     )
 
 
+def format_live_row(volume, instance_name, metrics):
+    m1, m2, m3 = metrics
+    return (
+        f"{volume.volume_id:<22} {volume.state:<10} {instance_name or '---':<24.24} "
+        + ("{:>10.2f}".format(m1) if m1 is not None else f"{'---':>10}")
+        + " "
+        + ("{:>10.2f}".format(m2) if m2 is not None else f"{'---':>10}")
+        + " "
+        + ("{:>10.4f}".format(m3) if m3 is not None else f"{'---':>10}")
+        + " "
+        + ("IMPAIRED" if is_impaired(m1, m2, m3) else "")
+    )
+
+
+def build_live_rows(volumes, instance_names, metrics):
+    """
+    Returns (line, impaired) for every volume, impaired volumes first and then by
+    volume ID, so a newly impaired volume moves to the top of the screen.
+    """
+    rows = []
+    for volume in volumes:
+        volume_metrics = metrics.get(volume.volume_id, (None, None, None))
+        rows.append(
+            (
+                format_live_row(
+                    volume, instance_names.get(volume.instance_id), volume_metrics
+                ),
+                is_impaired(*volume_metrics),
+            )
+        )
+    rows.sort(key=lambda row: (not row[1], row[0]))
+    return rows
+
+
+def draw_live_screen(screen, drawn, lines):
+    """
+    Writes the lines that differ from what is already on the screen and returns how
+    many were written. drawn holds the (text, attribute) on each screen line and is
+    updated in place.
+    Parameters:
+        screen: The curses window.
+        drawn (list): The lines currently on the screen, from the previous call.
+        lines (list): (text, attribute) for every screen line, top to bottom.
+    """
+    height, width = screen.getmaxyx()
+    lines = lines[:height]
+    changed = 0
+    for y, line in enumerate(lines):
+        if y < len(drawn) and drawn[y] == line:
+            continue
+        text, attribute = line
+        screen.move(y, 0)
+        screen.clrtoeol()
+        screen.addnstr(y, 0, text, width - 1, attribute)
+        changed += 1
+    for y in range(len(lines), len(drawn)):
+        screen.move(y, 0)
+        screen.clrtoeol()
+    drawn[:] = lines
+    screen.refresh()
+    return changed
+
+
+def run_live(screen, args):
+    """
+    Live view for --live. The volume list and instance names are read once and kept in
+    memory; each tick only re-fetches the metrics (batched GetMetricData) and rewrites
+    the screen lines that changed. Press q to quit, r to reload the volume list, and
+    PgUp/PgDn (or k/j) to scroll.
+    """
+    client_ec2 = get_client("ec2")
+    client_cloudwatch = get_client("cloudwatch")
+    curses.curs_set(0)
+    screen.timeout(Config.LIVE_KEY_TIMEOUT)
+
+    volumes = None
+    rows = []
+    drawn = []
+    offset = 0
+    tick = 0
+    status = "Loading volumes..."
+    next_fetch = time.monotonic()
+    header = (
+        f"{'Volume ID':<22} {'Status':<10} {'Instance':<24} "
+        f"{'Read (m1)':>10} {'Write (m2)':>10} {'Queue (m3)':>10} VolImpaired"
+    )
+
+    while True:
+        height, _ = screen.getmaxyx()
+        page_size = max(height - Config.LIVE_HEADER_LINES, 1)
+        offset = max(min(offset, len(rows) - page_size), 0)
+        lines = [
+            (status, curses.A_BOLD),
+            (header, curses.A_UNDERLINE),
+            ("", curses.A_NORMAL),
+        ] + [
+            (line, curses.A_REVERSE if impaired else curses.A_NORMAL)
+            for line, impaired in rows[offset : offset + page_size]
+        ]
+        draw_live_screen(screen, drawn, lines)
+
+        if time.monotonic() >= next_fetch:
+            next_fetch = time.monotonic() + args.interval
+            tick += 1
+            try:
+                if volumes is None:
+                    loaded = list(get_volumes(client_ec2, args.inventory_cache))
+                    instance_names = get_instance_name_index(client_ec2, loaded)
+                    volumes = loaded
+                fetch_start = time.monotonic()
+                metrics = get_metrics_batch(
+                    client_cloudwatch, [volume.volume_id for volume in volumes]
+                )
+                fetch_seconds = time.monotonic() - fetch_start
+            except Exception as e:
+                # Any error (AWS, network or bad data) is shown instead of ending the
+                # live view; the last values stay on screen and the next tick tries again
+                status = (
+                    f"Tick {tick} at {datetime.now():%H:%M:%S} failed: "
+                    f"{type(e).__name__}: {e}"
+                )
+            else:
+                new_rows = build_live_rows(volumes, instance_names, metrics)
+                changed_rows = len(set(new_rows) - set(rows))
+                rows = new_rows
+                impaired_count = sum(1 for _, impaired in rows if impaired)
+                status = (
+                    f"Tick {tick} at {datetime.now():%H:%M:%S} | "
+                    f"{len(volumes)} volumes, {impaired_count} impaired | "
+                    f"fetch {fetch_seconds:.2f}s | "
+                    f"{changed_rows} rows changed | every {args.interval}s | "
+                    f"q quit, r reload volumes, PgUp/PgDn scroll"
+                )
+
+        # Waits up to Config.LIVE_KEY_TIMEOUT, so the new rows are drawn right after
+        key = screen.getch()
+        if key in (ord("q"), ord("Q")):
+            return
+        elif key in (ord("r"), ord("R")):
+            volumes = None
+            next_fetch = time.monotonic()
+            status = "Reloading volumes..."
+        elif key in (curses.KEY_NPAGE, ord("j")):
+            offset += page_size
+        elif key in (curses.KEY_PPAGE, ord("k")):
+            offset -= page_size
+        elif key == curses.KEY_RESIZE:
+            screen.clear()
+            drawn.clear()
+
+
+def show_live(args):
+    curses.wrapper(run_live, args)
+
+
 parser = argparse.ArgumentParser(
     description="EBS Dashboard showing impaired volume status for all EBS volumes that do not have a status of Available."
 )
@@ -152,9 +388,31 @@ parser.add_argument(
     help="(default option) Show a dashboard of EBS volumes with metrics indicating a impaired volume.",
     const=show_dashboard,
 )
+parser.add_argument(
+    "--live",
+    dest="func",
+    action="store_const",
+    help="Live view that keeps the volume list in memory, re-fetches only the metrics every --interval seconds and redraws the rows that changed, with impaired volumes at the top. Press q to quit.",
+    const=show_live,
+)
+parser.add_argument(
+    "--interval",
+    type=int,
+    default=Config.LIVE_INTERVAL,
+    help=f"Seconds between metric fetches in --live mode. The default is {Config.LIVE_INTERVAL}",
+)
+parser.add_argument(
+    "--inventory-cache",
+    choices=CacheConfig.MODES,
+    default="auto",
+    help=f"How to use the volume inventory cache in {CacheConfig.CACHE_FILE}: auto (reuse for {CacheConfig.TTL}s, then refresh what changed), delta, full, or off. Default is auto.",
+)
 parser.add_argument("--verbose", action="store_true", help="Print verbsoe output.")
 args = parser.parse_args()
 
-for i in range(args.repeat):
-    print(f"\nRunning iteration {i+1} of {args.repeat} at {datetime.now()}")
-    args.func(args)
+if args.func is show_live:
+    show_live(args)
+else:
+    for i in range(args.repeat):
+        print(f"\nRunning iteration {i+1} of {args.repeat} at {datetime.now()}")
+        args.func(args)
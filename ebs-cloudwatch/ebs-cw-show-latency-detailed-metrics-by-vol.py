@@ -1,14 +1,39 @@
-import boto3
 import sys
+import csv
+import time
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pytz import utc
 from tabulate import tabulate
 from botocore.exceptions import ClientError, BotoCoreError
+from ebs_clients import get_client
+from ebs_metric_cache import (
+    add_coverage,
+    get_settled_time,
+    missing_ranges,
+    open_cache,
+    read_datapoints,
+    save_datapoints,
+    Config as MetricCacheConfig,
+)
+from ebs_arrow import ArrowRowWriter, pa
 
 
 class Config:
     PAGINATOR_COUNT = 300
+    MAX_QUERIES = 500  # GetMetricData queries per call
+    MAX_DATAPOINTS = 100800  # GetMetricData datapoints per call
+    # CloudWatch retention: the shortest period available for data of a given age
+    PERIODS_BY_AGE = [
+        (timedelta(days=15), 60),
+        (timedelta(days=63), 300),
+        (timedelta(days=455), 3600),
+    ]
+    EXPORT_WORKERS = 8  # Time slices fetched concurrently in export mode
+    EXPORT_SLICES_AHEAD = 16  # Time slices in flight or waiting to be written
+    EXPORT_FORMATS = ["tsv", "parquet", "arrow"]  # --format (parquet/arrow: pyarrow)
 
 
 def main(
@@ -23,6 +48,7 @@ def main(
     output_to_file=False,
     start_date=None,
     end_date=None,
+    metric_cache="auto",
 ):
     ec2, cloudwatch = initialize_aws_clients()
 
@@ -64,14 +90,6 @@ def main(
             print("Invalid date format. Please try again.")
             end_date = None
 
-    if start_date and end_date:
-        delta = end_date - start_date
-        if delta.days * len(metrics) * 24 > 100800:
-            print(
-                "Requested time range and metrics exceed CloudWatch API limit of 100,800 data points."
-            )
-            return
-
     start_time, end_time = get_time_range(start_date, end_date)
 
     try:
@@ -84,25 +102,29 @@ def main(
         return
 
     print(f"Fetching data for metrics: {', '.join(metrics)}")
-    all_data_points = get_metrics(cloudwatch, metrics, volume_id, start_time, end_time)
-
-    table_data = {}
-    for metric, data_points in all_data_points.items():
-        for timestamp, value in data_points:
-            local_timestamp = timestamp.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-            utc_timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-
-            if timestamp not in table_data:
-                table_data[timestamp] = [local_timestamp, utc_timestamp]
-
-            while len(table_data[timestamp]) <= metrics.index(metric) + 2:
-                table_data[timestamp].append(None)
-
-            table_data[timestamp][metrics.index(metric) + 2] = value
+    try:
+        # Rows come back in timestamp order, one per datapoint timestamp
+        table = [
+            [
+                timestamp.astimezone().strftime("%Y-%m-%d %H:%M:%S"),
+                timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            ]
+            + values
+            for _, timestamp, values in iter_metric_rows(
+                cloudwatch,
+                [volume_id],
+                metrics,
+                start_time,
+                end_time,
+                metric_cache=metric_cache,
+            )
+        ]
+    except (ClientError, BotoCoreError) as e:
+        print(f"Error fetching metrics: {e}")
+        return
 
     print_volume_details(volume_details, table_style, start_time, end_time)
     headers = ["Local", "UTC"] + metrics
-    table = sorted(table_data.values())
     print_metrics_table(table, headers, table_style)
 
     if output_to_file:
@@ -119,47 +141,354 @@ def main(
     )
 
 
-def get_metrics(cloudwatch, metrics, volume_id, start_time, end_time):
+def export_metrics(
+    volume_ids,
+    metrics,
+    start_date,
+    end_date,
+    output_file,
+    workers,
+    table_style,
+    file_format="tsv",
+    metric_cache="auto",
+):
+    """
+    Batch export: writes the metrics of many volumes over a date range to a TSV,
+    Parquet or Arrow file, one row per volume and timestamp, in timestamp order.
+    Parameters:
+        volume_ids (list): The volumes to export.
+        metrics (list): The AWS/EBS metric names, one column each.
+        start_date (datetime): First day of the range.
+        end_date (datetime): Last day of the range (inclusive).
+        output_file (str): The file to write.
+        workers (int): Time slices fetched concurrently.
+        table_style (str): Table style of the time slice summary.
+        file_format (str): One of Config.EXPORT_FORMATS.
+        metric_cache (str): One of ebs_metric_cache.Config.MODES.
+    """
+    cloudwatch = get_client("cloudwatch")
+    start_time, end_time = get_time_range(start_date, end_date)
+    volume_groups = get_volume_groups(volume_ids, metrics)
+    time_slices = get_time_slices(
+        start_time, end_time, len(volume_groups[0]) * len(metrics)
+    )
+
+    print(
+        f"Exporting {len(metrics)} metrics for {len(volume_ids)} volumes from "
+        f"{start_time} to {end_time}"
+    )
+    print(
+        tabulate(
+            [
+                ["Volume groups", len(volume_groups)],
+                ["Time slices", len(time_slices)],
+                ["GetMetricData calls", len(volume_groups) * len(time_slices)],
+                [
+                    "Periods",
+                    ", ".join(f"{p}s" for p in sorted({s[2] for s in time_slices})),
+                ],
+                ["Workers", workers],
+            ],
+            tablefmt=table_style,
+        )
+    )
+
+    rows = iter_metric_rows(
+        cloudwatch,
+        volume_ids,
+        metrics,
+        start_time,
+        end_time,
+        workers,
+        metric_cache=metric_cache,
+    )
+    rows_written = 0
     try:
-        metric_data_queries = [
-            {
-                "Id": f"m{i}",
-                "MetricStat": {
-                    "Metric": {
-                        "Namespace": "AWS/EBS",
-                        "MetricName": metric,
-                        "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    },
-                    "Period": 60,
-                    "Stat": "Average",
-                },
-                "ReturnData": True,
-            }
-            for i, metric in enumerate(metrics)
-        ]
+        if file_format == "tsv":
+            with open(output_file, "w", newline="") as f:
+                writer = csv.writer(f, delimiter="\t")
+                writer.writerow(["Volume ID", "UTC"] + metrics)
+                for volume_id, timestamp, values in rows:
+                    writer.writerow(
+                        [volume_id, timestamp.strftime("%Y-%m-%d %H:%M:%S")] + values
+                    )
+                    rows_written += 1
+        else:
+            # Volume IDs repeat on every row, so they are dictionary-encoded with the
+            # dictionary written once; timestamps stay native so no parsing is needed
+            schema = pa.schema(
+                [
+                    ("Volume ID", pa.dictionary(pa.int32(), pa.string())),
+                    ("UTC", pa.timestamp("s", tz="UTC")),
+                ]
+                + [(metric, pa.float64()) for metric in metrics]
+            )
+            with ArrowRowWriter(
+                output_file,
+                schema,
+                file_format,
+                dictionaries={"Volume ID": volume_ids},
+            ) as writer:
+                for volume_id, timestamp, values in rows:
+                    writer.writerow([volume_id, timestamp] + values)
+            rows_written = writer.rows_written
+    except (ClientError, BotoCoreError) as e:
+        print(f"Error fetching metrics, {output_file} is incomplete: {e}")
+        return
+
+    print(f"{rows_written} rows written to {output_file}")
+
+
+def get_volume_groups(volume_ids, metrics):
+    # Each GetMetricData call covers one group: len(metrics) queries per volume
+    volumes_per_call = max(Config.MAX_QUERIES // len(metrics), 1)
+    return [
+        volume_ids[i : i + volumes_per_call]
+        for i in range(0, len(volume_ids), volumes_per_call)
+    ]
+
+
+def get_period(slice_start, now):
+    """
+    Returns the shortest period CloudWatch still keeps for data starting at slice_start
+    (1 minute for 15 days, 5 minutes for 63 days, then 1 hour).
+    """
+    age = now - slice_start
+    for max_age, period in Config.PERIODS_BY_AGE:
+        if age <= max_age:
+            return period
+    return Config.PERIODS_BY_AGE[-1][1]
 
-        paginator = cloudwatch.get_paginator("get_metric_data")
-        response_iterator = paginator.paginate(
-            MetricDataQueries=metric_data_queries,
-            StartTime=start_time,
-            EndTime=end_time,
-            PaginationConfig={"PageSize": Config.PAGINATOR_COUNT},
+
+def get_time_slices(start_time, end_time, queries_per_call, now=None):
+    """
+    Splits start_time..end_time into (start, end, period) slices that each stay within
+    Config.MAX_DATAPOINTS for queries_per_call queries. Each slice uses the period
+    required for its oldest datapoint, and starts on a multiple of that period.
+    """
+    now = now or datetime.utcnow().replace(tzinfo=utc)
+    points_per_query = max(Config.MAX_DATAPOINTS // queries_per_call, 1)
+    time_slices = []
+    slice_start = start_time
+    while slice_start < end_time:
+        period = get_period(slice_start, now)
+        aligned_start = datetime.fromtimestamp(
+            slice_start.timestamp() // period * period, tz=utc
         )
+        slice_end = min(
+            aligned_start + timedelta(seconds=points_per_query * period), end_time
+        )
+        time_slices.append((aligned_start, slice_end, period))
+        slice_start = slice_end
+    return time_slices
+
+
+def fetch_datapoints(cloudwatch, queries, start, end, period):
+    """
+    Fetches the datapoints of (volume ID, metric) queries between start and end (epoch
+    seconds) with a paginated GetMetricData call.
+    Returns:
+        list: (volume ID, metric, timestamp in epoch seconds, value) datapoints.
+    """
+    metric_data_queries = [
+        {
+            "Id": f"q{index}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": "AWS/EBS",
+                    "MetricName": metric,
+                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
+                },
+                "Period": period,
+                "Stat": "Average",
+            },
+            "ReturnData": True,
+        }
+        for index, (volume_id, metric) in enumerate(queries)
+    ]
+
+    datapoints = []
+    paginator = cloudwatch.get_paginator("get_metric_data")
+    for response in paginator.paginate(
+        MetricDataQueries=metric_data_queries,
+        StartTime=datetime.fromtimestamp(start, tz=utc),
+        EndTime=datetime.fromtimestamp(end, tz=utc),
+        ScanBy="TimestampAscending",
+    ):
+        for result in response["MetricDataResults"]:
+            # Query Ids are "q<index>", so each result is matched without a search
+            volume_id, metric = queries[int(result["Id"][1:])]
+            datapoints.extend(
+                (volume_id, metric, int(timestamp.timestamp()), value)
+                for timestamp, value in zip(result["Timestamps"], result["Values"])
+            )
+    return datapoints
 
-        data_points = {metric: [] for metric in metrics}
 
-        for response in response_iterator:
-            for i, metric in enumerate(metrics):
-                metric_data = zip(
-                    response["MetricDataResults"][i]["Timestamps"],
-                    response["MetricDataResults"][i]["Values"],
+def plan_slice_fetch(connection, region, volume_ids, metrics, time_slice):
+    """
+    Returns (queries, start, end): the (volume ID, metric) queries of the slice that are
+    not fully in the metric cache, and the range that covers all of their gaps. Without
+    a cache connection every query is fetched for the whole slice.
+    """
+    slice_start, slice_end, period = time_slice
+    start = int(slice_start.timestamp())
+    end = int(slice_end.timestamp())
+    queries = [(volume_id, metric) for volume_id in volume_ids for metric in metrics]
+    if connection is None:
+        return queries, start, end
+
+    # Periods that have not started yet have no data to fetch
+    end = min(end, int(time.time()))
+    missing_queries = []
+    fetch_start, fetch_end = end, start
+    for volume_id, metric in queries:
+        gaps = missing_ranges(connection, region, volume_id, metric, period, start, end)
+        if gaps:
+            missing_queries.append((volume_id, metric))
+            fetch_start = min(fetch_start, gaps[0][0])
+            fetch_end = max(fetch_end, gaps[-1][1])
+    return missing_queries, fetch_start, fetch_end
+
+
+def build_slice_buckets(datapoints, metrics, time_slice):
+    """
+    Places datapoints on the slice's grid of periods.
+    Returns:
+        list: One dict per period of the slice, in time order, of volume ID -> list of
+        metric values (None where a metric has no datapoint).
+    """
+    slice_start, slice_end, period = time_slice
+    start = int(slice_start.timestamp())
+    periods = -(-int((slice_end - slice_start).total_seconds()) // period)
+    buckets = [{} for _ in range(periods)]
+    columns = {metric: column for column, metric in enumerate(metrics)}
+    for volume_id, metric, timestamp, value in datapoints:
+        index = (timestamp - start) // period
+        if 0 <= index < periods:
+            bucket = buckets[index]
+            if volume_id not in bucket:
+                bucket[volume_id] = [None] * len(metrics)
+            bucket[volume_id][columns[metric]] = value
+    return buckets
+
+
+def iter_metric_rows(
+    cloudwatch,
+    volume_ids,
+    metrics,
+    start_time,
+    end_time,
+    workers=1,
+    metric_cache="off",
+    cache_file=None,
+):
+    """
+    Yields (volume ID, timestamp, values) for every volume and period with data, in
+    timestamp order and then volume_ids order.
+    The range is split into API-legal time slices (see get_time_slices) and volume
+    groups, which are fetched on a thread pool. Results are merged by walking each
+    slice's periods in order, so the merge is linear in the number of datapoints.
+    Config.EXPORT_SLICES_AHEAD bounds how many slices are held in memory.
+    With metric_cache "auto", only the parts of a slice missing from the metric cache
+    (ebs_metric_cache) are fetched and the rest is read from disk; "refresh" fetches
+    everything again and rewrites the cache.
+    """
+    volume_groups = get_volume_groups(volume_ids, metrics)
+    time_slices = get_time_slices(
+        start_time, end_time, len(volume_groups[0]) * len(metrics)
+    )
+    region = cloudwatch.meta.region_name
+    connection = None
+    if metric_cache != "off":
+        connection = open_cache(cache_file or MetricCacheConfig.CACHE_FILE)
+    cached_queries = 0
+    fetched_queries = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()  # (time slice, fetches of its volume groups), in time order
+        next_slice = 0
+        while pending or next_slice < len(time_slices):
+            while next_slice < len(time_slices) and (
+                len(pending) < Config.EXPORT_SLICES_AHEAD
+            ):
+                time_slice = time_slices[next_slice]
+                fetches = []
+                for group in volume_groups:
+                    queries, start, end = plan_slice_fetch(
+                        connection if metric_cache == "auto" else None,
+                        region,
+                        group,
+                        metrics,
+                        time_slice,
+                    )
+                    future = None
+                    if queries:
+                        future = executor.submit(
+                            fetch_datapoints,
+                            cloudwatch,
+                            queries,
+                            start,
+                            end,
+                            time_slice[2],
+                        )
+                    fetches.append((group, queries, start, end, future))
+                    cached_queries += len(group) * len(metrics) - len(queries)
+                    fetched_queries += len(queries)
+                pending.append((time_slice, fetches))
+                next_slice += 1
+
+            time_slice, fetches = pending.popleft()
+            slice_start, slice_end, period = time_slice
+            group_buckets = []
+            for group, queries, start, end, future in fetches:
+                datapoints = future.result() if future else []
+                if connection is not None:
+                    with connection:
+                        save_datapoints(connection, region, period, datapoints)
+                        # Only settled periods are recorded as fetched, the recent
+                        # ones are fetched again next time
+                        covered_end = min(end, get_settled_time() // period * period)
+                        for volume_id, metric in queries:
+                            if covered_end > start:
+                                add_coverage(
+                                    connection,
+                                    region,
+                                    volume_id,
+                                    metric,
+                                    period,
+                                    start,
+                                    covered_end,
+                                )
+                    datapoints = read_datapoints(
+                        connection,
+                        region,
+                        group,
+                        metrics,
+                        period,
+                        int(slice_start.timestamp()),
+                        int(slice_end.timestamp()),
+                    )
+                group_buckets.append(
+                    build_slice_buckets(datapoints, metrics, time_slice)
                 )
-                data_points[metric].extend(metric_data)
 
-        return data_points
-    except (ClientError, BotoCoreError) as e:
-        print(f"Error fetching metrics: {e}")
-        return ()
+            for index in range(len(group_buckets[0])):
+                timestamp = slice_start + timedelta(seconds=index * period)
+                for group, buckets in zip(volume_groups, group_buckets):
+                    bucket = buckets[index]
+                    if not bucket:
+                        continue
+                    for volume_id in group:
+                        if volume_id in bucket:
+                            yield volume_id, timestamp, bucket[volume_id]
+
+    if connection is not None:
+        connection.close()
+        print(
+            f"Metric cache: {cached_queries} slice queries read from "
+            f"{cache_file or MetricCacheConfig.CACHE_FILE}, {fetched_queries} fetched"
+        )
 
 
 def get_volume_details(ec2, volume_id):
@@ -204,8 +533,8 @@ def is_valid_volume(ec2, volume_id):
 
 
 def initialize_aws_clients():
-    ec2 = boto3.client("ec2")
-    cloudwatch = boto3.client("cloudwatch")
+    ec2 = get_client("ec2")
+    cloudwatch = get_client("cloudwatch")
     return ec2, cloudwatch
 
 
@@ -285,9 +614,75 @@ def parse_args():
         help="Table style",
     )
     parser.add_argument("--file", action="store_true", help="Output to a file")
-    return parser.parse_args()
+    parser.add_argument(
+        "--volume-ids",
+        nargs="+",
+        help="Batch export: the volumes to export. Requires --start and --end; the rows are written to --output instead of the screen.",
+    )
+    parser.add_argument(
+        "--volume-file",
+        help="Batch export: a file with one volume ID per line, in addition to --volume-ids.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Batch export: the file to write. Default is ebs-metrics-START-END.FORMAT",
+    )
+    parser.add_argument(
+        "--format",
+        choices=Config.EXPORT_FORMATS,
+        default="tsv",
+        help="Batch export: file format. parquet and arrow (Arrow IPC / Feather v2) need pyarrow. Default is tsv",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.EXPORT_WORKERS,
+        help=f"Batch export: time slices fetched concurrently. Default is {Config.EXPORT_WORKERS}",
+    )
+    parser.add_argument(
+        "--metric-cache",
+        choices=MetricCacheConfig.MODES,
+        default="auto",
+        help=f"How to use the datapoint cache in {MetricCacheConfig.CACHE_FILE}: auto (fetch only what is not cached), refresh (fetch everything and rewrite the cache), or off. Default is auto.",
+    )
+    args = parser.parse_args()
+
+    if args.volume_file:
+        with open(args.volume_file) as f:
+            args.volume_ids = (args.volume_ids or []) + [
+                line.strip() for line in f if line.strip()
+            ]
+    if args.volume_ids and not (args.start and args.end):
+        parser.error("--volume-ids and --volume-file require --start and --end")
+    if args.start and args.end and args.end < args.start:
+        parser.error("--end cannot be before --start")
+    if args.format != "tsv" and pa is None:
+        parser.error(f"--format {args.format} requires pyarrow (pip install pyarrow)")
+    return args
 
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args.volume_id, args.style, args.metrics, args.file, args.start, args.end)
+    if args.volume_ids:
+        export_metrics(
+            list(dict.fromkeys(args.volume_ids)),
+            args.metrics,
+            args.start,
+            args.end,
+            args.output
+            or f"ebs-metrics-{args.start:%Y-%m-%d}-{args.end:%Y-%m-%d}.{args.format}",
+            args.workers,
+            args.style,
+            args.format,
+            args.metric_cache,
+        )
+    else:
+        main(
+            args.volume_id,
+            args.style,
+            args.metrics,
+            args.file,
+            args.start,
+            args.end,
+            args.metric_cache,
+        )
@@ -1,64 +1,132 @@
 import sys
-import boto3
 import argparse
+import heapq
 from datetime import datetime, timedelta
 from tabulate import tabulate
+from ebs_clients import get_client
+from ebs_inventory import get_instance_states, iter_volume_records
 
 
 class Config:
     TIME_PERIOD = 300
     PAGINATION_COUNT = 300
+    GET_BATCH_SIZE = 500  # GetMetricData queries per call (the API maximum)
+    # Query Id prefix and metric name of the five metrics read per volume
+    METRICS = [
+        ("idle_time", "VolumeIdleTime"),
+        ("read_time", "VolumeTotalReadTime"),
+        ("read_ops", "VolumeReadOps"),
+        ("write_time", "VolumeTotalWriteTime"),
+        ("write_ops", "VolumeWriteOps"),
+    ]
 
 
-def get_metric_statistics(client, volume_id, metric_name):
-    response = client.get_metric_statistics(
-        Namespace="AWS/EBS",
-        MetricName=metric_name,
-        Dimensions=[
-            {"Name": "VolumeId", "Value": volume_id},
-        ],
-        StartTime=datetime.utcnow() - timedelta(minutes=5),
-        EndTime=datetime.utcnow(),
-        Period=Config.TIME_PERIOD,
-        Statistics=["Average"],
-    )
-    return response["Datapoints"][0]["Average"] if response["Datapoints"] else None
+def build_metric_queries(volume_id):
+    safe_volume_id = volume_id.replace("-", "_")
+    return [
+        {
+            "Id": f"{id_prefix}_{safe_volume_id}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": "AWS/EBS",
+                    "MetricName": metric_name,
+                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
+                },
+                "Period": Config.TIME_PERIOD,
+                "Stat": "Average",
+            },
+        }
+        for id_prefix, metric_name in Config.METRICS
+    ]
 
 
-def calculate_latency(volume_id, ec2):
-    cloudwatch = boto3.client("cloudwatch")
+def get_latency_metrics(cloudwatch, volume_ids, progress=False):
+    """
+    Fetches the five metrics of every volume for the last Config.TIME_PERIOD seconds,
+    with paginated GetMetricData calls of up to Config.GET_BATCH_SIZE queries.
+    Parameters:
+        cloudwatch: The CloudWatch client.
+        volume_ids (list): The volumes to fetch.
+        progress (bool): Print a dot per GetMetricData call.
+    Returns:
+        dict: volume ID -> {metric name: latest Average, or None without data}.
+    """
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(seconds=Config.TIME_PERIOD)
+    volumes_per_call = Config.GET_BATCH_SIZE // len(Config.METRICS)
+    volume_ids = list(volume_ids)
 
-    volume_idle_time = get_metric_statistics(cloudwatch, volume_id, "VolumeIdleTime")
+    latest = {}  # query Id -> (timestamp, value) of the latest datapoint
+    for i in range(0, len(volume_ids), volumes_per_call):
+        metric_queries = [
+            query
+            for volume_id in volume_ids[i : i + volumes_per_call]
+            for query in build_metric_queries(volume_id)
+        ]
+        next_token = None
+        while True:
+            kwargs = {
+                "MetricDataQueries": metric_queries,
+                "StartTime": start_time,
+                "EndTime": end_time,
+            }
+            if next_token:
+                kwargs["NextToken"] = next_token
+            response = cloudwatch.get_metric_data(**kwargs)
+            if progress:
+                sys.stdout.write(".")
+                sys.stdout.flush()
+            # A query's datapoints can be split over several pages
+            for result in response["MetricDataResults"]:
+                query_id = result["Id"]
+                for timestamp, value in zip(result["Timestamps"], result["Values"]):
+                    if query_id not in latest or timestamp > latest[query_id][0]:
+                        latest[query_id] = (timestamp, value)
+            next_token = response.get("NextToken")
+            if not next_token:
+                break
 
-    total_read_time = get_metric_statistics(
-        cloudwatch, volume_id, "VolumeTotalReadTime"
-    )
-    read_ops = get_metric_statistics(cloudwatch, volume_id, "VolumeReadOps")
+    metrics = {}
+    for volume_id in volume_ids:
+        safe_volume_id = volume_id.replace("-", "_")
+        metrics[volume_id] = {
+            metric_name: latest.get(f"{id_prefix}_{safe_volume_id}", (None, None))[1]
+            for id_prefix, metric_name in Config.METRICS
+        }
+    return metrics
 
-    total_write_time = get_metric_statistics(
-        cloudwatch, volume_id, "VolumeTotalWriteTime"
-    )
-    write_ops = get_metric_statistics(cloudwatch, volume_id, "VolumeWriteOps")
+
+def calculate_latency(volume, instance_states, metrics):
+    """
+    Returns the table row of one volume.
+    Parameters:
+        volume (VolumeRecord): The volume.
+        instance_states (dict): Instance ID -> state name, from get_instance_states.
+        metrics (dict): Metric name -> value for this volume, from get_latency_metrics.
+    """
+    volume_id = volume.volume_id
+
+    volume_idle_time = metrics["VolumeIdleTime"]
+    total_read_time = metrics["VolumeTotalReadTime"]
+    read_ops = metrics["VolumeReadOps"]
+    total_write_time = metrics["VolumeTotalWriteTime"]
+    write_ops = metrics["VolumeWriteOps"]
 
     read_latency = None
     write_latency = None
     overall_latency = None
 
-    if read_ops is not None and read_ops != 0:
+    if read_ops is not None and read_ops != 0 and total_read_time is not None:
         read_latency = (total_read_time / read_ops) * 1000
 
-    if write_ops is not None and write_ops != 0:
+    if write_ops is not None and write_ops != 0 and total_write_time is not None:
         write_latency = (total_write_time / write_ops) * 1000
 
     if read_latency is not None and write_latency is not None:
         overall_latency = (read_latency + write_latency) / 2
 
-    volume = ec2.Volume(volume_id)
-    instance_id = volume.attachments[0]["InstanceId"] if volume.attachments else None
-    instance_state = None
-    if instance_id:
-        instance = ec2.Instance(instance_id)
-        instance_state = instance.state["Name"]
+    instance_id = volume.instance_id or None
+    instance_state = instance_states.get(instance_id)
 
     return [
         volume_id,
@@ -75,6 +143,27 @@ def calculate_latency(volume_id, ec2):
     ]
 
 
+def ranking_latency(row):
+    # The overall latency, or the read or write latency of a volume with only one
+    # kind of I/O; None when the volume had no I/O
+    overall_latency, read_latency, write_latency = row[10], row[6], row[9]
+    if overall_latency is not None:
+        return overall_latency
+    return read_latency if read_latency is not None else write_latency
+
+
+def top_latency_rows(rows, count):
+    """
+    Returns the count rows with the highest latency (see ranking_latency), worst first.
+    heapq.nlargest keeps a heap of count rows instead of sorting every volume.
+    """
+    return heapq.nlargest(
+        count,
+        (row for row in rows if ranking_latency(row) is not None),
+        key=ranking_latency,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Calculate EBS Volume Latency")
     parser.add_argument("--volume-id", help="The volume ID to calculate latency for")
@@ -101,36 +190,66 @@ def main():
         default=1,
         help="Number of times to repeat the operation",
     )
+    parser.add_argument(
+        "--top",
+        type=int,
+        metavar="N",
+        help="Only show the N volumes with the highest latency, worst first. Volumes without read or write ops are left out.",
+    )
     args = parser.parse_args()
 
-    ec2_client = boto3.client("ec2")  # Create the EC2 client
-    ec2_resource = boto3.resource("ec2")  # Create the EC2 resource
-    paginator = ec2_client.get_paginator("describe_volumes")
+    ec2_client = get_client("ec2")  # Create the EC2 client
+    cloudwatch = get_client("cloudwatch")
 
     for run in range(args.repeat):
         print(f"\nRunning {run + 1} of {args.repeat} at {datetime.now()}")
         table_data = []
 
+        # Compact records from describe_volumes pages, and the state of every attached
+        # instance from a few batched describe_instances calls (no per-volume lookups)
+        filters = (
+            [{"Name": "volume-id", "Values": [args.volume_id]}]
+            if args.volume_id
+            else None
+        )
+        volumes = list(iter_volume_records(ec2_client, filters=filters))
+        instance_states = get_instance_states(
+            ec2_client, {volume.instance_id for volume in volumes if volume.instance_id}
+        )
+        # All five metrics of every volume from a few GetMetricData calls
+        metrics = get_latency_metrics(
+            cloudwatch,
+            [volume.volume_id for volume in volumes],
+            progress=not args.verbose,
+        )
+
         if args.volume_id:
-            table_data.append(calculate_latency(args.volume_id, ec2_resource))
+            if not volumes:
+                print(f"Volume {args.volume_id} not found.")
+            for volume in volumes:
+                table_data.append(
+                    calculate_latency(
+                        volume, instance_states, metrics[volume.volume_id]
+                    )
+                )
         else:
-            # Use paginator to handle pagination
-            for page in paginator.paginate(MaxResults=Config.PAGINATION_COUNT):
-                for volume in page["Volumes"]:
-                    volume_id = volume["VolumeId"]
-                    volume_data = calculate_latency(volume_id, ec2_resource)
-                    if args.show_all or (
-                        volume_data[2] == "running" and volume_data[1] is not None
-                    ):
-                        table_data.append(volume_data)
-
-                    if args.verbose:
-                        print(
-                            f"Calculating latency for {volume_id}: Read Ops = {volume_data[4]}, Write Ops = {volume_data[7]}, Overall Latency = {volume_data[10]} ms"
-                        )
-                    else:
-                        sys.stdout.write(".")  # Print a dot for progress
-                        sys.stdout.flush()  # Flush the output buffer
+            for volume in volumes:
+                volume_id = volume.volume_id
+                volume_data = calculate_latency(
+                    volume, instance_states, metrics[volume_id]
+                )
+                if args.show_all or (
+                    volume_data[2] == "running" and volume_data[1] is not None
+                ):
+                    table_data.append(volume_data)
+
+                if args.verbose:
+                    print(
+                        f"Calculating latency for {volume_id}: Read Ops = {volume_data[4]}, Write Ops = {volume_data[7]}, Overall Latency = {volume_data[10]} ms"
+                    )
+
+        if args.top:
+            table_data = top_latency_rows(table_data, args.top)
 
         print()  # Print a newline after the dots
         print(
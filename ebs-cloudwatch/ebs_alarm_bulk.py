@@ -0,0 +1,259 @@
+"""
+Bulk CloudWatch alarm operations for the EBS CloudWatch scripts.
+
+delete_alarms_in_batches replaces one delete_alarms call per alarm with calls of up to
+100 names (the DeleteAlarms limit), run concurrently. Throttling is handled by the
+rate limited client from ebs_clients.get_client(..., rate_limited=True).
+
+DeleteAlarms is all or nothing: if any name in the call is wrong, no alarms are
+deleted. When a batch fails, it is split in half and each half retried, so the good
+names are still deleted and every bad name ends up with its own error message. An alarm
+that does not exist (ResourceNotFound) counts as already deleted.
+
+put_alarms_concurrently streams PutMetricAlarm calls through a thread pool with a bound
+on the number of requests in flight, so the alarm definitions can be generated lazily
+for hundreds of thousands of alarms. An alarm that still fails after the rate limited
+client's own retries (or fails with a connection error) is retried on its own with
+jittered backoff before it is reported as failed.
+
+Both functions can record their progress in a Checkpoint, a JSON lines file with a
+header (for example the plan being applied) followed by one line per finished alarm.
+A run that crashes partway through is resumed from the checkpoint: the finished alarms
+are skipped and nothing needs to be listed again.
+
+    checkpoint = Checkpoint("ebs-alarm-checkpoint.jsonl")
+    checkpoint.start({"plan": plan})
+    put, failures = put_alarms_concurrently(
+        cloudwatch,
+        (details for details in alarms if details["AlarmName"] not in checkpoint.done),
+        checkpoint=checkpoint,
+    )
+    checkpoint.close()
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ebs_rate_limiter import (
+    backoff_delay,
+    get_error_name,
+    is_retryable_error,
+    is_throttle_error,
+)
+
+
+class Config:
+    DELETE_BATCH_SIZE = 100  # DeleteAlarms accepts up to 100 alarm names per call
+    WORKERS = 4  # Concurrent DeleteAlarms / PutMetricAlarm calls
+    IN_FLIGHT_PER_WORKER = 4  # Alarm puts queued per worker, bounds memory use
+    PUT_RETRIES = 3  # Extra attempts for an alarm put that still fails after the client's retries
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file recording which alarms are done. The first line is a
+    header describing the work, every other line is {"done": alarm name}. Lines are
+    flushed as they are written, and a line cut short by a crash is ignored on load.
+    """
+
+    def __init__(self, checkpoint_file):
+        self.checkpoint_file = checkpoint_file
+        self.header = None
+        self.done = set()
+        self._file = None
+
+        if not os.path.exists(checkpoint_file):
+            return
+        with open(checkpoint_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning(
+                        f"Ignoring incomplete line in checkpoint {checkpoint_file}"
+                    )
+                    continue
+                if "done" in entry:
+                    self.done.add(entry["done"])
+                elif self.header is None:
+                    self.header = entry
+        logging.info(
+            f"Loaded checkpoint {checkpoint_file} with {len(self.done)} finished alarms"
+        )
+
+    def start(self, header):
+        """
+        Opens the checkpoint for writing. The header is only written to a new
+        checkpoint, a resumed one keeps its original header.
+        """
+        self._file = open(self.checkpoint_file, "a")
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")  # Finish the line cut short by a crash
+        if self.header is None:
+            self.header = header
+            self._write(header)
+
+    def record(self, alarm_names):
+        for alarm_name in alarm_names:
+            self.done.add(alarm_name)
+            self._write({"done": alarm_name})
+
+    def _ends_with_newline(self):
+        with open(self.checkpoint_file, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def chunk_list(items, size):
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def delete_alarm_batch(cloudwatch, alarm_names):
+    """
+    Deletes one batch of alarms, bisecting the batch on errors. An alarm that does not
+    exist is reported as deleted.
+    Returns:
+        tuple: (list of deleted alarm names, dict of alarm name -> error message)
+    """
+    try:
+        cloudwatch.delete_alarms(AlarmNames=alarm_names)
+        logging.info(f"Deleted {len(alarm_names)} alarms")
+        return alarm_names, {}
+    except Exception as e:
+        if len(alarm_names) == 1 and get_error_name(e) == "ResourceNotFound":
+            logging.info(f"Alarm {alarm_names[0]} does not exist, nothing to delete")
+            return alarm_names, {}
+        # Splitting a batch that is still throttled after all retries would only add calls.
+        if len(alarm_names) == 1 or is_throttle_error(e):
+            logging.warning(
+                f"Failed to delete {len(alarm_names)} alarm(s) {alarm_names}: {e}"
+            )
+            return [], {alarm_name: str(e) for alarm_name in alarm_names}
+
+        logging.warning(
+            f"Batch delete of {len(alarm_names)} alarms failed ({e}), splitting the batch to isolate the failure"
+        )
+
+    middle = len(alarm_names) // 2
+    deleted, failures = delete_alarm_batch(cloudwatch, alarm_names[:middle])
+    more_deleted, more_failures = delete_alarm_batch(cloudwatch, alarm_names[middle:])
+    failures.update(more_failures)
+    return deleted + more_deleted, failures
+
+
+def delete_alarms_in_batches(cloudwatch, alarm_names, workers=None, checkpoint=None):
+    """
+    Deletes alarms in batches of up to Config.DELETE_BATCH_SIZE names, with the batches
+    running concurrently.
+    Parameters:
+        cloudwatch: CloudWatch client, ideally from ebs_clients.get_client(..., rate_limited=True) so throttles are retried.
+        alarm_names (list): Names of the alarms to delete.
+        workers (int): Concurrent DeleteAlarms calls. Defaults to Config.WORKERS.
+        checkpoint (Checkpoint): Records each batch's deleted alarms as it finishes.
+    Returns:
+        tuple: (list of deleted alarm names, dict of alarm name -> error message)
+    """
+    alarm_names = list(dict.fromkeys(alarm_names))  # Drop duplicates, keep the order
+    if not alarm_names:
+        return [], {}
+
+    batches = chunk_list(alarm_names, Config.DELETE_BATCH_SIZE)
+    deleted = []
+    failures = {}
+
+    with ThreadPoolExecutor(max_workers=workers or Config.WORKERS) as executor:
+        for batch_deleted, batch_failures in executor.map(
+            lambda batch: delete_alarm_batch(cloudwatch, batch), batches
+        ):
+            deleted.extend(batch_deleted)
+            failures.update(batch_failures)
+            if checkpoint:
+                checkpoint.record(batch_deleted)
+
+    logging.info(
+        f"Deleted {len(deleted)} of {len(alarm_names)} alarms in {len(batches)} batches, {len(failures)} failed"
+    )
+    return deleted, failures
+
+
+def put_alarm_with_retry(cloudwatch, alarm_details):
+    """
+    Puts one alarm, retrying it with jittered backoff up to Config.PUT_RETRIES times.
+    Returns:
+        str: None on success, otherwise the error message.
+    """
+    attempt = 0
+    while True:
+        try:
+            cloudwatch.put_metric_alarm(**alarm_details)
+            return None
+        except Exception as e:
+            # Only throttles, transient errors and connection errors or timeouts are
+            # retried; a malformed alarm (e.g. ParamValidationError) fails right away
+            if not is_retryable_error(e) or attempt >= Config.PUT_RETRIES:
+                return str(e)
+            delay = backoff_delay(attempt)
+            logging.warning(
+                f"Put of alarm {alarm_details['AlarmName']} failed ({e}), retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def put_alarms_concurrently(cloudwatch, alarms, workers=None, checkpoint=None):
+    """
+    Puts alarms on a thread pool, keeping at most workers * Config.IN_FLIGHT_PER_WORKER
+    puts submitted at a time. alarms is consumed lazily, so it can be a generator.
+    Parameters:
+        cloudwatch: CloudWatch client, ideally from ebs_clients.get_client(..., rate_limited=True) so throttles are retried.
+        alarms (iterable): put_metric_alarm keyword arguments of each alarm.
+        workers (int): Concurrent PutMetricAlarm calls. Defaults to Config.WORKERS.
+        checkpoint (Checkpoint): Records each alarm as soon as its put succeeds.
+    Returns:
+        tuple: (list of alarm names put, dict of alarm name -> error message)
+    """
+    workers = workers or Config.WORKERS
+    max_in_flight = workers * Config.IN_FLIGHT_PER_WORKER
+    alarms = iter(alarms)
+    put = []
+    failures = {}
+    in_flight = {}  # future -> alarm name
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for alarm_details in alarms:
+                future = executor.submit(
+                    put_alarm_with_retry, cloudwatch, alarm_details
+                )
+                in_flight[future] = alarm_details["AlarmName"]
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                alarm_name = in_flight.pop(future)
+                error = future.result()
+                if error is None:
+                    put.append(alarm_name)
+                    if checkpoint:
+                        checkpoint.record([alarm_name])
+                else:
+                    logging.error(f"Failed to put alarm {alarm_name}: {error}")
+                    failures[alarm_name] = error
+
+    logging.info(f"Put {len(put)} alarms, {len(failures)} failed")
+    return put, failures
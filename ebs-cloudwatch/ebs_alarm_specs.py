@@ -0,0 +1,185 @@
+"""
+Alarm definitions shared by the EBS alarm scripts and the Terraform Lambda functions.
+
+Every alarm type is declared once in ALARM_SPECS: its name prefix, threshold,
+evaluation settings and metric math. All the tools build their alarms from it, so they
+agree on the alarm names (the prefix followed by the volume ID) and on the definitions,
+and one tool's reconciliation no longer rewrites or deletes another tool's alarms.
+
+An AlarmTemplate is a spec compiled once with the alarm actions filled in. Rendering
+it for a volume only substitutes the volume ID: the parts that do not depend on the
+volume are built once and shared by every payload, so treat the payloads as read-only.
+
+    template = get_alarm_template("impairedvol", alarm_actions=[sns_topic_arn])
+    cloudwatch.put_metric_alarm(**template.render(volume_id, description))
+
+Names used by earlier versions of the tools are listed under "legacy_name_prefixes" so
+the alarms still carrying them can be found (see parse_legacy_alarm_name).
+"""
+
+from functools import lru_cache
+
+
+class Config:
+    NAMESPACE = "AWS/EBS"
+    STAT = "Average"
+    COMPARISON_OPERATOR = "GreaterThanOrEqualToThreshold"
+    TREAT_MISSING_DATA = "missing"
+
+
+ALARM_SPECS = {
+    "impairedvol": {
+        "name_prefix": "EBS_ImpairedVol_",
+        "legacy_name_prefixes": ["ImpairedVol_"],
+        "threshold": 1,  # The expression is either 0 or 1
+        "period": 60,  # EBS metrics are vended every 60 seconds by default
+        "evaluation_periods": 2,  # How many times the threshold has to be breached before setting off the alarm
+        "datapoints_to_alarm": 2,  # Minimum number of datapoints the alarm needs within the alarm period
+        "label": "ImpairedVolume",
+        # I/O is queued but no read or write completes
+        "expression": "IF(m3>0 AND m1+m2==0, 1, 0)",
+        # The impaired volume alarms have always set a Period on the expression; keeping
+        # it means existing alarms still match and --update does not re-put them
+        "expression_period": 60,
+        "metrics": {
+            "m3": "VolumeQueueLength",
+            "m1": "VolumeReadOps",
+            "m2": "VolumeWriteBytes",
+        },
+    },
+    "readlatency": {
+        "name_prefix": "EBS_ReadLatency_",
+        "legacy_name_prefixes": ["Read Latency "],
+        "threshold": 50,  # Milliseconds
+        "period": 60,
+        "evaluation_periods": 2,
+        "datapoints_to_alarm": 2,
+        "label": "Latency",
+        "expression": "(m1 / m2) * 1000",
+        "metrics": {"m1": "VolumeTotalReadTime", "m2": "VolumeReadOps"},
+    },
+    "writelatency": {
+        "name_prefix": "EBS_WriteLatency_",
+        "legacy_name_prefixes": [],
+        "threshold": 200,  # Milliseconds
+        "period": 60,
+        "evaluation_periods": 2,
+        "datapoints_to_alarm": 2,
+        "label": "Latency",
+        "expression": "(m1 / m2) * 1000",
+        "metrics": {"m1": "VolumeTotalWriteTime", "m2": "VolumeWriteOps"},
+    },
+}
+
+ALARM_TYPES = list(ALARM_SPECS)
+
+
+class AlarmTemplate:
+    """
+    put_metric_alarm arguments of one alarm type, complete except for the volume ID.
+    """
+
+    def __init__(self, alarm_type, alarm_actions, ok_actions=()):
+        spec = ALARM_SPECS[alarm_type]
+        self.alarm_type = alarm_type
+        self.name_prefix = spec["name_prefix"]
+
+        self._base = {
+            "AlarmActions": list(alarm_actions),
+            "EvaluationPeriods": spec["evaluation_periods"],
+            "DatapointsToAlarm": spec["datapoints_to_alarm"],
+            "Threshold": spec["threshold"],
+            "ComparisonOperator": Config.COMPARISON_OPERATOR,
+            "TreatMissingData": Config.TREAT_MISSING_DATA,
+        }
+        if ok_actions:
+            self._base["OKActions"] = list(ok_actions)
+
+        self._expression = {
+            "Id": "e1",
+            "Expression": spec["expression"],
+            "Label": spec["label"],
+            "ReturnData": True,
+        }
+        if "expression_period" in spec:
+            self._expression["Period"] = spec["expression_period"]
+        # (Id, Metric without Dimensions) of each metric, in the spec's order
+        self._metrics = [
+            (
+                metric_id,
+                {"Namespace": Config.NAMESPACE, "MetricName": metric_name},
+            )
+            for metric_id, metric_name in spec["metrics"].items()
+        ]
+        self._period = spec["period"]
+
+    def alarm_name(self, volume_id):
+        return self.name_prefix + volume_id
+
+    def render(self, volume_id, description=None):
+        """
+        Returns the put_metric_alarm arguments of the alarm for one volume.
+        """
+        dimensions = [{"Name": "VolumeId", "Value": volume_id}]
+        alarm = dict(self._base)
+        alarm["AlarmName"] = self.name_prefix + volume_id
+        if description is not None:
+            alarm["AlarmDescription"] = description
+        alarm["Metrics"] = [dict(self._expression)] + [
+            {
+                "Id": metric_id,
+                "MetricStat": {
+                    "Metric": dict(metric, Dimensions=dimensions),
+                    "Period": self._period,
+                    "Stat": Config.STAT,
+                },
+                "ReturnData": False,
+            }
+            for metric_id, metric in self._metrics
+        ]
+        return alarm
+
+
+@lru_cache(maxsize=None)
+def _get_alarm_template(alarm_type, alarm_actions, ok_actions):
+    return AlarmTemplate(alarm_type, alarm_actions, ok_actions)
+
+
+def get_alarm_template(alarm_type, alarm_actions=(), ok_actions=()):
+    """
+    Returns the compiled template of an alarm type for these actions, compiling it on
+    first use.
+    """
+    return _get_alarm_template(alarm_type, tuple(alarm_actions), tuple(ok_actions))
+
+
+def get_alarm_prefix(alarm_type):
+    return ALARM_SPECS[alarm_type]["name_prefix"]
+
+
+def get_alarm_name(alarm_type, volume_id):
+    return ALARM_SPECS[alarm_type]["name_prefix"] + volume_id
+
+
+def get_legacy_alarm_names(alarm_type, volume_id):
+    """
+    Returns the names earlier versions of the tools gave the volume's alarm, when the
+    name was only a prefix and the volume ID.
+    """
+    return [
+        prefix + volume_id
+        for prefix in ALARM_SPECS[alarm_type]["legacy_name_prefixes"]
+    ]
+
+
+def parse_legacy_alarm_name(alarm_type, alarm_name):
+    """
+    Returns the volume ID of an alarm named by an earlier version of the tools, or None
+    if the name has none of the alarm type's legacy prefixes. Legacy names can have a
+    tag value between the prefix and the volume ID ("Read Latency <tag> <volume ID>").
+    """
+    for prefix in ALARM_SPECS[alarm_type]["legacy_name_prefixes"]:
+        if alarm_name.startswith(prefix):
+            words = alarm_name[len(prefix) :].split()
+            return words[-1] if words else None
+    return None
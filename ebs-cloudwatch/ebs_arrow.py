@@ -0,0 +1,115 @@
+"""
+Parquet and Arrow IPC (Feather v2) output for the EBS scripts that export many rows.
+
+ArrowRowWriter is used like csv.writer, but writes typed columns in row groups, so a
+large export is neither held in memory nor parsed back from text:
+
+    schema = pa.schema([("Volume ID", pa.dictionary(pa.int32(), pa.string()))])
+    with ArrowRowWriter("export.arrow", schema, "arrow", 100000) as writer:
+        writer.writerow(["vol-0123456789abcdef0"])
+
+pyarrow is optional: pa is None when it is not installed, and the scripts check that
+before offering the parquet and arrow formats.
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+class Config:
+    ROW_GROUP_SIZE = 100000  # Rows per Parquet row group / Arrow record batch
+
+
+class ArrowRowWriter:
+    """
+    Writes rows to a Parquet or Arrow IPC (Feather v2) file, one row group (record
+    batch) every row_group_size rows, so only one row group is held in memory.
+    Columns with a dictionary type keep one dictionary for the whole file. It can be
+    seeded with the values known up front (dictionaries); values seen later are added
+    to the end and written as dictionary deltas.
+    Like csv.writer, rows are written with writerow(). Use it as a context manager so
+    the file is closed, with its footer, even when writing fails partway through.
+    Parameters:
+        sink (str or file): Path of the file, or a file object opened in binary mode.
+        schema (pa.Schema): Column names and types.
+        file_format (str): "parquet" or "arrow".
+        row_group_size (int): Rows per row group. Defaults to Config.ROW_GROUP_SIZE.
+        dictionaries (dict): Optional column name -> values known up front.
+    """
+
+    def __init__(
+        self,
+        sink,
+        schema,
+        file_format,
+        row_group_size=Config.ROW_GROUP_SIZE,
+        dictionaries=None,
+    ):
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self.columns = [[] for _ in schema]
+        # Column index -> {value: dictionary index}, for the dictionary columns
+        self.dictionaries = {
+            index: dict.fromkeys((dictionaries or {}).get(field.name, []))
+            for index, field in enumerate(schema)
+            if pa.types.is_dictionary(field.type)
+        }
+        for dictionary in self.dictionaries.values():
+            for position, value in enumerate(dictionary):
+                dictionary[value] = position
+        if file_format == "parquet":
+            self.writer = pq.ParquetWriter(sink, schema)
+        else:
+            self.writer = pa.ipc.new_file(
+                sink,
+                schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+            )
+
+    def writerow(self, row):
+        for index, value in enumerate(row):
+            dictionary = self.dictionaries.get(index)
+            # Missing values (None) are written as null indices, not dictionary entries
+            if dictionary is not None and value is not None:
+                value = dictionary.setdefault(value, len(dictionary))
+            self.columns[index].append(value)
+        if len(self.columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        arrays = []
+        for index, field in enumerate(self.schema):
+            if index in self.dictionaries:
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(
+                        pa.array(self.columns[index], type=field.type.index_type),
+                        pa.array(list(self.dictionaries[index]), field.type.value_type),
+                    )
+                )
+            else:
+                arrays.append(pa.array(self.columns[index], type=field.type))
+        batch = pa.record_batch(arrays, schema=self.schema)
+        if isinstance(self.writer, pq.ParquetWriter):
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+        self.columns = [[] for _ in self.schema]
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,127 @@
+"""
+Shared boto3 client factory for the EBS CloudWatch scripts.
+
+Creating a boto3 client costs tens of milliseconds and opens a new HTTP connection pool,
+so building one per volume or per helper function adds up quickly. get_client returns a
+cached client for the same (service, region, endpoint, credentials), keeping the most
+recently used clients in an LRU cache so their connection pools are reused.
+
+    cloudwatch = get_client("cloudwatch", region="us-west-2")
+    ec2 = get_client("ec2", region="us-west-2", session=assumed_role_session)
+
+Clients keep botocore's standard retry mode unless rate_limited=True is passed, in which
+case they are wrapped with ebs_rate_limiter.RateLimitedClient, which does the retrying.
+"""
+
+import threading
+from collections import OrderedDict
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+from ebs_rate_limiter import RateLimitedClient, BOTO_CONFIG
+
+
+class Config:
+    MAX_CLIENTS = 32  # Number of clients kept in the LRU cache
+    MAX_POOL_CONNECTIONS = 20  # HTTP connections per client (botocore default is 10)
+    TCP_KEEPALIVE = True  # Keep idle pooled connections alive between calls
+    RETRIES = {"mode": "standard"}  # botocore retries of clients without the rate limiter
+
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+_default_session = None
+
+
+def get_default_session():
+    """
+    Returns one boto3 Session shared by the whole script, created on first use.
+    """
+    global _default_session
+    with _clients_lock:
+        if _default_session is None:
+            _default_session = boto3.session.Session()
+        return _default_session
+
+
+def credentials_key(session):
+    """
+    Identifies the credentials behind a session so clients for different accounts or
+    assumed roles are never shared.
+    """
+    credentials = session.get_credentials()
+    if credentials is None:
+        return None
+    frozen = credentials.get_frozen_credentials()
+    return hash((frozen.access_key, frozen.secret_key, frozen.token))
+
+
+def get_client(
+    service,
+    region=None,
+    session=None,
+    endpoint_url=None,
+    max_pool_connections=None,
+    rate_limited=False,
+    timeout=None,
+):
+    """
+    Returns a cached boto3 client, creating it if needed.
+    Parameters:
+        service (str): AWS service name, e.g. "ec2" or "cloudwatch".
+        region (str): AWS region. Defaults to the session's region.
+        session (boto3.Session): Session to create the client from. Defaults to a shared session.
+        endpoint_url (str): Optional endpoint, e.g. a VPC endpoint.
+        max_pool_connections (int): HTTP connection pool size. Defaults to Config.MAX_POOL_CONNECTIONS.
+        rate_limited (bool): Wrap the client with ebs_rate_limiter.RateLimitedClient, which replaces botocore's retries.
+        timeout (int): Optional connect and read timeout in seconds. Defaults to botocore's 60 seconds.
+    Returns:
+        The boto3 client (or its rate limited wrapper).
+    """
+    session = session or get_default_session()
+    region = region or session.region_name
+    max_pool_connections = max_pool_connections or Config.MAX_POOL_CONNECTIONS
+
+    key = (
+        service,
+        region,
+        endpoint_url,
+        max_pool_connections,
+        rate_limited,
+        timeout,
+        credentials_key(session),
+    )
+
+    with _clients_lock:
+        if key in _clients:
+            _clients.move_to_end(key)
+            return _clients[key]
+
+        boto_config = BotoConfig(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=Config.TCP_KEEPALIVE,
+        )
+        if timeout is not None:
+            boto_config = boto_config.merge(
+                BotoConfig(connect_timeout=timeout, read_timeout=timeout)
+            )
+        if rate_limited:
+            boto_config = BOTO_CONFIG.merge(boto_config)
+        else:
+            boto_config = boto_config.merge(BotoConfig(retries=Config.RETRIES))
+
+        client = session.client(
+            service,
+            region_name=region,
+            endpoint_url=endpoint_url,
+            config=boto_config,
+        )
+        if rate_limited:
+            client = RateLimitedClient(client)
+
+        _clients[key] = client
+        if len(_clients) > Config.MAX_CLIENTS:
+            _clients.popitem(last=False)
+
+        return client
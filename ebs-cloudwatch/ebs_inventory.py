@@ -0,0 +1,282 @@
+"""
+EBS volume inventory helpers for the EBS CloudWatch scripts.
+
+Page through describe_volumes once, then resolve the Name tag of every attached
+instance with a few batched describe_instances calls, and keep the result in memory:
+
+    volume_details = get_volume_details_index(ec2, filters=filters)
+    volume_details["vol-0123456789abcdef0"]["attached_instance_name"]
+
+Anything that needs per-volume information (alarm descriptions, for example) reads it
+from the index instead of calling EC2 again for each volume.
+
+Code that only needs to walk the volumes once (CSV rows, metric queries, dashboard
+widgets) can stream slim records instead, one describe_volumes page at a time:
+
+    for volume in iter_volumes(ec2, fields=["VolumeId", "VolumeType"]):
+        ...
+
+Tools that keep many volumes around use VolumeRecord, a compact read-only record built
+once from a describe_volumes record, instead of the boto3 dict or a boto3 resource
+object (whose attributes can trigger more API calls when read):
+
+    records = list(iter_volume_records(ec2))
+    records[0].instance_id, records[0].tag("Name")
+"""
+
+import logging
+import sys
+
+
+class Config:
+    PAGINATION_COUNT = 300  # describe_volumes / describe_instances page size
+    FILTER_VALUES_LIMIT = 200  # Max values per EC2 filter, so IDs are looked up in chunks
+    # Fields kept by iter_volumes when no projection is given
+    SLIM_FIELDS = [
+        "VolumeId",
+        "State",
+        "VolumeType",
+        "Size",
+        "AvailabilityZone",
+        "Attachments",
+        "Tags",
+    ]
+
+
+def chunk_list(items, size):
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def project_volume(volume, fields):
+    """
+    Returns a slim copy of a describe_volumes record with only the given top-level
+    fields, or the record itself when fields is None.
+    """
+    if fields is None:
+        return volume
+    return {field: volume[field] for field in fields if field in volume}
+
+
+def iter_volumes(ec2, filters=None, fields=Config.SLIM_FIELDS):
+    """
+    Yields describe_volumes records page by page, projected to fields (all fields when
+    None). Only one page of full records is held at a time, so a consumer that writes
+    or aggregates as it goes uses constant memory however many volumes there are.
+    Parameters:
+        ec2: EC2 client.
+        filters (list): Optional describe_volumes filters.
+        fields (list): Fields to keep. Defaults to Config.SLIM_FIELDS.
+    """
+    paginator = ec2.get_paginator("describe_volumes")
+    for page in paginator.paginate(
+        Filters=list(filters or []), MaxResults=Config.PAGINATION_COUNT
+    ):
+        for volume in page.get("Volumes", []):
+            yield project_volume(volume, fields)
+
+
+def get_volume_inventory(ec2, filters=None, volume_ids=None):
+    """
+    Returns the full describe_volumes records, indexed by volume ID.
+    Parameters:
+        ec2: EC2 client.
+        filters (list): Optional describe_volumes filters, e.g. a tag filter.
+        volume_ids (list): Optional volume IDs to limit the inventory to.
+    """
+    filters = list(filters or [])
+
+    if volume_ids is None:
+        filter_sets = [filters]
+    else:
+        filter_sets = [
+            filters + [{"Name": "volume-id", "Values": chunk}]
+            for chunk in chunk_list(list(volume_ids), Config.FILTER_VALUES_LIMIT)
+        ]
+
+    volumes = {}
+    for filter_set in filter_sets:
+        for volume in iter_volumes(ec2, filters=filter_set, fields=None):
+            volumes[volume["VolumeId"]] = volume
+
+    logging.debug(f"Inventory has {len(volumes)} volumes")
+    return volumes
+
+
+def iter_instances(ec2, instance_ids):
+    """
+    Yields the describe_instances records of the given instances, using batched calls
+    filtered by up to Config.FILTER_VALUES_LIMIT instance IDs each.
+    """
+    instance_ids = sorted(set(instance_ids))
+    if not instance_ids:
+        return
+
+    paginator = ec2.get_paginator("describe_instances")
+    for chunk in chunk_list(instance_ids, Config.FILTER_VALUES_LIMIT):
+        for page in paginator.paginate(
+            Filters=[{"Name": "instance-id", "Values": chunk}],
+            MaxResults=Config.PAGINATION_COUNT,
+        ):
+            for reservation in page["Reservations"]:
+                yield from reservation["Instances"]
+
+
+def get_instance_names(ec2, instance_ids):
+    """
+    Returns the Name tag of each instance, indexed by instance ID, using batched
+    describe_instances calls filtered by instance ID.
+    """
+    instance_names = {
+        instance["InstanceId"]: next(
+            (tag["Value"] for tag in instance.get("Tags", []) if tag["Key"] == "Name"),
+            "",
+        )
+        for instance in iter_instances(ec2, instance_ids)
+    }
+    logging.debug(f"Resolved names for {len(instance_names)} instances")
+    return instance_names
+
+
+def get_instance_states(ec2, instance_ids):
+    """
+    Returns the state name (e.g. "running") of each instance, indexed by instance ID,
+    using batched describe_instances calls filtered by instance ID.
+    """
+    return {
+        instance["InstanceId"]: sys.intern(instance["State"]["Name"])
+        for instance in iter_instances(ec2, instance_ids)
+    }
+
+
+def get_attached_instance_id(volume):
+    attachments = volume.get("Attachments", [])
+    return attachments[0].get("InstanceId", "") if attachments else ""
+
+
+class VolumeRecord:
+    """
+    Compact, read-only EBS volume record, built once from a describe_volumes record.
+    Fields are stored in __slots__ (no per-instance dict). The strings that repeat
+    across a fleet (state, type, AZ, tag keys and values) are interned so each distinct
+    value is stored once, and the tags are kept as a tuple of (key, value) pairs.
+    Only the first attachment is kept (instance_id, attachment_state); multi-attach
+    volumes need the full describe_volumes record.
+    """
+
+    __slots__ = (
+        "volume_id",
+        "state",
+        "volume_type",
+        "availability_zone",
+        "size",
+        "create_time",
+        "instance_id",
+        "attachment_state",
+        "tag_items",
+    )
+
+    def __init__(
+        self,
+        volume_id,
+        state,
+        volume_type,
+        availability_zone,
+        size,
+        create_time=None,
+        instance_id="",
+        attachment_state="",
+        tag_items=(),
+    ):
+        # Slots are assigned through object.__setattr__ because __setattr__ is blocked
+        set_slot = object.__setattr__
+        set_slot(self, "volume_id", volume_id)
+        set_slot(self, "state", sys.intern(state))
+        set_slot(self, "volume_type", sys.intern(volume_type))
+        set_slot(self, "availability_zone", sys.intern(availability_zone))
+        set_slot(self, "size", size)
+        set_slot(self, "create_time", create_time)
+        set_slot(self, "instance_id", instance_id)
+        set_slot(self, "attachment_state", sys.intern(attachment_state))
+        set_slot(
+            self,
+            "tag_items",
+            tuple((sys.intern(key), sys.intern(value)) for key, value in tag_items),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"VolumeRecord is read-only, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"VolumeRecord is read-only, cannot delete {name}")
+
+    def __repr__(self):
+        return (
+            f"VolumeRecord({self.volume_id}, {self.state}, {self.volume_type}, "
+            f"{self.availability_zone}, {self.size} GiB, {self.instance_id or None})"
+        )
+
+    @classmethod
+    def from_volume(cls, volume):
+        attachments = volume.get("Attachments") or [{}]
+        return cls(
+            volume_id=volume["VolumeId"],
+            state=volume.get("State", ""),
+            volume_type=volume.get("VolumeType", ""),
+            availability_zone=volume.get("AvailabilityZone", ""),
+            size=volume.get("Size", 0),
+            create_time=volume.get("CreateTime"),
+            instance_id=attachments[0].get("InstanceId", ""),
+            attachment_state=attachments[0].get("State", ""),
+            tag_items=[(tag["Key"], tag["Value"]) for tag in volume.get("Tags", [])],
+        )
+
+    @property
+    def tags(self):
+        return dict(self.tag_items)
+
+    def tag(self, key, default=None):
+        for tag_key, value in self.tag_items:
+            if tag_key == key:
+                return value
+        return default
+
+
+def iter_volume_records(ec2, filters=None):
+    """
+    Yields a VolumeRecord for every volume, one describe_volumes page at a time.
+    """
+    for volume in iter_volumes(ec2, filters=filters, fields=None):
+        yield VolumeRecord.from_volume(volume)
+
+
+def build_volume_details(volume, instance_names):
+    """
+    Converts a describe_volumes record into the volume details dict used for alarm
+    descriptions.
+    """
+    instance_id = get_attached_instance_id(volume)
+    return {
+        "volume_id": volume["VolumeId"],
+        "tags_dict": {tag["Key"]: tag["Value"] for tag in volume.get("Tags", [])},
+        "availability_zone": volume["AvailabilityZone"],
+        "attached_instance_id": instance_id,
+        "attached_instance_name": instance_names.get(instance_id, ""),
+    }
+
+
+def get_volume_details_index(ec2, filters=None, volume_ids=None):
+    """
+    Builds the in-memory volume details index: one describe_volumes pass plus batched
+    describe_instances calls for the attached instances.
+    Returns:
+        dict: volume ID -> volume details (volume_id, tags_dict, availability_zone,
+        attached_instance_id, attached_instance_name)
+    """
+    volumes = get_volume_inventory(ec2, filters=filters, volume_ids=volume_ids)
+    instance_ids = {get_attached_instance_id(volume) for volume in volumes.values()}
+    instance_ids.discard("")  # Unattached volumes
+    instance_names = get_instance_names(ec2, instance_ids)
+    return {
+        volume_id: build_volume_details(volume, instance_names)
+        for volume_id, volume in volumes.items()
+    }
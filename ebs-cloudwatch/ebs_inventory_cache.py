@@ -0,0 +1,453 @@
+"""
+On-disk EBS volume inventory cache for the EBS CloudWatch scripts.
+
+Paging through describe_volumes for a large region takes minutes. The first run keeps a
+snapshot of every volume record in a local SQLite file, keyed by account and region, and
+later runs read it back instead:
+
+    volumes = get_cached_volumes(ec2, filters=filters)  # volume ID -> volume record
+    volume_details = get_cached_volume_details_index(ec2, filters=filters)
+
+    for volume in iter_cached_volumes(ec2, fields=["VolumeId", "State"]):
+        ...  # streamed from the snapshot, one record at a time
+
+How a snapshot is refreshed depends on the mode:
+    auto:  use the snapshot while it is younger than Config.TTL, then do a delta refresh.
+           A full refresh is done when there is no snapshot, when the last full refresh is
+           older than Config.FULL_REFRESH_INTERVAL, or when the delta refresh fails.
+    delta: refresh only the volumes that changed since the snapshot.
+    full:  page through describe_volumes again and replace the snapshot.
+    off:   do not use the cache at all.
+
+EC2 cannot list "volumes changed since", so the delta refresh asks CloudTrail
+(LookupEvents) which volumes and instances had write events since the last refresh,
+re-describes just those volumes and drops the ones that no longer exist.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+
+from ebs_clients import get_client
+from ebs_inventory import (
+    build_volume_details,
+    chunk_list,
+    get_instance_names,
+    get_volume_details_index,
+    get_volume_inventory,
+    iter_volumes,
+    project_volume,
+    Config as InventoryConfig,
+)
+
+
+class Config:
+    CACHE_FILE = "ebs-inventory-cache.sqlite"  # SQLite file, relative to the working directory
+    TTL = 300  # Seconds a snapshot is used as is, without calling EC2
+    FULL_REFRESH_INTERVAL = 24 * 3600  # Seconds between full refreshes in auto mode
+    CLOUDTRAIL_LAG = 900  # Seconds of overlap between delta windows, as CloudTrail events can take up to 15 minutes to show up
+    CLOUDTRAIL_RESOURCE_TYPES = ["AWS::EC2::Volume", "AWS::EC2::Instance"]
+    MODES = ["auto", "delta", "full", "off"]
+
+
+# Filters that can be answered from the snapshot. Any other filter goes to EC2 directly.
+FILTER_FIELDS = {
+    "volume-id": lambda volume: [volume["VolumeId"]],
+    "status": lambda volume: [volume["State"]],
+    "availability-zone": lambda volume: [volume["AvailabilityZone"]],
+    "volume-type": lambda volume: [volume["VolumeType"]],
+    "size": lambda volume: [str(volume["Size"])],
+    "attachment.instance-id": lambda volume: [
+        attachment.get("InstanceId", "")
+        for attachment in volume.get("Attachments", [])
+    ],
+    "tag-key": lambda volume: [tag["Key"] for tag in volume.get("Tags", [])],
+}
+
+
+def get_filter_values(volume, filter_name):
+    if filter_name.startswith("tag:"):
+        tag_key = filter_name[len("tag:") :]
+        return [tag["Value"] for tag in volume.get("Tags", []) if tag["Key"] == tag_key]
+    return FILTER_FIELDS[filter_name](volume)
+
+
+def can_filter_locally(filters):
+    return all(
+        f["Name"].startswith("tag:") or f["Name"] in FILTER_FIELDS for f in filters
+    )
+
+
+def matches_filters(volume, filters):
+    """
+    Applies describe_volumes filters to a cached record, including the * and ? wildcards.
+    A volume matches when every filter matches at least one of its values.
+    """
+    for f in filters:
+        values = get_filter_values(volume, f["Name"])
+        if not any(
+            fnmatchcase(value, pattern) for value in values for pattern in f["Values"]
+        ):
+            return False
+    return True
+
+
+def encode_volume(volume):
+    return json.dumps(volume, default=lambda o: o.isoformat(), separators=(",", ":"))
+
+
+def decode_volume(record):
+    volume = json.loads(record)
+    # Restore the datetimes boto3 returns so cached records look like live ones
+    if "CreateTime" in volume:
+        volume["CreateTime"] = datetime.fromisoformat(volume["CreateTime"])
+    for attachment in volume.get("Attachments", []):
+        if "AttachTime" in attachment:
+            attachment["AttachTime"] = datetime.fromisoformat(attachment["AttachTime"])
+    return volume
+
+
+def open_cache(cache_file):
+    connection = sqlite3.connect(cache_file, timeout=30)
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            account TEXT, region TEXT, refreshed REAL, full_refreshed REAL,
+            PRIMARY KEY (account, region));
+        CREATE TABLE IF NOT EXISTS volumes (
+            account TEXT, region TEXT, volume_id TEXT, record TEXT,
+            PRIMARY KEY (account, region, volume_id));
+        CREATE TABLE IF NOT EXISTS instance_names (
+            account TEXT, region TEXT, instance_id TEXT, name TEXT,
+            PRIMARY KEY (account, region, instance_id));
+        """
+    )
+    return connection
+
+
+def get_account_id(region):
+    return get_client("sts", region=region).get_caller_identity()["Account"]
+
+
+def load_snapshot(connection, account, region):
+    """
+    Returns the snapshot row (refreshed and full_refreshed times) or None if there is no
+    snapshot. The volumes themselves are read with iter_snapshot_volumes.
+    """
+    snapshot = connection.execute(
+        "SELECT refreshed, full_refreshed FROM snapshots WHERE account = ? AND region = ?",
+        (account, region),
+    ).fetchone()
+    if snapshot is None:
+        return None
+    return {"refreshed": snapshot[0], "full_refreshed": snapshot[1]}
+
+
+def iter_snapshot_volumes(connection, account, region):
+    # Decodes one row at a time from the cursor
+    for (record,) in connection.execute(
+        "SELECT record FROM volumes WHERE account = ? AND region = ?",
+        (account, region),
+    ):
+        yield decode_volume(record)
+
+
+def read_snapshot_volumes(connection, account, region):
+    return {
+        volume["VolumeId"]: volume
+        for volume in iter_snapshot_volumes(connection, account, region)
+    }
+
+
+def save_volumes(connection, account, region, volumes, deleted_volume_ids=()):
+    connection.executemany(
+        "INSERT OR REPLACE INTO volumes VALUES (?, ?, ?, ?)",
+        (
+            (account, region, volume_id, encode_volume(volume))
+            for volume_id, volume in volumes.items()
+        ),
+    )
+    connection.executemany(
+        "DELETE FROM volumes WHERE account = ? AND region = ? AND volume_id = ?",
+        ((account, region, volume_id) for volume_id in deleted_volume_ids),
+    )
+
+
+def full_refresh(connection, ec2, account, region):
+    """
+    Replaces the snapshot with a new describe_volumes pass. Pages are written to SQLite
+    as they arrive, so the full records are never all in memory.
+    Returns the number of volumes.
+    """
+    started = time.time()
+    volume_count = 0
+    with connection:
+        connection.execute(
+            "DELETE FROM volumes WHERE account = ? AND region = ?", (account, region)
+        )
+        connection.execute(
+            "DELETE FROM instance_names WHERE account = ? AND region = ?",
+            (account, region),
+        )
+        for volume in iter_volumes(ec2, fields=None):
+            connection.execute(
+                "INSERT OR REPLACE INTO volumes VALUES (?, ?, ?, ?)",
+                (account, region, volume["VolumeId"], encode_volume(volume)),
+            )
+            volume_count += 1
+        connection.execute(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+            (account, region, started, started),
+        )
+    logging.info(
+        f"Full inventory refresh of {volume_count} volumes in {region} took {time.time() - started:.1f}s"
+    )
+    return volume_count
+
+
+def lookup_changed_resources(region, start_time, end_time):
+    """
+    Returns the (volume IDs, instance IDs) named in CloudTrail write events between
+    start_time and end_time (epoch seconds).
+    """
+    cloudtrail = get_client("cloudtrail", region=region, rate_limited=True)
+    paginator = cloudtrail.get_paginator("lookup_events")
+    volume_ids = set()
+    instance_ids = set()
+
+    for resource_type in Config.CLOUDTRAIL_RESOURCE_TYPES:
+        for page in paginator.paginate(
+            LookupAttributes=[
+                {"AttributeKey": "ResourceType", "AttributeValue": resource_type}
+            ],
+            StartTime=datetime.fromtimestamp(start_time, timezone.utc),
+            EndTime=datetime.fromtimestamp(end_time, timezone.utc),
+        ):
+            for event in page["Events"]:
+                if event.get("ReadOnly") == "true":
+                    continue
+                for resource in event.get("Resources", []):
+                    name = resource.get("ResourceName", "")
+                    if name.startswith("vol-"):
+                        volume_ids.add(name)
+                    elif name.startswith("i-"):
+                        instance_ids.add(name)
+
+    return volume_ids, instance_ids
+
+
+def delta_refresh(connection, ec2, account, region, snapshot, volumes):
+    """
+    Re-describes only the volumes touched since the snapshot: volumes named in CloudTrail
+    events, volumes attached to instances named in events (e.g. terminated instances),
+    and volumes now attached to those instances (e.g. new root volumes).
+    """
+    started = time.time()
+    changed_volume_ids, changed_instance_ids = lookup_changed_resources(
+        region, snapshot["refreshed"] - Config.CLOUDTRAIL_LAG, started
+    )
+
+    recheck_volume_ids = set(changed_volume_ids)
+    for volume_id, volume in volumes.items():
+        if any(
+            attachment.get("InstanceId") in changed_instance_ids
+            for attachment in volume.get("Attachments", [])
+        ):
+            recheck_volume_ids.add(volume_id)
+
+    fresh_volumes = {}
+    if recheck_volume_ids:
+        fresh_volumes.update(get_volume_inventory(ec2, volume_ids=recheck_volume_ids))
+    for chunk in chunk_list(
+        sorted(changed_instance_ids), InventoryConfig.FILTER_VALUES_LIMIT
+    ):
+        fresh_volumes.update(
+            get_volume_inventory(
+                ec2, filters=[{"Name": "attachment.instance-id", "Values": chunk}]
+            )
+        )
+    deleted_volume_ids = recheck_volume_ids - fresh_volumes.keys()
+
+    with connection:
+        save_volumes(connection, account, region, fresh_volumes, deleted_volume_ids)
+        # Instance names are looked up again the next time they are needed
+        connection.executemany(
+            "DELETE FROM instance_names WHERE account = ? AND region = ? AND instance_id = ?",
+            ((account, region, instance_id) for instance_id in changed_instance_ids),
+        )
+        connection.execute(
+            "UPDATE snapshots SET refreshed = ? WHERE account = ? AND region = ?",
+            (started, account, region),
+        )
+
+    volumes.update(fresh_volumes)
+    for volume_id in deleted_volume_ids:
+        volumes.pop(volume_id, None)
+
+    logging.info(
+        f"Delta inventory refresh in {region}: {len(changed_volume_ids)} volume and "
+        f"{len(changed_instance_ids)} instance events, {len(fresh_volumes)} volumes updated, "
+        f"{len(deleted_volume_ids)} removed in {time.time() - started:.1f}s"
+    )
+    return volumes
+
+
+def load_inventory(ec2, mode, cache_file, region=None, load_volumes=True):
+    """
+    Returns (connection, account, region, volumes) with the snapshot refreshed as
+    required by the mode. With load_volumes False, volumes is None and the caller
+    streams the snapshot with iter_snapshot_volumes instead.
+    """
+    region = region or ec2.meta.region_name
+    account = get_account_id(region)
+    connection = open_cache(cache_file)
+
+    snapshot = None if mode == "full" else load_snapshot(connection, account, region)
+    volumes = None
+    now = time.time()
+
+    if snapshot is None:
+        full_refresh(connection, ec2, account, region)
+    elif mode == "delta" or now - snapshot["refreshed"] > Config.TTL:
+        if mode == "auto" and (
+            now - snapshot["full_refreshed"] > Config.FULL_REFRESH_INTERVAL
+        ):
+            full_refresh(connection, ec2, account, region)
+        else:
+            try:
+                volumes = delta_refresh(
+                    connection,
+                    ec2,
+                    account,
+                    region,
+                    snapshot,
+                    read_snapshot_volumes(connection, account, region),
+                )
+            except Exception as e:
+                logging.warning(
+                    f"Delta inventory refresh failed ({e}), doing a full refresh"
+                )
+                volumes = None
+                full_refresh(connection, ec2, account, region)
+    else:
+        logging.info(
+            f"Using cached inventory in {region} from {now - snapshot['refreshed']:.0f}s ago"
+        )
+
+    if load_volumes and volumes is None:
+        volumes = read_snapshot_volumes(connection, account, region)
+    return connection, account, region, volumes
+
+
+def get_cached_volumes(ec2, filters=None, mode="auto", cache_file=None, region=None):
+    """
+    Returns describe_volumes records indexed by volume ID, served from the snapshot.
+    Parameters:
+        ec2: EC2 client.
+        filters (list): Optional describe_volumes filters, applied to the snapshot.
+        mode (str): One of Config.MODES. Defaults to auto.
+        cache_file (str): SQLite file. Defaults to Config.CACHE_FILE.
+        region (str): Region of the snapshot. Defaults to the client's region.
+    """
+    filters = list(filters or [])
+    if mode == "off" or not can_filter_locally(filters):
+        return get_volume_inventory(ec2, filters=filters)
+
+    connection, _, _, volumes = load_inventory(
+        ec2, mode, cache_file or Config.CACHE_FILE, region
+    )
+    connection.close()
+
+    if filters:
+        volumes = {
+            volume_id: volume
+            for volume_id, volume in volumes.items()
+            if matches_filters(volume, filters)
+        }
+    return volumes
+
+
+def iter_cached_volumes(
+    ec2,
+    filters=None,
+    mode="auto",
+    cache_file=None,
+    region=None,
+    fields=InventoryConfig.SLIM_FIELDS,
+):
+    """
+    Streaming version of get_cached_volumes: yields the records one at a time, projected
+    to fields (all fields when None), straight from the snapshot cursor. With mode "off"
+    the records are streamed from describe_volumes page by page, see
+    ebs_inventory.iter_volumes.
+    """
+    filters = list(filters or [])
+    if mode == "off" or not can_filter_locally(filters):
+        yield from iter_volumes(ec2, filters=filters, fields=fields)
+        return
+
+    connection, account, region, _ = load_inventory(
+        ec2, mode, cache_file or Config.CACHE_FILE, region, load_volumes=False
+    )
+    try:
+        for volume in iter_snapshot_volumes(connection, account, region):
+            if matches_filters(volume, filters):
+                yield project_volume(volume, fields)
+    finally:
+        connection.close()
+
+
+def get_cached_volume_details_index(
+    ec2, filters=None, mode="auto", cache_file=None, region=None
+):
+    """
+    Same as ebs_inventory.get_volume_details_index, with the volume records and the
+    instance names served from the snapshot. Only names missing from the cache are
+    looked up with describe_instances.
+    """
+    filters = list(filters or [])
+    if mode == "off" or not can_filter_locally(filters):
+        return get_volume_details_index(ec2, filters=filters)
+
+    connection, account, region, volumes = load_inventory(
+        ec2, mode, cache_file or Config.CACHE_FILE, region
+    )
+    volumes = {
+        volume_id: volume
+        for volume_id, volume in volumes.items()
+        if matches_filters(volume, filters)
+    }
+
+    instance_names = dict(
+        connection.execute(
+            "SELECT instance_id, name FROM instance_names WHERE account = ? AND region = ?",
+            (account, region),
+        )
+    )
+    missing_instance_ids = {
+        attachment["InstanceId"]
+        for volume in volumes.values()
+        for attachment in volume.get("Attachments", [])[:1]
+        if attachment.get("InstanceId")
+        and attachment["InstanceId"] not in instance_names
+    }
+    if missing_instance_ids:
+        new_names = get_instance_names(ec2, missing_instance_ids)
+        instance_names.update(new_names)
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO instance_names VALUES (?, ?, ?, ?)",
+                (
+                    (account, region, instance_id, name)
+                    for instance_id, name in new_names.items()
+                ),
+            )
+    connection.close()
+
+    return {
+        volume_id: build_volume_details(volume, instance_names)
+        for volume_id, volume in volumes.items()
+    }
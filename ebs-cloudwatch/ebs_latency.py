@@ -0,0 +1,304 @@
+"""
+Latency calculation for the EBS custom latency metric scripts.
+
+GetMetricData returns four results per volume (total read time, read ops, total write
+time, write ops). decode_latency_batch packs the latest value of each into columns and
+computes read, write and total latency for the whole batch at once:
+
+    batch = decode_latency_batch(metric_queries, response["MetricDataResults"])
+    custom_metrics.extend(build_latency_metric_data(batch))
+    logging.info(format_latency_summary(latency_summary(batch)))
+
+decode_latency_window does the same for a window of several periods: every period of
+every volume becomes a row with its own timestamp, so the PutMetricData entries carry
+the timestamp of the period they were computed from.
+
+NumPy is optional. When it is installed the columns are NumPy arrays and the latency,
+zero-op and missing data handling are vectorized; without it the same results are
+computed with plain Python lists.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Config:
+    # Order of the queries for each volume, as built by build_metric_queries
+    QUERY_COLUMNS = ["read_time", "read_ops", "write_time", "write_ops"]
+    PERCENTILES = [50, 90, 99]  # Percentiles of the batch summary
+
+
+def volume_id_from_query_id(query_id):
+    # "read_time_vol_0123" -> "vol-0123"
+    return query_id.split("_", 2)[-1].replace("_", "-")
+
+
+def latest_values(metric_queries, metric_data_results):
+    """
+    Returns the latest value of each query, in query order, with NaN for queries that
+    returned no data. Results are matched to queries by Id.
+    """
+    latest = {
+        result["Id"]: result["Values"][-1]
+        for result in metric_data_results
+        if result["Values"]
+    }
+    return [latest.get(query["Id"], math.nan) for query in metric_queries]
+
+
+def decode_latency_batch(metric_queries, metric_data_results):
+    """
+    Decodes one GetMetricData batch into latency columns.
+    Parameters:
+        metric_queries (list): The queries sent, four per volume in Config.QUERY_COLUMNS order.
+        metric_data_results (list): MetricDataResults from the response.
+    Returns:
+        dict: volume_ids, has_data (True when all four metrics had data), the four input
+        columns, and read_latency, write_latency and total_latency in milliseconds.
+    """
+    columns_count = len(Config.QUERY_COLUMNS)
+    batch = {
+        "volume_ids": [
+            volume_id_from_query_id(query["Id"])
+            for query in metric_queries[::columns_count]
+        ]
+    }
+    return compute_latency_columns(
+        batch, latest_values(metric_queries, metric_data_results)
+    )
+
+
+def decode_latency_window(metric_queries, metric_data_results):
+    """
+    Decodes one GetMetricData batch covering several periods. Each (volume, timestamp)
+    pair becomes a row, so the returned dict has the same columns as decode_latency_batch
+    plus a timestamps column. A period where any of the four metrics has no datapoint is
+    a gap: its row has has_data False and nothing is published for it. When no query
+    returned any datapoint, every volume still gets one all-NaN row (timestamp None), so
+    the volumes are counted as without metrics instead of dropped from the batch.
+    Results may be split over several pages (NextToken), so datapoints are collected
+    by Id.
+    """
+    columns_count = len(Config.QUERY_COLUMNS)
+    datapoints = {}
+    for result in metric_data_results:
+        datapoints.setdefault(result["Id"], []).extend(
+            zip(result["Timestamps"], result["Values"])
+        )
+
+    timestamps = sorted(
+        {timestamp for points in datapoints.values() for timestamp, _ in points}
+    ) or [None]
+    timestamp_index = {timestamp: index for index, timestamp in enumerate(timestamps)}
+    periods = len(timestamps)
+
+    # Row-major (volume, timestamp, column) layout, NaN where there is no datapoint
+    values = [math.nan] * (len(metric_queries) * periods)
+    for query_index, query in enumerate(metric_queries):
+        volume_index, column = divmod(query_index, columns_count)
+        for timestamp, value in datapoints.get(query["Id"], []):
+            row = volume_index * periods + timestamp_index[timestamp]
+            values[row * columns_count + column] = value
+
+    batch = {
+        "volume_ids": [],
+        "timestamps": timestamps * (len(metric_queries) // columns_count),
+    }
+    for query in metric_queries[::columns_count]:
+        batch["volume_ids"].extend([volume_id_from_query_id(query["Id"])] * periods)
+    return compute_latency_columns(batch, values)
+
+
+def compute_latency_columns(batch, values):
+    """
+    Adds the input columns, has_data and the latency columns to batch, from a flat list
+    of values with Config.QUERY_COLUMNS values per row.
+    """
+    columns_count = len(Config.QUERY_COLUMNS)
+
+    if np is not None:
+        matrix = np.array(values, dtype=float).reshape(-1, columns_count)
+        for index, column in enumerate(Config.QUERY_COLUMNS):
+            batch[column] = matrix[:, index]
+        batch["has_data"] = ~np.isnan(matrix).any(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            batch["read_latency"] = np.where(
+                batch["read_ops"] != 0,
+                batch["read_time"] / batch["read_ops"] * 1000,
+                0.0,
+            )
+            batch["write_latency"] = np.where(
+                batch["write_ops"] != 0,
+                batch["write_time"] / batch["write_ops"] * 1000,
+                0.0,
+            )
+        batch["total_latency"] = batch["read_latency"] + batch["write_latency"]
+        return batch
+
+    rows = [
+        values[i : i + columns_count] for i in range(0, len(values), columns_count)
+    ]
+    for index, column in enumerate(Config.QUERY_COLUMNS):
+        batch[column] = [row[index] for row in rows]
+    batch["has_data"] = [not any(math.isnan(value) for value in row) for row in rows]
+    batch["read_latency"] = [
+        read_time / read_ops * 1000 if read_ops != 0 else 0.0
+        for read_time, read_ops in zip(batch["read_time"], batch["read_ops"])
+    ]
+    batch["write_latency"] = [
+        write_time / write_ops * 1000 if write_ops != 0 else 0.0
+        for write_time, write_ops in zip(batch["write_time"], batch["write_ops"])
+    ]
+    batch["total_latency"] = [
+        read_latency + write_latency
+        for read_latency, write_latency in zip(
+            batch["read_latency"], batch["write_latency"]
+        )
+    ]
+    return batch
+
+
+def count_volumes(batch):
+    """
+    Returns (volumes with metrics, volumes without metrics). In a window, a volume has
+    metrics when at least one of its periods has data.
+    """
+    if "timestamps" not in batch:
+        with_metrics = int(sum(batch["has_data"]))
+        return with_metrics, len(batch["volume_ids"]) - with_metrics
+
+    volume_ids = set(batch["volume_ids"])
+    with_metrics = len(
+        {
+            volume_id
+            for volume_id, has_data in zip(batch["volume_ids"], batch["has_data"])
+            if has_data
+        }
+    )
+    return with_metrics, len(volume_ids) - with_metrics
+
+
+def missing_volume_ids(batch):
+    """
+    Returns the volumes without any data, in batch order.
+    """
+    with_data = {
+        volume_id
+        for volume_id, has_data in zip(batch["volume_ids"], batch["has_data"])
+        if has_data
+    }
+    return [
+        volume_id
+        for volume_id in dict.fromkeys(batch["volume_ids"])
+        if volume_id not in with_data
+    ]
+
+
+def count_gaps(batch):
+    """
+    Returns the number of periods without complete data for volumes that do have data
+    in other periods of the window.
+    """
+    missing = set(missing_volume_ids(batch))
+    return sum(
+        1
+        for volume_id, has_data in zip(batch["volume_ids"], batch["has_data"])
+        if not has_data and volume_id not in missing
+    )
+
+
+def build_latency_metric_data(batch):
+    """
+    Returns the PutMetricData entries (read, write and total latency) for every row with
+    data. The three entries of a row share one Dimensions list, and carry the period's
+    Timestamp when the batch came from decode_latency_window.
+    """
+    metric_data = []
+    timestamps = batch.get("timestamps") or [None] * len(batch["volume_ids"])
+    for (
+        volume_id,
+        timestamp,
+        has_data,
+        read_latency,
+        write_latency,
+        total_latency,
+    ) in zip(
+        batch["volume_ids"],
+        timestamps,
+        batch["has_data"],
+        batch["read_latency"],
+        batch["write_latency"],
+        batch["total_latency"],
+    ):
+        if not has_data:
+            continue
+        dimensions = [{"Name": "VolumeId", "Value": volume_id}]
+        for metric_name, value in [
+            ("VolumeReadLatency", read_latency),
+            ("VolumeWriteLatency", write_latency),
+            ("VolumeTotalLatency", total_latency),
+        ]:
+            entry = {
+                "MetricName": metric_name,
+                "Dimensions": dimensions,
+                "Value": float(value),
+            }
+            if timestamp is not None:
+                entry["Timestamp"] = timestamp
+            metric_data.append(entry)
+    return metric_data
+
+
+def percentile(sorted_values, percent):
+    # Linear interpolation between closest ranks, the same as numpy.percentile's default
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+def latency_summary(batch):
+    """
+    Returns the Config.PERCENTILES of read, write and total latency across the rows
+    of the batch that had data, e.g. {"total_latency": {50: 1.2, 90: 3.4, 99: 9.8}, ...}.
+    Returns an empty dict when no volume had data.
+    """
+    summary = {}
+    for column in ["read_latency", "write_latency", "total_latency"]:
+        if np is not None:
+            values = batch[column][batch["has_data"]]
+            if values.size == 0:
+                return {}
+            summary[column] = dict(
+                zip(
+                    Config.PERCENTILES,
+                    np.percentile(values, Config.PERCENTILES).tolist(),
+                )
+            )
+        else:
+            values = sorted(
+                value
+                for value, has_data in zip(batch[column], batch["has_data"])
+                if has_data
+            )
+            if not values:
+                return {}
+            summary[column] = {
+                percent: percentile(values, percent) for percent in Config.PERCENTILES
+            }
+    return summary
+
+
+def format_latency_summary(summary):
+    return ", ".join(
+        f"{column.replace('_', ' ')} "
+        + "/".join(f"p{percent} {value:.2f}" for percent, value in values.items())
+        + " ms"
+        for column, values in summary.items()
+    )
@@ -0,0 +1,134 @@
+"""
+On-disk CloudWatch datapoint cache for the EBS metric export scripts.
+
+CloudWatch datapoints do not change once a period is a few minutes old, so a repeat
+export of the same volumes does not need to download them again. The cache keeps every
+datapoint fetched, keyed by (region, volume, metric, period, timestamp), in a local
+SQLite file, together with the time ranges that have been fetched for each
+(region, volume, metric, period). A range with no datapoints is still recorded as
+fetched, so volumes without I/O are not fetched again either.
+
+    connection = open_cache(Config.CACHE_FILE)
+    gaps = missing_ranges(connection, region, volume_id, metric, period, start, end)
+    ...  # fetch only the gaps from GetMetricData
+    save_datapoints(connection, region, period, datapoints)
+    add_coverage(connection, region, volume_id, metric, period, start, end)
+    for volume_id, metric, timestamp, value in read_datapoints(...):
+        ...
+
+Times are epoch seconds. Only the part of a range older than Config.SETTLE_TIME is
+recorded as fetched, so the most recent periods are fetched again on the next run and
+their datapoints replaced. Reads are served through SQLite's memory-mapped I/O
+(Config.MMAP_SIZE), so cached history is read straight from the mapped file instead of
+being copied into SQLite's own page cache.
+"""
+
+import sqlite3
+import time
+
+
+class Config:
+    CACHE_FILE = "ebs-metric-cache.sqlite"  # SQLite file, relative to the working directory
+    SETTLE_TIME = 600  # Seconds after which a period's datapoint no longer changes
+    MMAP_SIZE = 1024**3  # Bytes of the cache file read through memory-mapped I/O
+    MODES = ["auto", "refresh", "off"]
+
+
+def open_cache(cache_file):
+    connection = sqlite3.connect(cache_file, timeout=30)
+    connection.execute(f"PRAGMA mmap_size = {Config.MMAP_SIZE}")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS datapoints (
+            region TEXT, volume_id TEXT, metric TEXT, period INTEGER,
+            timestamp INTEGER, value REAL,
+            PRIMARY KEY (region, volume_id, metric, period, timestamp))
+            WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS coverage (
+            region TEXT, volume_id TEXT, metric TEXT, period INTEGER,
+            start INTEGER, end INTEGER,
+            PRIMARY KEY (region, volume_id, metric, period, start));
+        """
+    )
+    return connection
+
+
+def get_settled_time(now=None):
+    # Periods that start before this time are complete and can be cached as fetched
+    return int((now or time.time()) - Config.SETTLE_TIME)
+
+
+def missing_ranges(connection, region, volume_id, metric, period, start, end):
+    """
+    Returns the (start, end) ranges between start and end that have not been fetched
+    for this volume, metric and period, in time order.
+    """
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in connection.execute(
+        "SELECT start, end FROM coverage WHERE region = ? AND volume_id = ? "
+        "AND metric = ? AND period = ? AND end > ? AND start < ? ORDER BY start",
+        (region, volume_id, metric, period, start, end),
+    ):
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def add_coverage(connection, region, volume_id, metric, period, start, end):
+    """
+    Records start..end as fetched, merged with the ranges it overlaps or touches so
+    each volume, metric and period keeps a short list of disjoint ranges.
+    """
+    key = (region, volume_id, metric, period)
+    overlapping = connection.execute(
+        "SELECT start, end FROM coverage WHERE region = ? AND volume_id = ? "
+        "AND metric = ? AND period = ? AND end >= ? AND start <= ?",
+        key + (start, end),
+    ).fetchall()
+    for covered_start, covered_end in overlapping:
+        start = min(start, covered_start)
+        end = max(end, covered_end)
+    connection.executemany(
+        "DELETE FROM coverage WHERE region = ? AND volume_id = ? AND metric = ? "
+        "AND period = ? AND start = ?",
+        (key + (covered_start,) for covered_start, _ in overlapping),
+    )
+    connection.execute(
+        "INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)", key + (start, end)
+    )
+
+
+def save_datapoints(connection, region, period, datapoints):
+    """
+    Stores (volume ID, metric, timestamp, value) datapoints, replacing any datapoint
+    already cached for the same period.
+    """
+    connection.executemany(
+        "INSERT OR REPLACE INTO datapoints VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (region, volume_id, metric, period, timestamp, value)
+            for volume_id, metric, timestamp, value in datapoints
+        ),
+    )
+
+
+def read_datapoints(connection, region, volume_ids, metrics, period, start, end):
+    """
+    Yields the cached (volume ID, metric, timestamp, value) datapoints of the volumes
+    and metrics between start (inclusive) and end (exclusive), one volume and metric at
+    a time in timestamp order.
+    """
+    for volume_id in volume_ids:
+        for metric in metrics:
+            for timestamp, value in connection.execute(
+                "SELECT timestamp, value FROM datapoints WHERE region = ? "
+                "AND volume_id = ? AND metric = ? AND period = ? "
+                "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (region, volume_id, metric, period, start, end),
+            ):
+                yield volume_id, metric, timestamp, value
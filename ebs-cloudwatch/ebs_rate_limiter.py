@@ -0,0 +1,328 @@
+"""
+Client-side rate limiting and throttling-aware retries for the EBS CloudWatch scripts.
+
+Wrap a boto3 client with RateLimitedClient and every API call (including pages pulled
+through get_paginator) first takes a token from a bucket shared by all callers of the
+same (service, API, region). The bucket refill rate adapts with AIMD: it is cut back
+whenever AWS answers with a throttling error and grows back a little with each success.
+Throttled calls, transient server errors and dropped or timed out connections are
+retried with jittered exponential backoff instead of being dropped.
+
+    cloudwatch = RateLimitedClient(boto3.client("cloudwatch", config=BOTO_CONFIG))
+    cloudwatch.put_metric_alarm(**alarm_details)
+    ...
+    log_rate_limiter_stats()
+"""
+
+import logging
+import random
+import threading
+import time
+
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    ConnectionError as BotoConnectionError,
+    HTTPClientError,
+)
+from botocore.paginate import TokenEncoder
+
+
+class Config:
+    # Starting (and maximum) requests per second for each (service, API). These are the
+    # default quotas at the time of writing, check Service Quotas for your account.
+    API_RATES = {
+        ("cloudwatch", "PutMetricAlarm"): 3,
+        ("cloudwatch", "DeleteAlarms"): 3,
+        ("cloudwatch", "DescribeAlarms"): 9,
+        ("cloudwatch", "GetMetricData"): 50,
+        ("cloudwatch", "GetMetricStatistics"): 400,
+        ("cloudwatch", "PutMetricData"): 500,
+        ("cloudwatch", "ListMetrics"): 25,
+        ("cloudwatch", "PutDashboard"): 10,
+        ("cloudwatch", "ListDashboards"): 10,
+        ("cloudwatch", "DeleteDashboards"): 10,
+        ("ec2", "DescribeVolumes"): 20,
+        ("ec2", "DescribeInstances"): 20,
+        ("ec2", "DescribeRegions"): 20,
+        ("cloudtrail", "LookupEvents"): 2,
+    }
+    DEFAULT_RATE = 5  # Requests per second for any API not listed above
+    MIN_RATE = 0.2  # AIMD never slows a bucket below this many requests per second
+    DECREASE_FACTOR = 0.7  # Multiplicative decrease applied on each throttle
+    INCREASE_FRACTION = 0.05  # Additive increase per success, as a fraction of the max rate
+    MAX_RETRIES = 12  # Retries per call before the error is raised to the caller
+    BACKOFF_BASE = 0.5  # Seconds, doubled on each retry
+    BACKOFF_CAP = 30  # Seconds, upper bound of a single backoff sleep
+    THROTTLE_ERROR_CODES = {
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestLimitExceeded",
+        "RequestThrottled",
+        "RequestThrottledException",
+        "TooManyRequestsException",
+        "SlowDown",
+    }
+    TRANSIENT_ERROR_CODES = {
+        "RequestTimeout",
+        "RequestTimeoutException",
+        "InternalError",
+        "InternalFailure",
+        "InternalServiceFault",  # CloudWatch's 500 error
+        "ServiceUnavailable",
+        "Unavailable",
+    }
+
+
+# Connection errors and timeouts (EndpointConnectionError, ConnectTimeoutError,
+# ReadTimeoutError, ConnectionClosedError) retried by call_with_retry.
+CONNECTION_ERRORS = (BotoConnectionError, HTTPClientError)
+
+# botocore retries throttles on its own (up to 5 attempts in legacy mode) which hides
+# them from the AIMD limiter. Create clients with this config to let the limiter see
+# every throttle and do the retrying itself, including the transient and connection
+# errors botocore would otherwise have retried.
+BOTO_CONFIG = BotoConfig(retries={"mode": "standard", "max_attempts": 1})
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate follows AIMD (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, max_rate):
+        self.max_rate = float(max_rate)
+        self.rate = float(max_rate)
+        self.capacity = max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "throttles": 0,
+            "retries": 0,
+            "failures": 0,
+        }
+
+    def acquire(self):
+        """
+        Takes one token, sleeping if the bucket is empty. Callers that arrive while the
+        bucket is empty reserve a future token so they are served in arrival order.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last_refill) * self.rate
+            )
+            self.last_refill = now
+            self.tokens -= 1
+            self.stats["calls"] += 1
+            wait_time = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait_time:
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += wait_time
+
+        if wait_time:
+            time.sleep(wait_time)
+
+    def on_success(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(
+                    self.max_rate, self.rate + self.max_rate * Config.INCREASE_FRACTION
+                )
+
+    def on_throttle(self):
+        with self.lock:
+            self.stats["throttles"] += 1
+            self.rate = max(Config.MIN_RATE, self.rate * Config.DECREASE_FACTOR)
+            # Drop any saved-up burst so the slower rate takes effect immediately.
+            self.tokens = min(self.tokens, 0.0)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(service, api_name, region):
+    """
+    Returns the shared bucket for (service, API, region), creating it on first use.
+    """
+    key = (service, api_name, region)
+    with _buckets_lock:
+        if key not in _buckets:
+            max_rate = Config.API_RATES.get((service, api_name), Config.DEFAULT_RATE)
+            _buckets[key] = AdaptiveTokenBucket(max_rate)
+        return _buckets[key]
+
+
+def get_rate_limiter_stats():
+    """
+    Returns a snapshot of the counters for every bucket used so far, keyed by
+    "service:API:region".
+    """
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    snapshot = {}
+    for (service, api_name, region), bucket in buckets.items():
+        with bucket.lock:
+            snapshot[f"{service}:{api_name}:{region}"] = dict(
+                bucket.stats, rate=round(bucket.rate, 2)
+            )
+    return snapshot
+
+
+def log_rate_limiter_stats(level=logging.INFO):
+    for key, stats in sorted(get_rate_limiter_stats().items()):
+        logging.log(
+            level,
+            f"Rate limiter {key}: {stats['calls']} calls, {stats['waits']} waits "
+            f"({stats['wait_seconds']:.1f}s), {stats['throttles']} throttles, "
+            f"{stats['retries']} retries, {stats['failures']} failures, "
+            f"current rate {stats['rate']}/s",
+        )
+
+
+def is_throttle_error(error):
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in Config.THROTTLE_ERROR_CODES
+    )
+
+
+def is_retryable_error(error):
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get("Error", {}).get("Code")
+    return code in Config.THROTTLE_ERROR_CODES or code in Config.TRANSIENT_ERROR_CODES
+
+
+def get_error_name(error):
+    # The error code of a ClientError, the exception class of anything else
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code")
+    return type(error).__name__
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff: a random delay between 0 and BASE * 2^attempt, capped.
+    """
+    return random.uniform(0, min(Config.BACKOFF_CAP, Config.BACKOFF_BASE * 2**attempt))
+
+
+def call_with_retry(bucket, method, **kwargs):
+    """
+    Calls a boto3 client method through a token bucket, retrying throttled, transient
+    and connection errors with backoff. Other errors are raised immediately.
+    """
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            response = method(**kwargs)
+        except (ClientError, BotoCoreError) as e:
+            if not is_retryable_error(e) or attempt >= Config.MAX_RETRIES:
+                bucket.count("failures")
+                raise
+            if is_throttle_error(e):
+                bucket.on_throttle()
+            bucket.count("retries")
+            delay = backoff_delay(attempt)
+            logging.debug(
+                f"{get_error_name(e)} on attempt {attempt + 1}, retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        bucket.on_success()
+        return response
+
+
+class RateLimitedPaginator:
+    """
+    Wraps a boto3 paginator so each page request goes through the shared bucket. If a page
+    is throttled, pagination restarts from the NextToken of the last page that succeeded.
+    """
+
+    def __init__(self, paginator, bucket):
+        self._paginator = paginator
+        self._bucket = bucket
+
+    def paginate(self, **kwargs):
+        pagination_config = dict(kwargs.pop("PaginationConfig", None) or {})
+        attempt = 0
+        while True:
+            pages = iter(
+                self._paginator.paginate(PaginationConfig=pagination_config, **kwargs)
+            )
+            try:
+                while True:
+                    self._bucket.acquire()
+                    try:
+                        page = next(pages)
+                    except StopIteration:
+                        return
+                    self._bucket.on_success()
+                    attempt = 0
+                    next_token = page.get("NextToken")
+                    if next_token:
+                        pagination_config["StartingToken"] = TokenEncoder().encode(
+                            {"NextToken": next_token}
+                        )
+                    yield page
+            except (ClientError, BotoCoreError) as e:
+                if not is_retryable_error(e) or attempt >= Config.MAX_RETRIES:
+                    self._bucket.count("failures")
+                    raise
+                if is_throttle_error(e):
+                    self._bucket.on_throttle()
+                self._bucket.count("retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    def __getattr__(self, name):
+        return getattr(self._paginator, name)
+
+
+class RateLimitedClient:
+    """
+    Proxy around a boto3 client. API methods are rate limited and retried, everything
+    else (exceptions, meta, waiters) is passed through to the real client.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._service = client.meta.service_model.service_name
+        self._region = client.meta.region_name
+        self._api_names = client.meta.method_to_api_mapping
+
+    def get_paginator(self, operation_name):
+        api_name = self._api_names.get(operation_name, operation_name)
+        return RateLimitedPaginator(
+            self._client.get_paginator(operation_name),
+            get_bucket(self._service, api_name, self._region),
+        )
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in self._api_names:
+            return attribute
+
+        bucket = get_bucket(self._service, self._api_names[name], self._region)
+
+        def rate_limited_call(**kwargs):
+            return call_with_retry(bucket, attribute, **kwargs)
+
+        return rate_limited_call
@@ -2,11 +2,23 @@ import boto3
 import time
 import argparse
 import base64
+from functools import lru_cache
+from botocore.config import Config as BotoConfig
 from tabulate import tabulate
 
 KEY_PATH = "~/.ssh"  # Path to SSH private key
 
 
+@lru_cache(maxsize=16)
+def get_ec2_client(region):
+    # One client (and HTTP connection pool) per region, reused by every helper below.
+    return boto3.client(
+        "ec2",
+        region_name=region,
+        config=BotoConfig(max_pool_connections=20, tcp_keepalive=True),
+    )
+
+
 def prompt_for_choice(options, prompt_message):
     for i, option in enumerate(options, 1):
         print(f"{i}. {option}")
@@ -15,38 +27,38 @@ def prompt_for_choice(options, prompt_message):
 
 
 def get_key_pairs(region):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_key_pairs()
     return [key_pair["KeyName"] for key_pair in response["KeyPairs"]]
 
 
 def get_security_groups(region):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_security_groups()
     return [f"{sg['GroupId']} - {sg['GroupName']}" for sg in response["SecurityGroups"]]
 
 
 def get_vpcs(region):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_vpcs()
     return [vpc["VpcId"] for vpc in response["Vpcs"]]
 
 
 def get_availability_zones_for_vpc(region, vpc_id):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_subnets(Filters=[{"Name": "vpc-id", "Values": [vpc_id]}])
     azs = list(set(subnet["AvailabilityZone"] for subnet in response["Subnets"]))
     return azs
 
 
 def get_availability_zones(region):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_availability_zones()
     return [az["ZoneName"] for az in response["AvailabilityZones"]]
 
 
 def get_latest_amazon_linux_ami(region):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
     response = ec2.describe_images(
         Filters=[
             {"Name": "name", "Values": ["amzn2-ami-hvm-*"]},
@@ -64,7 +76,7 @@ def get_latest_amazon_linux_ami(region):
 def launch_instances(
     instances, volumes, region, az, key_name, security_group, vpc, style
 ):
-    ec2 = boto3.client("ec2", region_name=region)
+    ec2 = get_ec2_client(region)
 
     if key_name is None:
         key_name = prompt_for_choice(
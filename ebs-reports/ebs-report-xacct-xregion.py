@@ -4,13 +4,21 @@ import tempfile
 import shutil
 import argparse
 import os
+import sys
 import logging
 from datetime import datetime
 
+# The Parquet / Arrow writer is shared with the scripts in ebs-cloudwatch/
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ebs-cloudwatch")
+)
+from ebs_arrow import ArrowRowWriter, pa
+
 
 # This Config class stores the defaults used throughout the script. There are better ways to do this (read from a local file, for example). For this example, this was a fast way to make the constants searchable and obvious. Most of these options have a corresponding command line argument to override.
 class Config:
     EBS_PAGINATION = 300
+    VOLUME_FIELDS = ["VolumeId", "State", "Size", "VolumeType", "Tags"]  # Fields kept per volume for the report
     DEFAULT_S3_REGION = "us-west-2"  # --s3-region
     DEFAULT_S3_BUCKET_NAME = "jnicmazn-ebs-observability-us-west-2"  # --bucket-name
     DEFAULT_S3_KEY_PREFIX = ""  # --key-prefix
@@ -22,10 +30,35 @@ class Config:
     DEFAULT_CROSS_ACCOUNT_ROLE_NAME = "CrossAccountObservabilityRole"  # --role-name
     DEFAULT_REPORT_FILE = "ebs-report.csv"  # --report-file
     DEFAULT_REPORT_FILE_STORE = "local"  # --report-file-store (can be "local" or "s3")
+    DEFAULT_REPORT_FORMAT = "csv"  # --report-format (csv, parquet or arrow)
+    # Report columns and their Arrow types. Columns that repeat across rows are
+    # dictionary-encoded; volume IDs are unique per row, so they are plain strings.
+    REPORT_COLUMNS = [
+        ("Account-Number", "dictionary"),
+        ("Account-Description", "dictionary"),
+        ("Region", "dictionary"),
+        ("Volume-ID", "string"),
+        ("Volume-Status", "dictionary"),
+        ("Volume-Size", "int64"),
+        ("Volume-Type", "dictionary"),
+        ("Tag-Name", "dictionary"),
+        ("Tag-Value", "dictionary"),
+    ]
     DEFAULT_SSO_FLAG = True  # True of False --use-sso
     DEFAULT_PROFILE = "jnicamzn-sso-root-admin"  # --profile the AWS Profile
 
 
+def get_report_schema():
+    types = {
+        "dictionary": pa.dictionary(pa.int32(), pa.string()),
+        "string": pa.string(),
+        "int64": pa.int64(),
+    }
+    return pa.schema(
+        [(name, types[column_type]) for name, column_type in Config.REPORT_COLUMNS]
+    )
+
+
 def main():
     args = parse_args()
     init_logging(args.logging)
@@ -38,6 +71,12 @@ def main():
     key_prefix = args.key_prefix
     data_file = args.data_file
     report_file = args.report_file
+    report_format = args.report_format
+    if report_format != "csv" and pa is None:
+        logging.error(f"Error: --report-format {report_format} requires pyarrow.")
+        exit(1)
+    if report_format != "csv" and report_file == Config.DEFAULT_REPORT_FILE:
+        report_file = f"{os.path.splitext(report_file)[0]}.{report_format}"
 
     # Check if the account file exists
     if args.account_file_source == "local":
@@ -71,47 +110,34 @@ def main():
     )
 
     try:
-        # Create a single temp file to hold all data
+        # Create a single temp file to hold all data. Parquet and Arrow are binary, so
+        # for those the temp file is opened in binary mode and written through its
+        # file object.
         with tempfile.NamedTemporaryFile(
-            mode="w+", newline="", delete=False
+            mode="w+" if report_format == "csv" else "w+b",
+            newline="" if report_format == "csv" else None,
+            delete=False,
         ) as main_tmpfile:
-            main_csvwriter = csv.writer(main_tmpfile)
-            # Write header
-            main_csvwriter.writerow(
-                [
-                    "Account-Number",
-                    "Account-Description",
-                    "Region",
-                    "Volume-ID",
-                    "Volume-Status",
-                    "Volume-Size",
-                    "Volume-Type",
-                    "Tag-Name",
-                    "Tag-Value",
-                ]
-            )
-
-            # Read account info from CSV
-            csvreader = csv.DictReader(account_list_lines)
-            logging.info(f"CSV Headers: {csvreader.fieldnames}")
-            for row in csvreader:
-                account = row.get("account-number")
-                account_description = row.get("account-description")
-                cross_account_role = row.get("cross-account-role")
-                sso_profile = row.get("sso-profile")
-                handle_account_processing(
-                    account=account,
-                    region="us-west-2",
-                    account_description=account_description,
-                    main_csvwriter=main_csvwriter,
-                    # role_name=role_name,
-                    cross_account_role=cross_account_role,
-                    use_sso=use_sso,
-                    sso_profile=sso_profile,
-                    # tag_name=tag_name,
+            if report_format == "csv":
+                main_csvwriter = csv.writer(main_tmpfile)
+                # Write header
+                main_csvwriter.writerow([name for name, _ in Config.REPORT_COLUMNS])
+                incomplete_accounts = process_accounts(
+                    account_list_lines, main_csvwriter, use_sso
                 )
-
+            else:
+                # Same rows, written to the temp file as Parquet or Arrow row groups.
+                # The writer is closed (footer written) before the file is copied, and
+                # an error skips the copy and upload below.
+                with ArrowRowWriter(
+                    main_tmpfile, get_report_schema(), report_format
+                ) as main_csvwriter:
+                    incomplete_accounts = process_accounts(
+                        account_list_lines, main_csvwriter, use_sso
+                    )
+                logging.info(f"Wrote {main_csvwriter.rows_written} rows")
             main_tmpfile.flush()
+            print_incomplete_accounts(incomplete_accounts)
 
             shutil.copy(main_tmpfile.name, report_file)
 
@@ -127,12 +153,64 @@ def main():
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
 
-    # Read and print the S3 file
-    read_and_print_s3_file(s3_client, bucket_name, s3_key)
+    # Read and print the S3 file (Parquet and Arrow reports are binary)
+    if report_format == "csv":
+        read_and_print_s3_file(s3_client, bucket_name, s3_key)
 
     # read_and_print_report_file()
 
 
+def process_accounts(account_list_lines, main_csvwriter, use_sso):
+    """
+    Writes the volume rows of every account in the account list.
+    Parameters:
+        account_list_lines (list): Lines of the account list CSV.
+        main_csvwriter: csv.writer or ArrowRowWriter of the report.
+        use_sso (bool): Use the account's SSO profile instead of assuming a role.
+    Returns:
+        dict: (account, description) -> error, for the accounts whose rows are missing
+        or incomplete.
+    """
+    incomplete_accounts = {}
+    # Read account info from CSV
+    csvreader = csv.DictReader(account_list_lines)
+    logging.info(f"CSV Headers: {csvreader.fieldnames}")
+    for row in csvreader:
+        account = row.get("account-number")
+        account_description = row.get("account-description")
+        cross_account_role = row.get("cross-account-role")
+        sso_profile = row.get("sso-profile")
+        error = handle_account_processing(
+            account=account,
+            region="us-west-2",
+            account_description=account_description,
+            main_csvwriter=main_csvwriter,
+            # role_name=role_name,
+            cross_account_role=cross_account_role,
+            use_sso=use_sso,
+            sso_profile=sso_profile,
+            # tag_name=tag_name,
+        )
+        if error:
+            incomplete_accounts[(account, account_description)] = error
+    return incomplete_accounts
+
+
+def print_incomplete_accounts(incomplete_accounts):
+    """
+    Prints the accounts whose rows are missing or incomplete. Rows are written as the
+    volumes are listed, so an account that failed partway through still has the rows
+    written before the error; the report is only complete when this prints nothing.
+    """
+    if not incomplete_accounts:
+        return
+    print(
+        f"WARNING: The report is incomplete for {len(incomplete_accounts)} account(s):"
+    )
+    for (account, account_description), error in incomplete_accounts.items():
+        print(f"  {account} ({account_description}): {error}")
+
+
 def handle_account_processing(
     account=None,
     region=None,
@@ -143,52 +221,65 @@ def handle_account_processing(
     sso_profile=None,
     tag_name=None,
 ):
+    """
+    Writes one report row per volume of the account, as the volumes are listed.
+    Returns:
+        str: None when all the volumes were written, otherwise what went wrong and how
+        many rows were written before it.
+    """
     try:
         session = assume_role(account, cross_account_role, use_sso, sso_profile)
     except Exception as e:
         logging.error(
             f"Error assuming role for account {account} ({account_description}): {e}"
         )
-        return
+        return f"no rows, error assuming role: {e}"
 
     logging.info(f"Assumed role for account: {account} ({account_description})")
 
+    # Rows are written as each describe_volumes page arrives, so only one page of
+    # volumes is held in memory at a time
+    volume_count = 0
     try:
-        ebs_volumes = list_ebs_volumes(session, region, tag_name)
+        for volume in list_ebs_volumes(session, region, tag_name):
+            tag_value = next(
+                (
+                    tag["Value"]
+                    for tag in volume.get("Tags", [])
+                    if tag["Key"] == tag_name
+                ),
+                "N/A",
+            )
+            main_csvwriter.writerow(
+                [
+                    account,
+                    account_description,
+                    region,
+                    volume["VolumeId"],
+                    volume["State"],
+                    volume["Size"],
+                    volume["VolumeType"],
+                    tag_name,
+                    tag_value,
+                ]
+            )
+            volume_count += 1
     except Exception as e:
-        logging.error(f"Error listing EBS volumes for account {account}: {e}")
-        return
+        logging.error(
+            f"Error listing EBS volumes for account {account} after {volume_count} volumes: {e}"
+        )
+        return f"only {volume_count} rows, error listing EBS volumes: {e}"
 
-    if not ebs_volumes.get("Volumes"):
+    if not volume_count:
         logging.info(
             f"No EBS volumes found for account {account} ({account_description})."
         )
         return
 
-    volume_count = len(ebs_volumes["Volumes"])
     logging.info(
         f"Retrieved {volume_count} EBS volumes for account: {account} ({account_description})"
     )
 
-    for volume in ebs_volumes["Volumes"]:
-        tag_value = next(
-            (tag["Value"] for tag in volume.get("Tags", []) if tag["Key"] == tag_name),
-            "N/A",
-        )
-        main_csvwriter.writerow(
-            [
-                account,
-                account_description,
-                region,
-                volume["VolumeId"],
-                volume["State"],
-                volume["Size"],
-                volume["VolumeType"],
-                tag_name,
-                tag_value,
-            ]
-        )
-
 
 def assume_role(account_id, role_name, use_sso=False, profile_name=None):
     logging.info(f"Attempting to assume role: {role_name} for account: {account_id}")
@@ -212,10 +303,13 @@ def assume_role(account_id, role_name, use_sso=False, profile_name=None):
 
 
 def list_ebs_volumes(session, region, tag_name=None):
+    """
+    Yields the volumes of the region one describe_volumes page at a time, each projected
+    to Config.VOLUME_FIELDS, instead of returning one list of every full record.
+    """
     # Use the provided session to create an EC2 client
     ec2_client = session.client("ec2", region_name=region)
 
-    all_volumes = []
     next_token = None
 
     while True:
@@ -231,14 +325,15 @@ def list_ebs_volumes(session, region, tag_name=None):
                 # Filters=[{"Name": f"tag:{tag_name}", "Values": ["*"]}],
             )
 
-        all_volumes.extend(response.get("Volumes", []))
+        for volume in response.get("Volumes", []):
+            yield {
+                field: volume[field] for field in Config.VOLUME_FIELDS if field in volume
+            }
 
         next_token = response.get("NextToken")
         if not next_token:
             break
 
-    return {"Volumes": all_volumes}
-
 
 def read_account_file(
     source, s3_client=None, bucket_name=None, key_prefix=None, local_path=None
@@ -351,6 +446,13 @@ def parse_args():
         default=Config.DEFAULT_REPORT_FILE_STORE,
         help="Specify where to put the data file. Choices are: s3, local. Defaults to {Config.DEFAULT_DATA_FILE_STORE}.",
     )
+    parser.add_argument(
+        "--report-format",
+        type=str,
+        choices=["csv", "parquet", "arrow"],
+        default=Config.DEFAULT_REPORT_FORMAT,
+        help=f"Format of the report file. parquet and arrow (Arrow IPC / Feather v2) need pyarrow, and change the default report file extension. Defaults to {Config.DEFAULT_REPORT_FORMAT}.",
+    )
     parser.add_argument(
         "--logging",
         type=str,
@@ -0,0 +1,285 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+# The ebs_*.py helpers are packaged next to this file in the Lambda zip (see the
+# README). When events are replayed from a checkout of the repo, they are found in
+# ebs-cloudwatch/ instead.
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "..", "ebs-cloudwatch"
+    )
+)
+
+from ebs_alarm_bulk import delete_alarms_in_batches
+from ebs_alarm_specs import get_alarm_name, get_alarm_template, get_legacy_alarm_names
+
+# Set up logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class Config:
+    ALARM_TYPE = "impairedvol"  # ALARM_SPECS entry in ebs_alarm_specs.py, same as the single event Lambdas
+    DESCRIBE_BATCH_SIZE = 100  # DescribeAlarms accepts up to 100 alarm names per call
+    PUT_WORKERS = 8  # Concurrent PutMetricAlarm calls per invocation
+    MAX_ATTEMPTS = 10  # botocore attempts per call, with adaptive client-side rate limiting
+
+
+_cloudwatch_client = None
+
+
+def get_cloudwatch_client():
+    """
+    Returns the CloudWatch client, created on first use and then reused by every
+    invocation the Lambda container serves. It is not created at import time, so a
+    --dry-run replay works without AWS credentials or a region. The adaptive retry mode
+    slows the client down when CloudWatch throttles it.
+    """
+    global _cloudwatch_client
+    if _cloudwatch_client is None:
+        _cloudwatch_client = boto3.client(
+            "cloudwatch",
+            config=BotoConfig(
+                retries={"mode": "adaptive", "max_attempts": Config.MAX_ATTEMPTS},
+                max_pool_connections=Config.PUT_WORKERS,
+            ),
+        )
+    return _cloudwatch_client
+
+
+def parse_volume_event(event):
+    """
+    Returns (action, volume ID, event time) of a CreateVolume or DeleteVolume CloudTrail
+    event from EventBridge, or None if the event is not one of these (or the API call
+    failed, in which case there is no volume to create an alarm for).
+    """
+    detail = event.get("detail", {})
+    event_name = detail.get("eventName")
+    if event_name == "CreateVolume":
+        volume_id = (detail.get("responseElements") or {}).get("volumeId")
+        action = "create"
+    elif event_name == "DeleteVolume":
+        volume_id = (detail.get("requestParameters") or {}).get("volumeId")
+        action = "delete"
+    else:
+        return None
+
+    if not volume_id or detail.get("errorCode"):
+        return None
+    return action, volume_id, detail.get("eventTime", "")
+
+
+def get_batch_events(event):
+    """
+    Returns (message ID, EventBridge event) pairs from an SQS batch. A plain EventBridge
+    event (the single event Lambdas' trigger) is returned as a batch of one.
+    """
+    if "Records" not in event:
+        return [(None, event)]
+    return [
+        (record["messageId"], json.loads(record["body"])) for record in event["Records"]
+    ]
+
+
+def coalesce_events(batch_events):
+    """
+    Reduces the events of a batch to one action per volume, in event time order. A
+    volume that is created and then deleted within the batch needs no alarm at all,
+    so both events are dropped.
+    Returns:
+        tuple: (dict of volume ID -> "create" or "delete", dict of volume ID -> message
+        IDs of the events for that volume)
+    """
+    parsed = []
+    for position, (message_id, event) in enumerate(batch_events):
+        volume_event = parse_volume_event(event)
+        if volume_event is None:
+            logger.warning(f"Ignoring event {message_id}: not a volume event")
+            continue
+        action, volume_id, event_time = volume_event
+        parsed.append((event_time, position, action, volume_id, message_id))
+
+    actions = {}
+    message_ids = {}
+    for event_time, position, action, volume_id, message_id in sorted(parsed):
+        message_ids.setdefault(volume_id, []).append(message_id)
+        if action == "delete" and actions.get(volume_id) == "create":
+            logger.info(f"Volume {volume_id} was created and deleted in the same batch")
+            actions[volume_id] = None
+        else:
+            actions[volume_id] = action
+
+    actions = {volume_id: action for volume_id, action in actions.items() if action}
+    return actions, message_ids
+
+
+def get_alarm_details(volume_id, sns_topic_arn):
+    template = get_alarm_template(Config.ALARM_TYPE, alarm_actions=[sns_topic_arn])
+    return template.render(volume_id, "Alarm for EBS volume " + volume_id)
+
+
+def get_existing_legacy_alarm_names(cloudwatch, volume_ids):
+    """
+    Returns the alarms named by earlier versions of the Lambdas that still exist for
+    these volumes. DeleteAlarms fails as a whole when one of its alarms does not exist,
+    and legacy alarms rarely do, so they are looked up with DescribeAlarms (up to
+    Config.DESCRIBE_BATCH_SIZE names per call) instead of being added to every delete.
+    Returns:
+        dict: legacy alarm name -> volume ID
+    """
+    legacy_volume_ids = {
+        alarm_name: volume_id
+        for volume_id in volume_ids
+        for alarm_name in get_legacy_alarm_names(Config.ALARM_TYPE, volume_id)
+    }
+    alarm_names = list(legacy_volume_ids)
+    paginator = cloudwatch.get_paginator("describe_alarms")
+    existing = {}
+    for i in range(0, len(alarm_names), Config.DESCRIBE_BATCH_SIZE):
+        for page in paginator.paginate(
+            AlarmNames=alarm_names[i : i + Config.DESCRIBE_BATCH_SIZE],
+            AlarmTypes=["MetricAlarm"],
+        ):
+            for alarm in page["MetricAlarms"]:
+                existing[alarm["AlarmName"]] = legacy_volume_ids[alarm["AlarmName"]]
+    return existing
+
+
+def put_alarm(cloudwatch, volume_id, sns_topic_arn):
+    # Returns None on success, otherwise the error message
+    try:
+        cloudwatch.put_metric_alarm(**get_alarm_details(volume_id, sns_topic_arn))
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def apply_actions(cloudwatch, actions, sns_topic_arn):
+    """
+    Puts the alarms of the created volumes concurrently and deletes the alarms of the
+    deleted volumes in batches of up to 100 (ebs_alarm_bulk.delete_alarms_in_batches,
+    shared with the alarm manager).
+    Returns:
+        dict: volume ID -> error message of the volumes that failed.
+    """
+    creates = [volume_id for volume_id, action in actions.items() if action == "create"]
+    deletes = [volume_id for volume_id, action in actions.items() if action == "delete"]
+    failures = {}
+
+    with ThreadPoolExecutor(max_workers=Config.PUT_WORKERS) as executor:
+        for volume_id, error in zip(
+            creates,
+            executor.map(
+                lambda volume_id: put_alarm(cloudwatch, volume_id, sns_topic_arn),
+                creates,
+            ),
+        ):
+            if error:
+                failures[volume_id] = error
+
+    # The alarm of each deleted volume, and its legacy alarm if it still has one,
+    # mapped back to the volume
+    delete_volume_ids = {
+        get_alarm_name(Config.ALARM_TYPE, volume_id): volume_id for volume_id in deletes
+    }
+    if deletes:
+        delete_volume_ids.update(get_existing_legacy_alarm_names(cloudwatch, deletes))
+    _, delete_failures = delete_alarms_in_batches(
+        cloudwatch=cloudwatch, alarm_names=list(delete_volume_ids)
+    )
+    for alarm_name, error in delete_failures.items():
+        failures[delete_volume_ids[alarm_name]] = error
+
+    logger.info(
+        f"Put {len(creates)} alarms and deleted {len(deletes)} alarms, {len(failures)} failed"
+    )
+    return failures
+
+
+def lambda_handler(event, context, cloudwatch=None, dry_run=False):
+    batch_events = get_batch_events(event)
+    actions, message_ids = coalesce_events(batch_events)
+    logger.info(
+        f"{len(batch_events)} events coalesced to {len(actions)} volume actions"
+    )
+
+    if dry_run:
+        return {"actions": actions}
+
+    # SNS topic ARN from environment variables
+    sns_topic_arn = os.environ["SNS_TOPIC_ARN"]
+    failures = apply_actions(
+        cloudwatch or get_cloudwatch_client(), actions, sns_topic_arn
+    )
+    for volume_id, error in failures.items():
+        logger.error(f"Failed to process volume {volume_id}: {error}")
+
+    # Only the messages of the failed volumes go back to the queue (this needs
+    # ReportBatchItemFailures on the event source mapping)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id}
+            for volume_id in failures
+            for message_id in message_ids[volume_id]
+            if message_id is not None
+        ]
+    }
+
+
+def load_recorded_events(event_files):
+    """
+    Reads recorded events and wraps them in one SQS batch. Each file holds an
+    EventBridge event, a list of them, or a whole SQS event with Records.
+    """
+    records = []
+    for event_file in event_files:
+        with open(event_file) as f:
+            recorded = json.load(f)
+        if isinstance(recorded, dict) and "Records" in recorded:
+            records.extend(recorded["Records"])
+            continue
+        for event in recorded if isinstance(recorded, list) else [recorded]:
+            records.append(
+                {"messageId": f"{event_file}#{len(records)}", "body": json.dumps(event)}
+            )
+    return {"Records": records}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded CreateVolume/DeleteVolume events through the batch handler."
+    )
+    parser.add_argument(
+        "event_files",
+        nargs="+",
+        metavar="EVENT_FILE",
+        help="JSON file with an EventBridge event, a list of events, or an SQS event with Records.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the coalesced action per volume, without calling CloudWatch.",
+    )
+    parser.add_argument(
+        "--sns-topic",
+        help="SNS Topic ARN for the alarm actions. Defaults to the SNS_TOPIC_ARN environment variable.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    if args.sns_topic:
+        os.environ["SNS_TOPIC_ARN"] = args.sns_topic
+    response = lambda_handler(
+        load_recorded_events(args.event_files), None, dry_run=args.dry_run
+    )
+    print(json.dumps(response, indent=2))
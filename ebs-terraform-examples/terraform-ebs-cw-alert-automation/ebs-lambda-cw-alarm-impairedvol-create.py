@@ -2,6 +2,9 @@ import boto3
 import logging
 import os
 
+# Packaged next to this file, see the README
+from ebs_alarm_specs import get_alarm_template
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -19,22 +22,10 @@ def lambda_handler(event, context):
         cloudwatch_client = boto3.client("cloudwatch")
 
         # Create or update CloudWatch alarm for the EBS volume
+        # The impaired volume alarm shared with the ebs-cloudwatch scripts
+        template = get_alarm_template("impairedvol", alarm_actions=[sns_topic_arn])
         response = cloudwatch_client.put_metric_alarm(
-            AlarmName="ImpairedVol_" + volume_id,
-            ComparisonOperator="GreaterThanOrEqualToThreshold",
-            EvaluationPeriods=1,
-            MetricName="VolumeIdleTime",
-            Namespace="AWS/EBS",
-            Period=300,
-            Statistic="Average",
-            Threshold=0.01,
-            ActionsEnabled=True,
-            AlarmActions=[sns_topic_arn],
-            AlarmDescription="Alarm for EBS volume " + volume_id,
-            Dimensions=[
-                {"Name": "VolumeId", "Value": volume_id},
-            ],
-            Unit="Seconds",
+            **template.render(volume_id, "Alarm for EBS volume " + volume_id)
         )
 
         # Log the response from the put_metric_alarm call
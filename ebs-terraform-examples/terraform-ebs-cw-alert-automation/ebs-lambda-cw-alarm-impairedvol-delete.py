@@ -1,6 +1,9 @@
 import boto3
 import logging
 
+# Packaged next to this file, see the README
+from ebs_alarm_specs import get_alarm_name, get_legacy_alarm_names
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -14,13 +17,20 @@ def lambda_handler(event, context):
         # Boto3 client for CloudWatch
         cloudwatch_client = boto3.client("cloudwatch")
 
-        # Delete CloudWatch alarm for the EBS volume
-        response = cloudwatch_client.delete_alarms(
-            AlarmNames=["ImpairedVol_" + volume_id]
-        )
-
-        # Log the response from the delete_alarms call
-        logger.info(f"CloudWatch alarm deletion response: {response}")
+        # Delete CloudWatch alarm for the EBS volume, and the alarm named by earlier
+        # versions of this function. Each name is deleted on its own, as DeleteAlarms
+        # fails as a whole when one of the alarms does not exist.
+        alarm_names = [get_alarm_name("impairedvol", volume_id)]
+        alarm_names += get_legacy_alarm_names("impairedvol", volume_id)
+        for alarm_name in alarm_names:
+            try:
+                response = cloudwatch_client.delete_alarms(AlarmNames=[alarm_name])
+            except cloudwatch_client.exceptions.ResourceNotFound:
+                logger.info(f"CloudWatch alarm {alarm_name} does not exist")
+                continue
+
+            # Log the response from the delete_alarms call
+            logger.info(f"CloudWatch alarm deletion response: {response}")
 
         return {"statusCode": 200, "body": "Successfully deleted CloudWatch alarm"}
 
@@ -15,6 +15,12 @@ variable "sns_topic_email" {
   default     = "jnicamzn+ebs-sns@amazon.com"
 }
 
+variable "use_sqs_batch" {
+  description = "Queue the volume events in SQS and process them in batches with ebs-lambda-cw-alarm-impairedvol-batch.py instead of one Lambda invocation per event"
+  type        = bool
+  default     = false
+}
+
 provider "aws" {
   region  = var.region
   profile = var.profile
@@ -52,7 +58,11 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "logs:PutLogEvents",
           "cloudwatch:PutMetricAlarm",
           "cloudwatch:DeleteAlarms",
-          "sns:Publish"
+          "cloudwatch:DescribeAlarms",
+          "sns:Publish",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
         ],
         Resource = "*"
       }
@@ -105,6 +115,7 @@ PATTERN
 
 # CloudWatch event target
 resource "aws_cloudwatch_event_target" "ebs_creation_target" {
+  count     = var.use_sqs_batch ? 0 : 1
   rule      = aws_cloudwatch_event_rule.ebs_creation_rule.name
   target_id = "EBSVolumeCreation"
   arn       = aws_lambda_function.ebs_alarm_lambda.arn
@@ -147,7 +158,8 @@ PATTERN
 
 # Target for Delete Alarms Rule
 resource "aws_cloudwatch_event_target" "ebs_deletion_target" {
-  rule = aws_cloudwatch_event_rule.ebs_deletion_rule.name
+  count = var.use_sqs_batch ? 0 : 1
+  rule  = aws_cloudwatch_event_rule.ebs_deletion_rule.name
   arn  = aws_lambda_function.ebs_alarm_lambda_delete.arn
 }
 
@@ -159,3 +171,90 @@ resource "aws_lambda_permission" "allow_cloudwatch_delete" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.ebs_deletion_rule.arn
 }
+
+########################################################################
+# Batch mode (use_sqs_batch = true): both rules send their events to an
+# SQS queue and one Lambda processes them in batches of up to 100.
+########################################################################
+
+# Events that still fail after 5 receives end up here
+resource "aws_sqs_queue" "ebs_volume_events_dlq" {
+  count = var.use_sqs_batch ? 1 : 0
+  name  = "ebs-volume-events-dlq"
+}
+
+resource "aws_sqs_queue" "ebs_volume_events" {
+  count                      = var.use_sqs_batch ? 1 : 0
+  name                       = "ebs-volume-events"
+  visibility_timeout_seconds = 1800 # 6x the Lambda timeout, as recommended for SQS event sources
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.ebs_volume_events_dlq[0].arn
+    maxReceiveCount     = 5
+  })
+}
+
+# Allow EventBridge to send the volume events to the queue
+resource "aws_sqs_queue_policy" "ebs_volume_events" {
+  count     = var.use_sqs_batch ? 1 : 0
+  queue_url = aws_sqs_queue.ebs_volume_events[0].id
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect    = "Allow",
+        Principal = { Service = "events.amazonaws.com" },
+        Action    = "sqs:SendMessage",
+        Resource  = aws_sqs_queue.ebs_volume_events[0].arn,
+        Condition = {
+          ArnEquals = {
+            "aws:SourceArn" = [
+              aws_cloudwatch_event_rule.ebs_creation_rule.arn,
+              aws_cloudwatch_event_rule.ebs_deletion_rule.arn
+            ]
+          }
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_cloudwatch_event_target" "ebs_creation_queue_target" {
+  count = var.use_sqs_batch ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.ebs_creation_rule.name
+  arn   = aws_sqs_queue.ebs_volume_events[0].arn
+}
+
+resource "aws_cloudwatch_event_target" "ebs_deletion_queue_target" {
+  count = var.use_sqs_batch ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.ebs_deletion_rule.name
+  arn   = aws_sqs_queue.ebs_volume_events[0].arn
+}
+
+# Lambda function that creates and deletes the alarms of a batch of volume events
+resource "aws_lambda_function" "ebs_alarm_lambda_batch" {
+  count            = var.use_sqs_batch ? 1 : 0
+  function_name    = "ebs_alarm_lambda_batch"
+  filename         = "ebs-lambda-cw-alarm-impairedvol-batch.zip"
+  handler          = "ebs-lambda-cw-alarm-impairedvol-batch.lambda_handler"
+  role             = aws_iam_role.lambda_role.arn
+  runtime          = "python3.8"
+  timeout          = 300
+  source_code_hash = filebase64sha256("ebs-lambda-cw-alarm-impairedvol-batch.zip")
+
+  environment {
+    variables = {
+      SNS_TOPIC_ARN = aws_sns_topic.ebs_alarms.arn
+    }
+  }
+}
+
+# Deliver up to 100 events per invocation, waiting up to 30 seconds to fill a batch.
+# ReportBatchItemFailures returns only the events of failed volumes to the queue.
+resource "aws_lambda_event_source_mapping" "ebs_volume_events" {
+  count                              = var.use_sqs_batch ? 1 : 0
+  event_source_arn                   = aws_sqs_queue.ebs_volume_events[0].arn
+  function_name                      = aws_lambda_function.ebs_alarm_lambda_batch[0].arn
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 30
+  function_response_types            = ["ReportBatchItemFailures"]
+}
@@ -1,9 +1,15 @@
 import boto3
 import os
+import math
 import time
 import logging
 from datetime import datetime
 
+try:
+    import numpy as np  # Optional, add it to the Lambda package or a layer to vectorize
+except ImportError:
+    np = None
+
 
 # Read constants from environment variables
 PAGINATION_COUNT = int(os.environ.get("PAGINATION_COUNT", 300))
@@ -164,58 +170,90 @@ def process_metrics(cloudwatch, metric_queries, custom_metrics):
 
     # logging.debug("Response for get_metric_data is %s", response)
 
-    # Process the response and update custom_metrics
-    for i in range(0, len(response["MetricDataResults"]), 4):
-        # Check if the Values list has data for each metric
-        if all(response["MetricDataResults"][j]["Values"] for j in range(i, i + 4)):
-            total_read_time = response["MetricDataResults"][i]["Values"][-1]
-            read_ops = response["MetricDataResults"][i + 1]["Values"][-1]
-            total_write_time = response["MetricDataResults"][i + 2]["Values"][-1]
-            write_ops = response["MetricDataResults"][i + 3]["Values"][-1]
-            volumes_with_metrics += 1
-        else:
-            logging.debug(
-                f"Metrics data missing for volume with ID derived from {metric_queries[i]['Id']}"
-            )
+    volume_ids, has_data, read_latency, write_latency, total_latency = (
+        compute_latencies(metric_queries, response["MetricDataResults"])
+    )
+
+    for index, volume_id in enumerate(volume_ids):
+        if not has_data[index]:
+            logging.debug(f"Metrics data missing for volume {volume_id}")
             volumes_without_metrics += 1
             continue
+        volumes_with_metrics += 1
 
-        # Perform the calculations
-        read_latency = (total_read_time / read_ops) * 1000 if read_ops != 0 else 0
-        write_latency = (total_write_time / write_ops) * 1000 if write_ops != 0 else 0
-        total_latency = read_latency + write_latency
-
-        safe_volume_id = metric_queries[i]["Id"].split("_", 2)[-1]
-        volume_id = safe_volume_id.replace("_", "-")
-
-        # Add to custom_metrics
+        # The three metrics of a volume share one Dimensions list
+        dimensions = [{"Name": "VolumeId", "Value": volume_id}]
         custom_metrics.extend(
             [
                 {
                     "MetricName": "VolumeReadLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": read_latency,
+                    "Dimensions": dimensions,
+                    "Value": float(read_latency[index]),
                 },
                 {
                     "MetricName": "VolumeWriteLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": write_latency,
+                    "Dimensions": dimensions,
+                    "Value": float(write_latency[index]),
                 },
                 {
                     "MetricName": "VolumeTotalLatency",
-                    "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
-                    "Value": total_latency,
+                    "Dimensions": dimensions,
+                    "Value": float(total_latency[index]),
                 },
             ]
         )
 
-        logging.debug(
-            f"Latency metrics updated for volume {volume_id}: "
-            f"Read L = {read_latency:.2f} ms "
-            f"(Rt {total_read_time:.2f} / Rops {read_ops:.2f}), "
-            f"Write L = {write_latency:.2f} ms "
-            f"(Wt {total_write_time:.2f} / Wops {read_ops:.2f}), "
-            f"Total L = {total_latency:.2f} ms {read_latency:.2f}+{write_latency:.2f}"
+    return volumes_with_metrics, volumes_without_metrics
+
+
+def compute_latencies(metric_queries, metric_data_results):
+    """
+    Packs the latest value of the four queries of each volume (read time, read ops,
+    write time, write ops) into columns and computes the latencies for the whole batch.
+    Uses NumPy when it is in the package, plain Python otherwise.
+    Returns:
+        tuple: (volume IDs, has data, read latency, write latency, total latency)
+    """
+    latest = {
+        result["Id"]: result["Values"][-1]
+        for result in metric_data_results
+        if result["Values"]
+    }
+    values = [latest.get(query["Id"], math.nan) for query in metric_queries]
+    volume_ids = [
+        query["Id"].split("_", 2)[-1].replace("_", "-") for query in metric_queries[::4]
+    ]
+
+    if np is not None:
+        read_time, read_ops, write_time, write_ops = (
+            np.array(values, dtype=float).reshape(-1, 4).T
+        )
+        has_data = ~(
+            np.isnan(read_time)
+            | np.isnan(read_ops)
+            | np.isnan(write_time)
+            | np.isnan(write_ops)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            read_latency = np.where(read_ops != 0, read_time / read_ops * 1000, 0.0)
+            write_latency = np.where(write_ops != 0, write_time / write_ops * 1000, 0.0)
+        return (
+            volume_ids,
+            has_data,
+            read_latency,
+            write_latency,
+            read_latency + write_latency,
         )
 
-    return volumes_with_metrics, volumes_without_metrics
+    rows = [values[i : i + 4] for i in range(0, len(values), 4)]
+    has_data = [not any(math.isnan(value) for value in row) for row in rows]
+    read_latency = [
+        read_time / read_ops * 1000 if read_ops != 0 else 0.0
+        for read_time, read_ops, _, _ in rows
+    ]
+    write_latency = [
+        write_time / write_ops * 1000 if write_ops != 0 else 0.0
+        for _, _, write_time, write_ops in rows
+    ]
+    total_latency = [read + write for read, write in zip(read_latency, write_latency)]
+    return volume_ids, has_data, read_latency, write_latency, total_latency
@@ -1,87 +1,114 @@
+import os
 import sys
 import argparse
 import boto3
 import logging
 from tabulate import tabulate
 
+# The volume inventory cache and VolumeRecord are shared with the scripts in
+# ebs-cloudwatch/
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ebs-cloudwatch")
+)
+from ebs_inventory import VolumeRecord, get_instance_names, iter_volumes
+from ebs_inventory_cache import get_cached_volumes, Config as CacheConfig
+
 
 def main():
     args = parse_args()
 
     initialize_logging(args.loglevel)
 
-    ec2, cloudwatch = initialize_aws_clients(region=args.region)
+    ec2_client, cloudwatch = initialize_aws_clients(region=args.region)
 
     if args.list_tags:
         if args.volumeid is not None:
-            list_volume_tags(ec2=ec2, volume_id=args.volumeid)
+            list_volume_tags(ec2_client=ec2_client, volume_id=args.volumeid)
         else:
-            list_volume_tags(ec2=ec2)
+            list_volume_tags(
+                ec2_client=ec2_client,
+                volumes=get_volume_records(
+                    ec2_client=ec2_client,
+                    region=args.region,
+                    inventory_cache=args.inventory_cache,
+                ),
+            )
 
     if args.list_volumes:
-        list_volumes(ec2=ec2, style=args.style)
+        list_volumes(
+            ec2_client=ec2_client,
+            volumes=get_volume_records(
+                ec2_client=ec2_client,
+                region=args.region,
+                inventory_cache=args.inventory_cache,
+            ),
+            style=args.style,
+        )
 
     if args.list_volumes_raw:
-        list_all_volumes_raw(ec2=ec2)
+        list_all_volumes_raw(ec2_client=ec2_client)
 
     if args.metadata_fields:
-        get_all_ebs_metadata_fields(ec2=ec2)
+        get_all_ebs_metadata_fields(ec2_client=ec2_client)
 
     if args.metadata:
-        print_volume_metadata(ec2=ec2)
+        print_volume_metadata(ec2_client=ec2_client)
 
 
-def get_all_ebs_metadata_fields(ec2):
-    volume = next(iter(ec2.volumes.all()), None)
+def get_all_ebs_metadata_fields(ec2_client):
+    """
+    Prints the fields of a describe_volumes record, from the first volume returned.
+    """
+    volume = next(iter_volumes(ec2_client, fields=None), None)
 
     if volume is None:
         print("No volumes found.")
         return
 
-    for attr in dir(volume):
-        if not attr.startswith("__"):
-            print(attr)
+    for field in sorted(volume):
+        print(field)
 
 
-def get_volume_metadata(volume):
-    metadata = {}
-    for attr in dir(volume):
-        if not attr.startswith("__") and not callable(getattr(volume, attr)):
-            metadata[attr] = getattr(volume, attr)
-    return metadata
+def get_volume_records(ec2_client, region, inventory_cache="auto"):
+    """
+    Returns the describe_volumes records for the region, served from the inventory
+    snapshot of ebs-cloudwatch/ebs_inventory_cache.py unless inventory_cache is "off".
+    """
+    return list(
+        get_cached_volumes(ec2_client, mode=inventory_cache, region=region).values()
+    )
 
 
-def list_volume_tags(ec2, volume_id=None):
+def list_volume_tags(ec2_client, volume_id=None, volumes=None):
     if volume_id is not None:
-        volumes = [ec2.Volume(volume_id)]
-    else:
-        volumes = list(ec2.volumes.all())
+        volumes = ec2_client.describe_volumes(VolumeIds=[volume_id])["Volumes"]
 
-    for volume in volumes:
-        if volume.tags is None:
-            print(f"Volume {volume.id} does not have any tags.")
+    for volume in map(VolumeRecord.from_volume, volumes):
+        if not volume.tag_items:
+            print(f"Volume {volume.volume_id} does not have any tags.")
             continue
 
-        print(f"Tags for volume {volume.id}:")
-        for tag in volume.tags:
-            print(f"  Key: {tag['Key']}, Value: {tag['Value']}")
+        print(f"Tags for volume {volume.volume_id}:")
+        for key, value in volume.tag_items:
+            print(f"  Key: {key}, Value: {value}")
         print("---")
 
 
-def describe_status(ec2, volume_id):
-    volume = ec2.Volume(volume_id)
-    status = volume.describe_status()
+def describe_status(ec2_client, volume_id):
+    status = ec2_client.describe_volume_status(VolumeIds=[volume_id])
     print(f"Status for volume {volume_id}:")
     for key, value in status.items():
         print(f"  {key}: {value}")
     print("---")
 
 
-def print_volume_metadata(ec2):
-    for volume in ec2.volumes.all():
-        metadata = get_volume_metadata(volume)
-        print(f"Metadata for volume {volume.id}:")
-        for key, value in metadata.items():
+def print_volume_metadata(ec2_client):
+    """
+    Prints the full describe_volumes record of every volume, one page at a time.
+    """
+    for volume in iter_volumes(ec2_client, fields=None):
+        print(f"Metadata for volume {volume['VolumeId']}:")
+        for key, value in volume.items():
             print(f"  {key}: {value}")
         print("---")
 
@@ -100,37 +127,26 @@ def list_cloudwatch_metrics(volume_id, cloudwatch):
         print("No CloudWatch metrics found for the specified EBS volume.")
 
 
-def list_volumes(ec2, style):
-    volumes = ec2.volumes.all()
+def list_volumes(ec2_client, volumes, style):
+    # Build the compact records once, then resolve every instance name in a few
+    # batched calls instead of loading one ec2.Instance per attached volume
+    volumes = [VolumeRecord.from_volume(volume) for volume in volumes]
+    instance_names = get_instance_names(
+        ec2_client, {volume.instance_id for volume in volumes if volume.instance_id}
+    )
 
     table_data = []
     for volume in volumes:
-        volume_id = volume.id
-        volume_name = volume.tags[0]["Value"] if volume.tags else ""
-        status = volume.state
-        volume_type = volume.volume_type
-        size = volume.size
-        date_created = volume.create_time
-        attached_instance_id = (
-            volume.attachments[0]["InstanceId"] if volume.attachments else ""
-        )
-        ec2_instance_name = ""
-        if attached_instance_id:
-            instance = ec2.Instance(attached_instance_id)
-            ec2_instance_name = next(
-                (tag["Value"] for tag in instance.tags if tag["Key"] == "Name"), ""
-            )
-
         table_data.append(
             [
-                volume_id,
-                volume_name,
-                status,
-                volume_type,
-                size,
-                date_created,
-                attached_instance_id,
-                ec2_instance_name,
+                volume.volume_id,
+                volume.tag("Name", ""),
+                volume.state,
+                volume.volume_type,
+                volume.size,
+                volume.create_time,
+                volume.instance_id,
+                instance_names.get(volume.instance_id, ""),
             ]
         )
 
@@ -152,19 +168,19 @@ def list_volumes(ec2, style):
     )
 
 
-def list_all_volumes_raw(ec2):
+def list_all_volumes_raw(ec2_client):
     # Assuming you have AWS credentials set up, otherwise, configure them here
-    response = ec2.describe_volumes()
-
-    if "Volumes" in response:
-        for volume in response["Volumes"]:
-            print(f"Volume ID: {volume['VolumeId']}")
-            print(f"Volume Type: {volume['VolumeType']}")
-            print(f"Size: {volume['Size']} GB")
-            print(f"Status: {volume['State']}")
-            print("---")
-            describe_status(ec2=ec2, volume_id=volume["VolumeId"])
-    else:
+    volume_count = 0
+    for volume in iter_volumes(ec2_client, fields=None):
+        print(f"Volume ID: {volume['VolumeId']}")
+        print(f"Volume Type: {volume['VolumeType']}")
+        print(f"Size: {volume['Size']} GB")
+        print(f"Status: {volume['State']}")
+        print("---")
+        describe_status(ec2_client=ec2_client, volume_id=volume["VolumeId"])
+        volume_count += 1
+
+    if not volume_count:
         print("No EBS volumes found in the account.")
 
 
@@ -174,7 +190,6 @@ def initialize_logging(loglevel):
 
 def initialize_aws_clients(region):
     try:
-        ec2 = boto3.resource("ec2", region_name=region)  # Added this line
         ec2_client = boto3.client("ec2", region_name=region)
         cloudwatch = boto3.client("cloudwatch", region_name=region)
         logging.info("Initialized AWS Client")
@@ -182,7 +197,7 @@ def initialize_aws_clients(region):
         logging.error(f"Failed to initialize AWS clients: {e}")
         sys.exit(1)
 
-    return ec2, cloudwatch  # Changed this line
+    return ec2_client, cloudwatch
 
 
 def parse_args():
@@ -229,6 +244,12 @@ def parse_args():
         action="store_true",
         help="Print describe-status metadata for all EBS volumes",
     )
+    parser.add_argument(
+        "--inventory-cache",
+        choices=CacheConfig.MODES,
+        default="auto",
+        help=f"How to use the volume inventory cache in {CacheConfig.CACHE_FILE} (see ebs-cloudwatch/ebs_inventory_cache.py) for --list-volumes and --list-tags: auto (reuse for {CacheConfig.TTL}s, then delta refresh), delta, full (refresh now), or off. Default is auto.",
+    )
     parser.add_argument(
         "--loglevel",
         default="info",